@@ -0,0 +1,211 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import time
+import orjson
+from app.core.config import settings
+from app.core.database import get_session, async_session_maker
+from app.core.responses import ORJSONResponse
+from app.core.auth import get_current_user
+from app.models.evaluation import Evaluation, EvaluationCreate, EvaluationRead
+from app.models.job import Job, JobItem
+from app.models.prompt import PromptVersion
+from app.services.execution_log import estimate_cost
+from app.services.execution_policy import ExecutionPolicy
+from app.services.jobs import create_job, job_worker
+from app.api.v1.endpoints.execute import _execute_one
+from app.services.batch import ExecuteRequest
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Item positions are row-major (row * variants + variant), so the variants
+# advance through the dataset together and a partial run is still comparable.
+
+async def run_evaluation_item(payload: Dict[str, Any], user_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Handler for "evaluation" jobs: one dataset row through one variant.
+    """
+    item = ExecuteRequest.model_validate(payload["request"])
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        executed = await _execute_one(item, session, user_id=user_id)
+    latency_ms = (time.perf_counter() - started) * 1000
+    # Upstream time of the attempt that answered, when there was one (not a cache hit)
+    for attempt in executed.attempts:
+        if attempt.outcome == "ok":
+            latency_ms = attempt.latency_ms
+    usage = executed.usage or {}
+    model_name = executed.served_by.model_name if executed.served_by else item.model_name
+    return {
+        "response": executed.response,
+        "cached": executed.cached,
+        "latency_ms": latency_ms,
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "cost_usd": estimate_cost(model_name, usage.get("input_tokens"), usage.get("output_tokens")),
+    }
+
+def _evaluation_read(evaluation: Evaluation, job: Job) -> EvaluationRead:
+    return EvaluationRead(
+        **evaluation.model_dump(exclude={"variants_json", "metrics_json", "expected_json", "report_json"}),
+        variants=json.loads(evaluation.variants_json),
+        metrics=json.loads(evaluation.metrics_json),
+        status=job.status,
+        succeeded_items=job.succeeded_items,
+        failed_items=job.failed_items
+    )
+
+async def _get_evaluation(session: AsyncSession, evaluation_id: int, current_user: dict) -> Evaluation:
+    evaluation = await session.get(Evaluation, evaluation_id)
+    if not evaluation or evaluation.user_id != current_user.get("uid"):
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    return evaluation
+
+def _score(evaluation: Evaluation, results: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    # CPU-bound; runs in a worker thread.
+    from app.services import evaluation_scoring as scoring
+
+    variants = json.loads(evaluation.variants_json)
+    rows, width = evaluation.rows, len(variants)
+    started = time.perf_counter()
+    inputs = scoring.build_input(rows, width, json.loads(evaluation.expected_json), results)
+    metrics = scoring.score(inputs, rows, width, json.loads(evaluation.metrics_json), evaluation.baseline)
+    completed = inputs.ok.reshape(rows, width).sum(axis=0)
+    return {
+        "rows": rows,
+        "baseline": evaluation.baseline,
+        "variants": [
+            {"label": variant["label"], "completed": int(completed[index]), "error_rate": 1 - int(completed[index]) / rows}
+            for index, variant in enumerate(variants)
+        ],
+        "metrics": metrics,
+        "scoring_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+@router.post("/", response_model=EvaluationRead, status_code=202)
+async def create_evaluation(
+    evaluation_in: EvaluationCreate,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Queues every dataset row through every variant as a background job and
+    returns at once. Poll GET /evaluations/{id} and read /report, which scores
+    whatever has finished so far.
+    """
+    from app.services.evaluation_scoring import METRICS, check_params
+
+    rows, variants = evaluation_in.dataset, evaluation_in.variants
+    if len(variants) < 2:
+        raise HTTPException(status_code=422, detail="An evaluation needs at least two variants")
+    if not rows:
+        raise HTTPException(status_code=422, detail="The dataset is empty")
+    if not 0 <= evaluation_in.baseline < len(variants):
+        raise HTTPException(status_code=422, detail="baseline must index into variants")
+    if len(rows) * len(variants) > settings.JOB_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Evaluation exceeds {settings.JOB_MAX_ITEMS} executions")
+    names = [metric.name or metric.type for metric in evaluation_in.metrics]
+    unknown = sorted({metric.type for metric in evaluation_in.metrics} - set(METRICS))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown metrics: {', '.join(unknown)}")
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=422, detail="Metric names must be unique; set `name` to use a type twice")
+    for metric, name in zip(evaluation_in.metrics, names):
+        try:
+            check_params(metric.type, metric.params)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Metric {name}: {e}")
+    version_ids = {variant.version_id for variant in variants}
+    found = set((await session.exec(select(PromptVersion.id).where(PromptVersion.id.in_(version_ids)))).all())
+    if found != version_ids:
+        raise HTTPException(status_code=404, detail=f"Prompt versions not found: {sorted(version_ids - found)}")
+
+    for variant in variants:
+        variant.label = variant.label or f"{variant.model_name} @ version {variant.version_id}"
+    # No fallbacks: each variant is measured on exactly the model it names.
+    no_fallbacks = ExecutionPolicy()
+    payloads = [
+        {"request": ExecuteRequest(
+            provider_id=variant.provider_id,
+            model_provider=variant.model_provider,
+            model_name=variant.model_name,
+            version_id=variant.version_id,
+            variables=row.variables,
+            config=variant.config or {},
+            cache_mode=evaluation_in.cache_mode,
+            execution_policy=no_fallbacks
+        ).model_dump(mode="json")}
+        for row in rows
+        for variant in variants
+    ]
+    job = await create_job(session, "evaluation", payloads, current_user.get("uid"), commit=False)
+    evaluation = Evaluation(
+        name=evaluation_in.name,
+        user_id=current_user.get("uid"),
+        job_id=job.id,
+        rows=len(rows),
+        baseline=evaluation_in.baseline,
+        variants_json=json.dumps([variant.model_dump() for variant in variants]),
+        metrics_json=json.dumps([metric.model_dump() for metric in evaluation_in.metrics]),
+        expected_json=json.dumps([row.expected for row in rows])
+    )
+    session.add(evaluation)
+    await session.commit()
+    job_worker.notify()
+    return _evaluation_read(evaluation, job)
+
+@router.get("/", response_model=List[EvaluationRead])
+async def read_evaluations(
+    before_id: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    query = select(Evaluation, Job).join(Job, Job.id == Evaluation.job_id).where(Evaluation.user_id == current_user.get("uid"))
+    if before_id is not None:
+        query = query.where(Evaluation.id < before_id)
+    rows = (await session.exec(query.order_by(Evaluation.id.desc()).limit(limit))).all()
+    return [_evaluation_read(evaluation, job) for evaluation, job in rows]
+
+@router.get("/{evaluation_id}", response_model=EvaluationRead)
+async def read_evaluation(
+    evaluation_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    evaluation = await _get_evaluation(session, evaluation_id, current_user)
+    return _evaluation_read(evaluation, await session.get(Job, evaluation.job_id))
+
+@router.get("/{evaluation_id}/report")
+async def read_evaluation_report(
+    evaluation_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Per-variant mean, spread, 95% interval and percentiles for each metric,
+    with a paired t-test of every variant against the baseline over the rows
+    both completed. Scored over the finished items; stored once the job ends.
+    """
+    evaluation = await _get_evaluation(session, evaluation_id, current_user)
+    job = await session.get(Job, evaluation.job_id)
+    if evaluation.report_json is not None:
+        return ORJSONResponse({"status": job.status, **orjson.loads(evaluation.report_json)})
+
+    finished = (await session.exec(
+        select(JobItem.position, JobItem.result_json)
+        .where(JobItem.job_id == job.id, JobItem.status == "succeeded")
+    )).all()
+    results = {position: orjson.loads(result_json) for position, result_json in finished}
+    try:
+        report = await asyncio.to_thread(_score, evaluation, results)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if job.status in ("completed", "cancelled"):
+        evaluation.report_json = orjson.dumps(report).decode()
+        session.add(evaluation)
+        await session.commit()
+    return ORJSONResponse({"status": job.status, **report})
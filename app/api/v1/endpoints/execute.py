@@ -1,48 +1,441 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
+from app.core.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import AsyncIterator, Dict, Any, List, Optional
+import asyncio
+import json
+import time
+from app.services.batch import BatchExecuteRequest, ExecuteRequest, expand_batch
+from app.services.coalescing import single_flight
 from app.services.llm_service import LLMService
+from app.services.execution_policy import Candidate, ExecutionPolicy
+from app.services.execution_log import execution_writer, server_time_to_first_token_ms
+from app.services.provider_catalog import provider_catalog
+from app.services.providers import ProviderError, resolve_provider_kind
+from app.services.response_cache import response_cache, cache_key, is_cacheable
+from app.services.template_service import prompt_template_cache, TemplateError
+from app.core.config import settings
 from app.core.auth import get_current_user
+from app.core.metrics import stage
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
-from sqlmodel import Session
-from app.core.database import get_session
-from app.models.provider import LLMProvider
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.database import get_session, async_session_maker
 
-class ExecuteRequest(BaseModel):
+class ServedBy(BaseModel):
     provider_id: Optional[int] = None
-    model_provider: str # openai, gemini, ollama
+    model_provider: str
     model_name: str
-    prompt_text: str
-    config: Optional[Dict[str, Any]] = {}
+
+class AttemptRead(ServedBy):
+    hedged: bool = False
+    outcome: str
+    latency_ms: float
+    error: Optional[str] = None
 
 class ExecuteResponse(BaseModel):
     response: str
+    cached: bool = False
+    # Answered by an identical request's upstream call
+    coalesced: bool = False
+    served_by: Optional[ServedBy] = None
+    attempts: List[AttemptRead] = []
+    # {"input_tokens", "output_tokens", "total_tokens"} when the provider reports it
+    usage: Optional[Dict[str, Any]] = None
 
-@router.post("/", response_model=ExecuteResponse)
-async def execute_prompt(
-    request: ExecuteRequest,
-    session: Session = Depends(get_session),
-    current_user: dict = Depends(get_current_user)
-):
+class BatchItemResult(BaseModel):
+    index: int
+    model_provider: str
+    model_name: str
+    variables_index: Optional[int] = None
+    response: Optional[str] = None
+    cached: bool = False
+    served_by: Optional[ServedBy] = None
+    error: Optional[str] = None
+
+class BatchExecuteResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+async def _provider_config(provider_id: Optional[int]) -> Dict[str, Any]:
+    # From the in-memory provider catalog; no query per call.
+    if provider_id:
+        config = await provider_catalog.config(provider_id)
+        if config is None and provider_catalog.is_inactive(provider_id):
+            raise HTTPException(status_code=409, detail=f"Provider {provider_id} is inactive")
+        return config or {}
+    return {}
+
+async def _prepare(request: ExecuteRequest, session: AsyncSession) -> ExecuteRequest:
+    """
+    Renders a stored prompt version server-side: resolves the active version,
+    validates variables and merges its model config under the request config.
+    """
+    if request.prompt_id is None and request.version_id is None:
+        if request.prompt_text is None:
+            raise HTTPException(status_code=422, detail="prompt_text, prompt_id or version_id is required")
+        return request
     try:
-        provider_config = {}
-        if request.provider_id:
-            provider = session.get(LLMProvider, request.provider_id)
-            if provider:
-                provider_config = {
-                    "api_key": provider.api_key,
-                    "base_url": provider.base_url
-                }
-
-        response_text = await LLMService.execute_prompt(
+        prepared = await prompt_template_cache.resolve(session, request.prompt_id, request.version_id)
+        with stage("render"):
+            prompt_text = prepared.render(request.variables or {})
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TemplateError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    execution_policy = request.execution_policy
+    if execution_policy is None:
+        policy_json = await prompt_template_cache.execution_policy(session, prepared.prompt_id)
+        if policy_json:
+            execution_policy = ExecutionPolicy.model_validate_json(policy_json)
+    return request.model_copy(update={
+        "prompt_text": prompt_text,
+        "config": {**prepared.model_config, **(request.config or {})},
+        "execution_policy": execution_policy,
+        "prompt_id": prepared.prompt_id,
+        "version_id": prepared.version_id
+    })
+
+async def _candidates(
+    request: ExecuteRequest,
+    provider_config: Dict[str, Any]
+) -> List[Candidate]:
+    """
+    The request's own target followed by its policy's fallbacks, each with
+    its provider config loaded and the request config merged under its own.
+    """
+    config = request.config or {}
+    candidates = [Candidate(request.model_provider, request.model_name, config, provider_config)]
+    if request.execution_policy:
+        for target in request.execution_policy.fallbacks:
+            target_config = await _provider_config(target.provider_id)
+            candidates.append(Candidate(
+                target.model_provider or target_config.get("kind") or request.model_provider,
+                target.model_name,
+                {**config, **(target.config or {})},
+                target_config
+            ))
+    return candidates
+
+def _hedge_delay(request: ExecuteRequest) -> Optional[int]:
+    return request.execution_policy.hedge_delay_ms if request.execution_policy else None
+
+def _coalesce(request: ExecuteRequest) -> bool:
+    return settings.COALESCING_ENABLED and request.coalesce
+
+def _record_execution(
+    request: ExecuteRequest,
+    user_id: Optional[str],
+    started: float,
+    status: str,
+    served_by: Optional[Candidate] = None,
+    usage: Optional[Dict[str, Any]] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    time_to_first_token_ms: Optional[float] = None,
+    error: Optional[BaseException] = None,
+    streamed: bool = False
+) -> None:
+    # Queued for the background writer; never blocks the request.
+    usage = usage or {}
+    execution_writer.record(
+        user_id=user_id,
+        prompt_id=request.prompt_id,
+        prompt_version_id=request.version_id,
+        provider_id=served_by.provider_config.get("id") if served_by else request.provider_id,
+        model_provider=served_by.model_provider if served_by else request.model_provider,
+        model_name=served_by.model_name if served_by else request.model_name,
+        status=status,
+        error=str(error) if error is not None else None,
+        streamed=streamed,
+        input_tokens=usage.get("input_tokens"),
+        output_tokens=usage.get("output_tokens"),
+        time_to_first_token_ms=time_to_first_token_ms,
+        latency_ms=(time.perf_counter() - started) * 1000,
+        metadata=metadata
+    )
+
+async def _execute_one(
+    request: ExecuteRequest,
+    session: AsyncSession,
+    provider_config: Optional[Dict[str, Any]] = None,
+    user_id: Optional[str] = None
+) -> ExecuteResponse:
+    started = time.perf_counter()
+    request = await _prepare(request, session)
+    key = None
+    if settings.RESPONSE_CACHE_ENABLED and request.cache_mode != "bypass" and is_cacheable(request.config):
+        key = cache_key(
             request.model_provider,
             request.model_name,
             request.prompt_text,
             request.config,
-            provider_config=provider_config
+            provider_id=request.provider_id
         )
-        return ExecuteResponse(response=response_text)
+        if request.cache_mode != "refresh":
+            cached = await response_cache.get(session, key)
+            if cached is not None:
+                _record_execution(request, user_id, started, "cached")
+                return ExecuteResponse(response=cached, cached=True)
+
+    if provider_config is None:
+        provider_config = await _provider_config(request.provider_id)
+
+    candidates = await _candidates(request, provider_config)
+    coalesced = False
+    try:
+        if _coalesce(request):
+            result, served_by, attempts, coalesced = await LLMService.complete_coalesced(
+                candidates, request.prompt_text, _hedge_delay(request)
+            )
+        else:
+            result, served_by, attempts = await LLMService.complete_with_policy(
+                candidates, request.prompt_text, _hedge_delay(request)
+            )
+    except Exception as e:
+        _record_execution(request, user_id, started, "error", error=e)
+        raise
+    if coalesced:
+        # The upstream call's tokens and cost are recorded once, by the request that made it.
+        _record_execution(request, user_id, started, "coalesced", served_by=served_by)
+    else:
+        _record_execution(
+            request, user_id, started, "ok",
+            served_by=served_by,
+            usage=result.usage,
+            metadata=result.metadata,
+            time_to_first_token_ms=server_time_to_first_token_ms(result.metadata)
+        )
+        # The key names the request's own target; a fallback's or hedge's answer
+        # would be served later as if that target had produced it.
+        if key and served_by is candidates[0]:
+            await response_cache.set(session, key, result.text)
+    return ExecuteResponse(
+        response=result.text,
+        coalesced=coalesced,
+        served_by=served_by.label(),
+        usage=result.usage,
+        attempts=[attempt.to_dict() for attempt in attempts]
+    )
+
+def _concurrency_key(item: ExecuteRequest, provider_configs: Dict[Optional[int], Dict[str, Any]]) -> str:
+    return provider_configs[item.provider_id].get("kind") or resolve_provider_kind(item.model_provider)
+
+async def run_job_item(payload: Dict[str, Any], user_id: Optional[str]) -> Dict[str, Any]:
+    """
+    Handler for "execute" jobs: runs one expanded batch item. Errors propagate
+    so the worker marks the item failed.
+    """
+    if payload.get("error"):
+        raise TemplateError(payload["error"])
+    item = ExecuteRequest.model_validate(payload["request"])
+    async with async_session_maker() as session:
+        executed = await _execute_one(item, session, user_id=user_id)
+    return BatchItemResult(
+        index=payload["index"],
+        model_provider=item.model_provider,
+        model_name=item.model_name,
+        variables_index=payload.get("variables_index"),
+        response=executed.response,
+        cached=executed.cached,
+        served_by=executed.served_by
+    ).model_dump()
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/", response_model=ExecuteResponse)
+async def execute_prompt(
+    request: ExecuteRequest,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        return await _execute_one(request, session, user_id=current_user.get("uid"))
+    except HTTPException:
+        raise
+    except ProviderError as e:
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after is not None else None
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch", response_model=BatchExecuteResponse)
+async def execute_batch(
+    batch: BatchExecuteRequest,
+    stream: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Fans a batch of executions out through LLMService, bounded per provider by
+    BATCH_PROVIDER_CONCURRENCY. A failed item is reported in its result and does
+    not fail the batch. With ?stream=true results are sent as NDJSON lines in
+    completion order (each carries its index); otherwise they are returned in order.
+    """
+    try:
+        expanded = await expand_batch(batch, session)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if len(expanded) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Batch exceeds {settings.BATCH_MAX_ITEMS} items")
+
+    provider_configs = {
+        provider_id: await _provider_config(provider_id)
+        for provider_id in {item.provider_id for item, _, _ in expanded}
+    }
+    semaphores: Dict[str, asyncio.Semaphore] = {}
+    for item, _, _ in expanded:
+        kind = _concurrency_key(item, provider_configs)
+        if kind not in semaphores:
+            limit = settings.BATCH_PROVIDER_CONCURRENCY.get(kind, settings.BATCH_DEFAULT_CONCURRENCY)
+            semaphores[kind] = asyncio.Semaphore(limit)
+
+    async def run(index: int, item: ExecuteRequest, variables_index: Optional[int], error: Optional[str]) -> BatchItemResult:
+        result = BatchItemResult(
+            index=index,
+            model_provider=item.model_provider,
+            model_name=item.model_name,
+            variables_index=variables_index,
+            error=error
+        )
+        if error is not None:
+            return result
+        async with semaphores[_concurrency_key(item, provider_configs)]:
+            try:
+                # AsyncSessions can't be shared between concurrent tasks; each item gets its own.
+                async with async_session_maker() as item_session:
+                    executed = await _execute_one(
+                        item, item_session, provider_configs[item.provider_id], user_id=current_user.get("uid")
+                    )
+                result.response = executed.response
+                result.cached = executed.cached
+                result.served_by = executed.served_by
+            except Exception as e:
+                result.error = str(e)
+        return result
+
+    tasks = [
+        asyncio.create_task(run(index, item, variables_index, error))
+        for index, (item, variables_index, error) in enumerate(expanded)
+    ]
+
+    if stream:
+        async def ndjson() -> AsyncIterator[str]:
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    yield result.model_dump_json() + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    results = await asyncio.gather(*tasks)
+    failed = sum(1 for result in results if result.error)
+    return BatchExecuteResponse(results=results, succeeded=len(results) - failed, failed=failed)
+
+@router.get("/cache/stats")
+async def read_cache_stats(current_user: dict = Depends(get_current_user)):
+    return {"enabled": settings.RESPONSE_CACHE_ENABLED, **response_cache.snapshot()}
+
+@router.get("/coalescing/stats")
+async def read_coalescing_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Upstream calls started and joined since startup, callers waiting on the
+    calls in flight now, and the share of requests that joined another's call.
+    """
+    return {"enabled": settings.COALESCING_ENABLED, **single_flight.snapshot()}
+
+@router.post("/stream")
+async def execute_prompt_stream(
+    request: ExecuteRequest,
+    http_request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Streams the completion as Server-Sent Events: one `token` event per chunk,
+    then a `done` event carrying usage and timing (or an `error` event). With
+    `coalesce`, identical streams in flight share one upstream stream.
+    """
+    request = await _prepare(request, session)
+    provider_config = await _provider_config(request.provider_id)
+    candidates = await _candidates(request, provider_config)
+    try:
+        if _coalesce(request):
+            chunks = LLMService.stream_coalesced(candidates, request.prompt_text, _hedge_delay(request))
+            coalesced = chunks.coalesced
+        else:
+            chunks = LLMService.stream_with_policy(candidates, request.prompt_text, _hedge_delay(request))
+            coalesced = False
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def event_stream() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        first_token_at = None
+        usage = None
+        metadata = None
+        # Anything that ends the stream early (disconnect, generator closed) counts as cancelled.
+        status, error = "cancelled", None
+        try:
+            async for chunk in chunks:
+                if await http_request.is_disconnected():
+                    break
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.metadata is not None:
+                    metadata = chunk.metadata
+                if chunk.text:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield _sse("token", {"text": chunk.text})
+            else:
+                status = "coalesced" if coalesced else "ok"
+                finished = time.perf_counter()
+                yield _sse("done", {
+                    "usage": usage,
+                    "timing": {
+                        "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                        "total_ms": round((finished - started) * 1000, 1),
+                    },
+                    "coalesced": coalesced,
+                    "served_by": chunks.served_by.label() if chunks.served_by else None,
+                    "attempts": [attempt.to_dict() for attempt in chunks.attempts]
+                })
+        except ProviderError as e:
+            status, error = "error", e
+            yield _sse("error", {
+                "detail": str(e),
+                "status_code": e.status_code,
+                "retry_after": e.retry_after,
+                "attempts": [attempt.to_dict() for attempt in chunks.attempts]
+            })
+        except Exception as e:
+            status, error = "error", e
+            yield _sse("error", {"detail": str(e), "attempts": [attempt.to_dict() for attempt in chunks.attempts]})
+        finally:
+            # Closing the generator tears down the upstream HTTP stream.
+            await chunks.aclose()
+            _record_execution(
+                request, current_user.get("uid"), started, status,
+                served_by=chunks.served_by,
+                # As with completions, a joined stream's tokens are counted once, by its first request.
+                usage=None if coalesced else usage,
+                metadata=metadata,
+                time_to_first_token_ms=(first_token_at - started) * 1000 if first_token_at else None,
+                error=error,
+                streamed=True
+            )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Literal, Optional
+from datetime import datetime
+from app.core.database import get_session, engine
+from app.models.execution import Execution, ExecutionRead
+from app.core.auth import get_current_user
+from app.services.execution_log import execution_writer
+from app.services.execution_stats import WINDOWS, summarize, timeseries
+
+router = APIRouter()
+
+def _time_range(window: str, since: Optional[datetime], until: Optional[datetime]):
+    until = until or datetime.utcnow()
+    since = since or until - WINDOWS[window]
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    return since, until
+
+@router.get("/", response_model=List[ExecutionRead])
+async def read_executions(
+    prompt_version_id: Optional[int] = None,
+    model_name: Optional[str] = None,
+    status: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Most recent executions first; pass the last id as `before_id` for the next page.
+    """
+    query = select(Execution)
+    if prompt_version_id is not None:
+        query = query.where(Execution.prompt_version_id == prompt_version_id)
+    if model_name is not None:
+        query = query.where(Execution.model_name == model_name)
+    if status is not None:
+        query = query.where(Execution.status == status)
+    if before_id is not None:
+        query = query.where(Execution.id < before_id)
+    return (await session.exec(query.order_by(Execution.id.desc()).limit(limit))).all()
+
+@router.get("/stats")
+async def read_execution_stats(
+    group_by: Literal["prompt_version", "prompt", "model"] = "model",
+    window: Literal["1h", "24h", "7d", "30d"] = "24h",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    prompt_version_id: Optional[int] = None,
+    model_name: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Throughput, token usage, cost and latency/TTFT percentiles per prompt
+    version, prompt or model over a window (or an explicit since/until range).
+    """
+    since, until = _time_range(window, since, until)
+    groups = await summarize(session, engine.dialect.name, group_by, since, until, prompt_version_id, model_name)
+    return {"since": since, "until": until, "group_by": group_by, "groups": groups}
+
+@router.get("/timeseries")
+async def read_execution_timeseries(
+    bucket: Literal["minute", "hour", "day"] = "hour",
+    window: Literal["1h", "24h", "7d", "30d"] = "24h",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    prompt_version_id: Optional[int] = None,
+    model_name: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    since, until = _time_range(window, since, until)
+    points = await timeseries(session, engine.dialect.name, bucket, since, until, prompt_version_id, model_name)
+    return {"since": since, "until": until, "bucket": bucket, "points": points}
+
+@router.get("/writer")
+async def read_writer_status(current_user: dict = Depends(get_current_user)):
+    return execution_writer.snapshot()
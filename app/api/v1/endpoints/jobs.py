@@ -0,0 +1,124 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+import json
+from app.core.config import settings
+from app.core.database import get_session
+from app.core.responses import ORJSONResponse
+from app.core.auth import get_current_user
+from app.models.job import Job, JobItem, JobItemPage, JobItemRead, JobRead
+from app.services.batch import BatchExecuteRequest, expand_batch
+from app.services.jobs import cancel_job, create_job, job_worker
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+def _item_read(item: JobItem) -> JobItemRead:
+    return JobItemRead(
+        **item.model_dump(exclude={"payload_json", "result_json", "lease_owner", "lease_expires_at"}),
+        result=json.loads(item.result_json) if item.result_json else None
+    )
+
+async def _get_job(session: AsyncSession, job_id: int, current_user: dict) -> Job:
+    job = await session.get(Job, job_id)
+    if not job or job.user_id != current_user.get("uid"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/", response_model=JobRead, status_code=202)
+async def create_execute_job(
+    batch: BatchExecuteRequest,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Queues a batch execution (same body as /execute/batch) and returns the job
+    at once. Poll GET /jobs/{id} for progress and page through /items for results.
+    """
+    try:
+        expanded = await expand_batch(batch, session)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not expanded:
+        raise HTTPException(status_code=422, detail="The job has no items")
+    if len(expanded) > settings.JOB_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Job exceeds {settings.JOB_MAX_ITEMS} items")
+    payloads = [
+        {"index": index, "variables_index": variables_index, "request": item.model_dump(mode="json"), "error": error}
+        for index, (item, variables_index, error) in enumerate(expanded)
+    ]
+    job = await create_job(session, "execute", payloads, current_user.get("uid"))
+    job_worker.notify()
+    return job
+
+@router.get("/", response_model=List[JobRead])
+async def read_jobs(
+    status: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    The caller's jobs, newest first; pass the last id as `before_id` for the next page.
+    """
+    query = select(Job).where(Job.user_id == current_user.get("uid"))
+    if status is not None:
+        query = query.where(Job.status == status)
+    if before_id is not None:
+        query = query.where(Job.id < before_id)
+    return (await session.exec(query.order_by(Job.id.desc()).limit(limit))).all()
+
+@router.get("/worker")
+async def read_worker_status(current_user: dict = Depends(get_current_user)):
+    return {"in_process": settings.JOB_WORKER_IN_PROCESS, **job_worker.snapshot()}
+
+@router.get("/{job_id}", response_model=JobRead)
+async def read_job(
+    job_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    return await _get_job(session, job_id, current_user)
+
+@router.post("/{job_id}/cancel", response_model=JobRead)
+async def cancel(
+    job_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stops the job: pending items are skipped and running ones are stopped
+    within a lease renewal interval. Finished items keep their results.
+    """
+    job = await _get_job(session, job_id, current_user)
+    if job.status in ("completed", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+    return await cancel_job(session, job)
+
+@router.get("/{job_id}/items", response_model=JobItemPage)
+async def read_job_items(
+    job_id: int,
+    status: Optional[str] = None,
+    after: Optional[int] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    The job's items in order, with results for finished ones. Pass `next_after`
+    from the previous page as `after`.
+    """
+    await _get_job(session, job_id, current_user)
+    query = select(JobItem).where(JobItem.job_id == job_id)
+    if status is not None:
+        query = query.where(JobItem.status == status)
+    if after is not None:
+        query = query.where(JobItem.position > after)
+    items = (await session.exec(query.order_by(JobItem.position).limit(limit))).all()
+    return {
+        "items": [_item_read(item) for item in items],
+        "next_after": items[-1].position if len(items) == limit else None
+    }
@@ -1,196 +1,450 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List, Optional
-from app.core.database import get_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, selectinload
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Literal, Optional
+from datetime import datetime
+from app.core.database import get_session, engine
+from app.core.responses import ORJSONResponse, stream_ndjson
+from app.core.etags import make_etag, not_modified, version_index
 from app.models.prompt import (
-    Prompt, PromptCreate, PromptRead, PromptVersion, PromptVersionCreate, 
-    PromptUpdate, PromptPaginatedRead, PromptVersionUpdate
+    Prompt, PromptCreate, PromptRead, PromptVersion, PromptVersionCreate, PromptVersionRead,
+    PromptUpdate, PromptPaginatedRead, PromptVersionUpdate, PromptVersionPage, PromptVersionDiff, PromptImportResult
 )
 from app.core.auth import get_current_user
+from app.services.template_service import prompt_template_cache
+from app.services.template_store import template_store, unified_diff
+from app.services.execution_policy import ExecutionPolicy
+from app.services.prompt_transfer import export_ndjson, import_ndjson
+from app.services.prompt_search import SORTABLE_COLUMNS, apply_search, apply_keyset, count_prompts, encode_cursor, decode_cursor
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+async def _get_prompt(session: AsyncSession, prompt_id: int) -> Optional[Prompt]:
+    # PromptRead serializes versions; load them up front since async sessions can't lazy-load.
+    return await session.get(
+        Prompt, prompt_id,
+        options=[selectinload(Prompt.versions)],
+        populate_existing=True
+    )
+
+async def _version_reads(session: AsyncSession, versions: List[PromptVersion]) -> List[dict]:
+    # Listings inline only small templates; one query covers every version's blob.
+    summaries = await template_store.summaries(session, (version.template_hash for version in versions))
+    reads = []
+    for version in versions:
+        size, template = summaries.get(version.template_hash, (0, None))
+        reads.append({**version.model_dump(), "template_size": size, "template": template})
+    return reads
+
+async def _version_read(session: AsyncSession, version: PromptVersion) -> dict:
+    template = await template_store.load(session, version.template_hash)
+    return {**version.model_dump(), "template_size": len(template.encode("utf-8")), "template": template}
+
+async def _prompt_read(session: AsyncSession, prompt_id: int) -> Optional[dict]:
+    # The detail view carries every version's full template, however it is stored;
+    # one bulk read decodes them all.
+    prompt = await _get_prompt(session, prompt_id)
+    if not prompt:
+        return None
+    templates = await template_store.load_many(session, (version.template_hash for version in prompt.versions))
+    versions = []
+    for version in prompt.versions:
+        template = templates[version.template_hash]
+        versions.append({**version.model_dump(), "template_size": len(template.encode("utf-8")), "template": template})
+    return {**prompt.model_dump(), "versions": versions}
+
+async def _get_version(session: AsyncSession, prompt_id: int, version_id: int) -> PromptVersion:
+    version = await session.get(PromptVersion, version_id)
+    if not version or version.prompt_id != prompt_id:
+        raise HTTPException(status_code=404, detail="Version not found")
+    return version
+
+def _touch(prompt: Prompt) -> None:
+    # Any change to a prompt or its versions moves updated_at, which its ETag is derived from.
+    prompt.updated_at = datetime.utcnow()
+
+def _prompt_changed(prompt_id: int) -> None:
+    prompt_template_cache.invalidate_prompt(prompt_id)
+    version_index.invalidate(f"prompt:{prompt_id}")
+
+async def _prompt_etag(session: AsyncSession, prompt_id: int) -> Optional[str]:
+    updated_at = (await session.exec(select(Prompt.updated_at).where(Prompt.id == prompt_id))).first()
+    return make_etag(prompt_id, updated_at) if updated_at is not None else None
+
+def _validate_execution_policy(policy_json: Optional[str]) -> None:
+    if policy_json:
+        try:
+            ExecutionPolicy.model_validate_json(policy_json)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Invalid execution_policy_json: {e}")
 
 @router.post("/", response_model=PromptRead)
-def create_prompt(
+async def create_prompt(
     prompt: PromptCreate, 
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
+    _validate_execution_policy(prompt.execution_policy_json)
     db_prompt = Prompt.from_orm(prompt)
     session.add(db_prompt)
-    session.commit()
-    session.refresh(db_prompt)
-    return db_prompt
+    await session.commit()
+    return await _prompt_read(session, db_prompt.id)
 
 @router.get("/", response_model=PromptPaginatedRead)
-def read_prompts(
+async def read_prompts(
     search: Optional[str] = None,
     sort_by: str = "created_at",
     order: str = "desc",
+    cursor: Optional[str] = None,
     skip: int = 0, 
-    limit: int = 10, 
-    session: Session = Depends(get_session),
+    limit: int = Query(10, ge=1, le=500),
+    count: Literal["exact", "estimate", "none"] = "exact",
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    query = select(Prompt)
+    """
+    Pass `next_cursor` from the previous page as `cursor` for keyset pagination;
+    `skip` (OFFSET) is still honoured when no cursor is given. `count=estimate`
+    (approximate, flagged by `total_is_estimate`) or `count=none` skip the
+    exact count, which is the default.
+    """
+    if sort_by not in SORTABLE_COLUMNS:
+        sort_by = "created_at"
+    dialect = engine.dialect.name
     
-    if search:
-        query = query.where(
-            (Prompt.name.contains(search)) | (Prompt.description.contains(search))
+    # One query for the page: each prompt's version count and active version summary
+    # come from a correlated count and an outer join, never from loading versions.
+    active = aliased(PromptVersion)
+    version_count = (
+        select(func.count(PromptVersion.id))
+        .where(PromptVersion.prompt_id == Prompt.id)
+        .correlate(Prompt)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Prompt,
+            version_count.label("version_count"),
+            active.id, active.version_number, active.created_at, active.commit_message
         )
+        .outerjoin(active, active.id == Prompt.active_version_id)
+    )
+    count_query = select(Prompt)
     
-    # Sorting
-    sort_column = getattr(Prompt, sort_by, Prompt.created_at)
-    if order == "desc":
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
-        
-    # Count total
-    from sqlmodel import func
-    total_query = select(func.count()).select_from(query.alias("sub"))
-    total = session.exec(total_query).one()
+    if search:
+        query = apply_search(query, search, dialect)
+        count_query = apply_search(count_query, search, dialect)
+    
+    total, total_is_estimate = await count_prompts(session, count_query, dialect, count, bool(search))
     
-    # Pagination
-    prompts = session.exec(query.offset(skip).limit(limit)).all()
+    # Sorting and pagination
+    try:
+        query = apply_keyset(query, sort_by, order, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not cursor and skip:
+        query = query.offset(skip)
+    rows = (await session.exec(query.limit(limit))).all()
+    
+    items = []
+    for prompt, versions, active_id, active_number, active_created_at, active_message in rows:
+        item = prompt.model_dump()
+        item["version_count"] = versions
+        item["active_version"] = {
+            "id": active_id,
+            "version_number": active_number,
+            "created_at": active_created_at,
+            "commit_message": active_message
+        } if active_id is not None else None
+        items.append(item)
+    
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1][0]
+        next_cursor = encode_cursor(getattr(last, sort_by), last.id)
     
     return {
-        "items": prompts,
+        "items": items,
         "total": total,
-        "page": (skip // limit) + 1,
-        "size": limit
+        "total_is_estimate": total_is_estimate,
+        "page": None if cursor else (skip // limit) + 1,
+        "size": limit,
+        "next_cursor": next_cursor
     }
 
+@router.get("/export")
+async def export_prompts(current_user: dict = Depends(get_current_user)):
+    """
+    The whole library as NDJSON, one prompt per line with all of its versions
+    and full templates; the format POST /prompts/import reads.
+    """
+    return stream_ndjson(export_ndjson(), filename="prompts.ndjson")
+
+@router.post("/import", response_model=PromptImportResult)
+async def import_prompts(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Reads an NDJSON body in the export format and upserts each line by prompt
+    name, versions by version_number. Fields a line leaves out keep their
+    current values. Lines are committed in batches, so a failure leaves the
+    batches before it in place; failed lines are listed with their line number.
+    """
+    return await import_ndjson(session, request.stream())
+
 @router.get("/{prompt_id}", response_model=PromptRead)
-def read_prompt(
+async def read_prompt(
     prompt_id: int, 
-    session: Session = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    prompt = session.get(Prompt, prompt_id)
+    """
+    Sends an ETag; polling with If-None-Match gets a 304 while the prompt is unchanged.
+    """
+    cached = await not_modified(request, f"prompt:{prompt_id}", lambda: _prompt_etag(session, prompt_id))
+    if cached is not None:
+        return cached
+    prompt = await _prompt_read(session, prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
+    etag = make_etag(prompt_id, prompt["updated_at"])
+    version_index.set(f"prompt:{prompt_id}", etag)
+    response.headers["ETag"] = etag
     return prompt
 
+@router.get("/{prompt_id}/versions", response_model=PromptVersionPage)
+async def read_prompt_versions(
+    prompt_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Version history, newest first, paginated by (version_number, id) keyset.
+    """
+    prompt = await session.get(Prompt, prompt_id)
+    if not prompt:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+    
+    query = select(PromptVersion).where(PromptVersion.prompt_id == prompt_id)
+    if cursor:
+        try:
+            version_number, version_id = decode_cursor(cursor, "version_number")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(
+            tuple_(PromptVersion.version_number, PromptVersion.id) < tuple_(version_number, version_id)
+        )
+    query = query.order_by(PromptVersion.version_number.desc(), PromptVersion.id.desc()).limit(limit)
+    versions = (await session.exec(query)).all()
+    
+    next_cursor = None
+    if len(versions) == limit:
+        next_cursor = encode_cursor(versions[-1].version_number, versions[-1].id)
+    return {"items": await _version_reads(session, versions), "next_cursor": next_cursor}
+
+@router.get("/{prompt_id}/versions/{version_id}", response_model=PromptVersionRead)
+async def read_prompt_version(
+    prompt_id: int,
+    version_id: int,
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    A single version with its full template, however large.
+    """
+    return await _version_read(session, await _get_version(session, prompt_id, version_id))
+
+@router.get("/{prompt_id}/versions/{from_version_id}/diff/{to_version_id}", response_model=PromptVersionDiff)
+async def diff_prompt_versions(
+    prompt_id: int,
+    from_version_id: int,
+    to_version_id: int,
+    context: int = Query(3, ge=0, le=100),
+    session: AsyncSession = Depends(get_session),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Unified diff of two versions' templates, computed server-side.
+    """
+    old = await _get_version(session, prompt_id, from_version_id)
+    new = await _get_version(session, prompt_id, to_version_id)
+    diff, added, removed = unified_diff(
+        await template_store.load(session, old.template_hash),
+        await template_store.load(session, new.template_hash),
+        f"v{old.version_number}", f"v{new.version_number}", context,
+    )
+    return {
+        "from_version_id": old.id,
+        "from_version_number": old.version_number,
+        "to_version_id": new.id,
+        "to_version_number": new.version_number,
+        "added_lines": added,
+        "removed_lines": removed,
+        "diff": diff,
+    }
+
 @router.patch("/{prompt_id}", response_model=PromptRead)
-def update_prompt(
+async def update_prompt(
     prompt_id: int,
     prompt_update: PromptUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    db_prompt = session.get(Prompt, prompt_id)
+    db_prompt = await session.get(Prompt, prompt_id)
     if not db_prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
     prompt_data = prompt_update.dict(exclude_unset=True)
+    _validate_execution_policy(prompt_data.get("execution_policy_json"))
     for key, value in prompt_data.items():
         setattr(db_prompt, key, value)
+    _touch(db_prompt)
     
     session.add(db_prompt)
-    session.commit()
-    session.refresh(db_prompt)
-    return db_prompt
+    await session.commit()
+    _prompt_changed(prompt_id)
+    return await _prompt_read(session, prompt_id)
 
-@router.post("/{prompt_id}/versions", response_model=PromptVersion)
-def create_prompt_version(
+@router.post("/{prompt_id}/versions", response_model=PromptVersionRead)
+async def create_prompt_version(
     prompt_id: int,
     version: PromptVersionCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    prompt = session.get(Prompt, prompt_id)
+    prompt = await session.get(Prompt, prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
-    db_version = PromptVersion(**version.dict(), prompt_id=prompt_id)
+    # Delta-encode against the latest version, which a new one usually edits.
+    previous_hash = (await session.exec(
+        select(PromptVersion.template_hash)
+        .where(PromptVersion.prompt_id == prompt_id)
+        .order_by(PromptVersion.version_number.desc())
+        .limit(1)
+    )).first()
+    template_hash = await template_store.store(session, version.template, previous_hash)
+    db_version = PromptVersion(**version.dict(exclude={"template"}), prompt_id=prompt_id, template_hash=template_hash)
     session.add(db_version)
-    session.commit()
-    session.refresh(db_version)
+    try:
+        # Assigns the id, so the version can be made active in the same commit.
+        await session.flush()
+    except IntegrityError:
+        # (prompt_id, version_number) is unique
+        await session.rollback()
+        raise HTTPException(status_code=409, detail=f"Version {version.version_number} already exists for this prompt")
     
-    # If this is the active version isn't set, set this one as active
+    # If no version is active yet, make this one active
     if not prompt.active_version_id:
         prompt.active_version_id = db_version.id
-        session.add(prompt)
-        session.commit()
-        session.refresh(db_version)
+    _touch(prompt)
+    session.add(prompt)
+    await session.commit()
+    _prompt_changed(prompt_id)
         
-    return db_version
+    return await _version_read(session, db_version)
 
 @router.post("/{prompt_id}/versions/{version_id}/set-active", response_model=PromptRead)
-def set_active_version(
+async def set_active_version(
     prompt_id: int,
     version_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    prompt = session.get(Prompt, prompt_id)
+    prompt = await session.get(Prompt, prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
-    version = session.get(PromptVersion, version_id)
-    if not version or version.prompt_id != prompt_id:
-        raise HTTPException(status_code=404, detail="Version not found")
+    await _get_version(session, prompt_id, version_id)
     
     prompt.active_version_id = version_id
+    _touch(prompt)
     session.add(prompt)
-    session.commit()
-    session.refresh(prompt)
-    return prompt
+    await session.commit()
+    _prompt_changed(prompt_id)
+    return await _prompt_read(session, prompt_id)
 
 @router.delete("/{prompt_id}/versions/{version_id}")
-def delete_prompt_version(
+async def delete_prompt_version(
     prompt_id: int,
     version_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    version = session.get(PromptVersion, version_id)
-    if not version or version.prompt_id != prompt_id:
-        raise HTTPException(status_code=404, detail="Version not found")
+    version = await _get_version(session, prompt_id, version_id)
     
-    prompt = session.get(Prompt, prompt_id)
+    prompt = await session.get(Prompt, prompt_id)
     if prompt.active_version_id == version_id:
         # Prevent deleting the active version unless it's the last one?
         # Or just unset it. Let's unset it for now.
         prompt.active_version_id = None
-        session.add(prompt)
+    _touch(prompt)
+    session.add(prompt)
     
-    session.delete(version)
-    session.commit()
+    await session.delete(version)
+    await template_store.release(session, [version.template_hash])
+    await session.commit()
+    prompt_template_cache.invalidate_version(version_id)
+    _prompt_changed(prompt_id)
     return {"message": "Version deleted successfully"}
 
-@router.patch("/{prompt_id}/versions/{version_id}", response_model=PromptVersion)
-def patch_prompt_version(
+@router.patch("/{prompt_id}/versions/{version_id}", response_model=PromptVersionRead)
+async def patch_prompt_version(
     prompt_id: int,
     version_id: int,
     version_update: PromptVersionUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    version = session.get(PromptVersion, version_id)
-    if not version or version.prompt_id != prompt_id:
-        raise HTTPException(status_code=404, detail="Version not found")
+    version = await _get_version(session, prompt_id, version_id)
     
     update_data = version_update.dict(exclude_unset=True)
+    template = update_data.pop("template", None)
+    replaced_hash = None
+    if template is not None:
+        template_hash = await template_store.store(session, template, version.template_hash)
+        if template_hash != version.template_hash:
+            replaced_hash, version.template_hash = version.template_hash, template_hash
     for key, value in update_data.items():
         setattr(version, key, value)
+    prompt = await session.get(Prompt, prompt_id)
+    _touch(prompt)
     
     session.add(version)
-    session.commit()
-    session.refresh(version)
-    return version
+    session.add(prompt)
+    if replaced_hash:
+        await template_store.release(session, [replaced_hash])
+    await session.commit()
+    await session.refresh(version)
+    prompt_template_cache.invalidate_version(version_id)
+    _prompt_changed(prompt_id)
+    return await _version_read(session, version)
 
 @router.delete("/{prompt_id}")
-def delete_prompt(
+async def delete_prompt(
     prompt_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    prompt = session.get(Prompt, prompt_id)
+    prompt = await _get_prompt(session, prompt_id)
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
-    session.delete(prompt)
-    session.commit()
+    version_ids = [version.id for version in prompt.versions]
+    template_hashes = [version.template_hash for version in prompt.versions]
+    await session.delete(prompt)
+    await template_store.release(session, template_hashes)
+    await session.commit()
+    for version_id in version_ids:
+        prompt_template_cache.invalidate_version(version_id)
+    _prompt_changed(prompt_id)
     return {"message": "Prompt deleted successfully"}
@@ -1,90 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import selectinload
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from datetime import datetime
 from app.core.database import get_session
+from app.core.responses import ORJSONResponse
+from app.core.etags import etag_matches, make_etag
 from app.models.provider import LLMProvider, LLMProviderRead, LLMModel, LLMModelRead, LLMProviderUpdate, LLMModelUpdate
 from app.core.auth import get_current_user
+from app.services.client_registry import get_client_registry
+from app.services.provider_catalog import bump_catalog_version, provider_catalog
+from app.services.providers import get_adapter, infer_provider_kind, normalize_provider_kind, resolve_provider_kind
+from app.services.resilience import forget_guard, guard_snapshots
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+async def _get_provider(session: AsyncSession, provider_id: int) -> Optional[LLMProvider]:
+    return await session.get(
+        LLMProvider, provider_id,
+        options=[selectinload(LLMProvider.models)],
+        populate_existing=True
+    )
+
+def _evict_client(background_tasks: BackgroundTasks, provider: LLMProvider) -> None:
+    # Only this provider's own pooled client; others sharing a base_url keep theirs.
+    try:
+        adapter = get_adapter(provider.kind or resolve_provider_kind(provider.name))
+    except ValueError:
+        return
+    key = adapter.client_key(provider.model_dump())
+    if key is not None:
+        background_tasks.add_task(get_client_registry().evict, key)
+
+async def _commit_change(session: AsyncSession) -> None:
+    """
+    Commits a provider or model change together with a catalog version bump,
+    then reloads this worker's catalog. Other workers see the bump on their next poll.
+    """
+    await bump_catalog_version(session)
+    await session.commit()
+    await provider_catalog.reload()
 
 @router.get("/", response_model=List[LLMProviderRead])
-def read_providers(
-    session: Session = Depends(get_session),
+async def read_providers(
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
-    providers = session.exec(select(LLMProvider)).all()
-    return providers
+    """
+    Served from the in-memory provider catalog. Sends an ETag; polling with
+    If-None-Match gets a 304 while no provider or model has changed.
+    """
+    content = await provider_catalog.list_json()
+    etag = make_etag("providers", provider_catalog.version)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=content, media_type="application/json", headers={"ETag": etag})
+
+@router.get("/status")
+async def read_provider_status(current_user: dict = Depends(get_current_user)):
+    """
+    Circuit breaker state, in-flight calls and limiter queue depth per provider.
+    """
+    return guard_snapshots()
 
 @router.post("/", response_model=LLMProviderRead)
-def create_provider(
+async def create_provider(
     provider: LLMProvider,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
+    provider.kind = normalize_provider_kind(provider.kind) if provider.kind else infer_provider_kind(provider.name)
     session.add(provider)
-    session.commit()
-    session.refresh(provider)
-    return provider
+    await _commit_change(session)
+    return await _get_provider(session, provider.id)
 
 @router.delete("/{provider_id}")
-def delete_provider(
+async def delete_provider(
     provider_id: int,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    provider = session.get(LLMProvider, provider_id)
+    provider = await _get_provider(session, provider_id)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider not found")
-    session.delete(provider)
-    session.commit()
+    _evict_client(background_tasks, provider)
+    forget_guard(provider_id)
+    await session.delete(provider)
+    await _commit_change(session)
     return {"message": "Provider deleted successfully"}
 
 @router.patch("/{provider_id}", response_model=LLMProviderRead)
-def patch_provider(
+async def patch_provider(
     provider_id: int,
     provider_update: LLMProviderUpdate,
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    db_provider = session.get(LLMProvider, provider_id)
+    db_provider = await session.get(LLMProvider, provider_id)
     if not db_provider:
         raise HTTPException(status_code=404, detail="Provider not found")
     
+    # Pooled clients are keyed by the old credentials; drop them once the change lands.
+    _evict_client(background_tasks, db_provider)
+    # New credentials or limits start with a fresh breaker and buckets.
+    forget_guard(provider_id)
     update_data = provider_update.dict(exclude_unset=True)
+    if update_data.get("kind"):
+        update_data["kind"] = normalize_provider_kind(update_data["kind"])
     for key, value in update_data.items():
         setattr(db_provider, key, value)
+    db_provider.updated_at = datetime.utcnow()
     
     session.add(db_provider)
-    session.commit()
-    session.refresh(db_provider)
-    return db_provider
+    await _commit_change(session)
+    return await _get_provider(session, provider_id)
 
 @router.post("/{provider_id}/models", response_model=LLMModelRead)
-def create_model(
+async def create_model(
     provider_id: int,
     model: LLMModel,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    provider = session.get(LLMProvider, provider_id)
+    provider = await session.get(LLMProvider, provider_id)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider not found")
     model.provider_id = provider_id
     session.add(model)
-    session.commit()
-    session.refresh(model)
+    provider.updated_at = datetime.utcnow()
+    session.add(provider)
+    await _commit_change(session)
+    await session.refresh(model)
     return model
 
 @router.delete("/{provider_id}/models/{model_id}")
-def delete_model(
+async def delete_model(
     provider_id: int,
     model_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     current_user: dict = Depends(get_current_user)
 ):
-    model = session.get(LLMModel, model_id)
+    model = await session.get(LLMModel, model_id)
     if not model or model.provider_id != provider_id:
         raise HTTPException(status_code=404, detail="Model not found")
-    session.delete(model)
-    session.commit()
+    await session.delete(model)
+    provider = await session.get(LLMProvider, provider_id)
+    provider.updated_at = datetime.utcnow()
+    session.add(provider)
+    await _commit_change(session)
     return {"message": "Model deleted successfully"}
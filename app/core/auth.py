@@ -1,34 +1,283 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import firebase_admin
-from firebase_admin import auth, credentials
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import importlib
+import re
+import threading
+import time
+import httpx
 from app.core.config import settings
+from app.core.metrics import record_auth, record_cache_lookup
 
-# Initialize Firebase Admin SDK
-# Check if app is already initialized to avoid errors during reloads
-if not firebase_admin._apps:
-    if settings.FIREBASE_CREDENTIALS_PATH:
-        cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
-        firebase_admin.initialize_app(cred)
-    else:
-        # Development mode without explicit credentials (e.g., using ADC or mock) 
-        # or warn if not configured.
-        print("WARNING: Firebase credentials path not set. Auth may fail if not using ADC.")
-        try:
-             firebase_admin.initialize_app()
-        except Exception as e:
-            print(f"Failed to initialize firebase default app: {e}")
+_firebase_lock = threading.Lock()
+
+
+def _firebase_app():
+    """
+    Imports and initializes the Firebase Admin SDK on first use rather than at
+    import time, keeping it off the cold-start path. With FIREBASE_PROJECT_ID
+    set and signing keys fetched, token verification never needs it.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _firebase_lock:
+        # Check if app is already initialized to avoid errors during reloads
+        if not firebase_admin._apps:
+            if settings.FIREBASE_CREDENTIALS_PATH:
+                cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS_PATH)
+                firebase_admin.initialize_app(cred)
+            else:
+                # Development mode without explicit credentials (e.g., using ADC or mock)
+                # or warn if not configured.
+                print("WARNING: Firebase credentials path not set. Auth may fail if not using ADC.")
+                try:
+                     firebase_admin.initialize_app()
+                except Exception as e:
+                    print(f"Failed to initialize firebase default app: {e}")
+        return firebase_admin.get_app()
 
 security = HTTPBearer()
 
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+LOCAL_TOKEN_ISSUER = "prompt-pro-local"
+
+
+class TokenCache:
+    """
+    Verified claims keyed by sha256(token). An entry never outlives the
+    token's own `exp`, so a cached token stops working exactly when the
+    token would have failed verification anyway.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self.key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return claims
+
+    def set(self, token: str, claims: Dict[str, Any]) -> None:
+        expires_at = claims.get("exp")
+        if not expires_at:
+            return
+        self._entries[self.key(token)] = (claims, float(expires_at))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class FirebaseKeyStore:
+    """
+    Google's securetoken signing certificates, fetched and refreshed by a
+    background task so verification never fetches keys on the request path.
+    """
+
+    def __init__(self, url: str = FIREBASE_CERTS_URL, min_refresh_seconds: int = 300):
+        self.url = url
+        self.min_refresh_seconds = min_refresh_seconds
+        self.certs: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> float:
+        """
+        Fetches the certificates and returns the seconds until they should be refreshed.
+        """
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        self.certs = response.json()
+        match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        max_age = int(match.group(1)) if match else 3600
+        # Refresh well before Google rotates keys out.
+        return max(self.min_refresh_seconds, max_age * 0.8)
+
+    async def _refresh_forever(self) -> None:
+        # Load the JWT verifier here rather than on the first request.
+        await asyncio.to_thread(importlib.import_module, "google.auth.jwt")
+        while True:
+            try:
+                delay = await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WARNING: Failed to refresh Firebase signing keys: {e}")
+                delay = 30
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+token_cache = TokenCache(max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES)
+key_store = FirebaseKeyStore()
+
+
+# Project id discovered from the Admin SDK's credentials when FIREBASE_PROJECT_ID is unset
+_discovered_project_id: Optional[str] = None
+_project_id_task: Optional[asyncio.Task] = None
+
+
+def _discover_project_id() -> Optional[str]:
+    # Blocking: initializing the Admin SDK looks up credentials.
+    try:
+        return _firebase_app().project_id
+    except Exception:
+        return None
+
+
+async def _resolve_project_id() -> None:
+    global _discovered_project_id
+    _discovered_project_id = await asyncio.to_thread(_discover_project_id)
+
+
+def _firebase_project_id() -> Optional[str]:
+    # Never discovers on the request path; until start_auth's lookup finishes,
+    # tokens go through the Admin SDK (in a thread) instead.
+    return settings.FIREBASE_PROJECT_ID or _discovered_project_id
+
+
+def _verify_firebase_locally(token: str, project_id: str) -> Dict[str, Any]:
+    # Same checks as firebase_admin.auth.verify_id_token, against the pre-fetched keys.
+    from google.auth import jwt
+
+    claims = jwt.decode(token, certs=key_store.certs, audience=project_id, clock_skew_in_seconds=5)
+    if claims.get("iss") != f"https://securetoken.google.com/{project_id}":
+        raise ValueError("Firebase ID token has incorrect issuer")
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Firebase ID token has invalid subject")
+    claims["uid"] = subject
+    return claims
+
+
+def _verify_with_admin_sdk(token: str) -> Dict[str, Any]:
+    from firebase_admin import auth
+
+    _firebase_app()
+    return auth.verify_id_token(token)
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def create_local_token(uid: str, expires_in: int = 3600, **claims: Any) -> str:
+    """
+    Mints an HS256 token for AUTH_MODE=local, used to benchmark and test
+    the API without Firebase.
+    """
+    if not settings.AUTH_LOCAL_SECRET:
+        raise ValueError("AUTH_LOCAL_SECRET is not set")
+    now = int(time.time())
+    header = {"alg": "HS256", "typ": "JWT"}
+    payload = {"iss": LOCAL_TOKEN_ISSUER, "sub": uid, "uid": uid, "iat": now, "exp": now + expires_in, **claims}
+    signing_input = f"{_b64url_encode(json.dumps(header).encode())}.{_b64url_encode(json.dumps(payload).encode())}"
+    signature = hmac.new(settings.AUTH_LOCAL_SECRET.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64url_encode(signature)}"
+
+
+def _verify_local(token: str) -> Dict[str, Any]:
+    if not settings.AUTH_LOCAL_SECRET:
+        raise ValueError("AUTH_LOCAL_SECRET is not set")
+    try:
+        signing_input, signature = token.rsplit(".", 1)
+        payload = json.loads(_b64url_decode(signing_input.split(".", 1)[1]))
+    except (ValueError, IndexError):
+        raise ValueError("Malformed token")
+    expected = hmac.new(settings.AUTH_LOCAL_SECRET.encode(), signing_input.encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, _b64url_decode(signature)):
+        raise ValueError("Invalid token signature")
+    if payload.get("iss") != LOCAL_TOKEN_ISSUER:
+        raise ValueError("Token has incorrect issuer")
+    if payload.get("exp", 0) <= time.time():
+        raise ValueError("Token expired")
+    return payload
+
+
+async def verify_token(token: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    claims = token_cache.get(token)
+    record_cache_lookup("auth_token", claims is not None)
+    if claims is not None:
+        record_auth(time.perf_counter() - started, cached=True)
+        return claims
+
+    if settings.AUTH_MODE == "local":
+        claims = _verify_local(token)
+    else:
+        project_id = _firebase_project_id()
+        if project_id and key_store.certs:
+            # Signature checks are CPU-bound; keep them off the event loop.
+            claims = await asyncio.to_thread(_verify_firebase_locally, token, project_id)
+        else:
+            # Keys not fetched yet (or no project id): let the Admin SDK do the full check.
+            claims = await asyncio.to_thread(_verify_with_admin_sdk, token)
+
+    token_cache.set(token, claims)
+    record_auth(time.perf_counter() - started, cached=False)
+    return claims
+
+
+async def start_auth() -> None:
+    global _project_id_task
+    if settings.AUTH_MODE == "firebase":
+        key_store.start()
+        if not settings.FIREBASE_PROJECT_ID and _project_id_task is None:
+            # In the background, so credential discovery doesn't hold up startup.
+            _project_id_task = asyncio.create_task(_resolve_project_id())
+
+
+async def stop_auth() -> None:
+    global _project_id_task
+    await key_store.stop()
+    if _project_id_task is not None:
+        _project_id_task.cancel()
+        await asyncio.gather(_project_id_task, return_exceptions=True)
+        _project_id_task = None
+
+
 async def get_current_user(token: HTTPAuthorizationCredentials = Depends(security)):
     """
     Verifies the Firebase ID token and returns the decoded token (user info).
     """
     try:
-        decoded_token = auth.verify_id_token(token.credentials)
-        return decoded_token
+        return await verify_token(token.credentials)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,185 @@
+import gzip
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+# Server preference when the client accepts several at the same q-value
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Picks the encoding to use from an Accept-Encoding header, honouring
+    q-values (q=0 refuses an encoding; * stands for any not listed).
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        # Streams flush after every chunk so NDJSON lines reach the client as they're produced.
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if finish else self._brotli.flush())
+        out = self._gzip.compress(data)
+        return out + self._gzip.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+
+def compress_body(body: bytes, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI gzip/brotli response compression negotiated on Accept-Encoding.
+
+    Complete bodies are compressed only from `minimum_size` bytes up; streamed
+    bodies are compressed chunk by chunk. Responses that already carry a
+    Content-Encoding and excluded media types (server-sent events, which must
+    reach the client unbuffered) pass through untouched.
+
+    A strong ETag can't be shared by differently encoded bodies, so responses
+    to clients that accept compression (304s included) carry it weakened;
+    If-None-Match uses weak comparison, so W/"x" still matches "x".
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        excluded_media_types: Tuple[str, ...] = ("text/event-stream",),
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_media_types = excluded_media_types
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = {key.lower(): value for key, value in message.get("headers", [])}
+                media_type = headers.get(b"content-type", b"").split(b";")[0].decode("latin-1").strip()
+                if b"content-encoding" in headers or media_type in self.excluded_media_types:
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until the first body chunk shows whether compression pays off.
+                    start = {**message, "headers": _weak_etag(message.get("headers", []))}
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    start["headers"] = _with_headers(start.get("headers", []), [(b"vary", b"Accept-Encoding")])
+                    await send(start)
+                    await send(message)
+                    return
+                if not more_body:
+                    body = compress_body(body, encoding, self.gzip_level, self.brotli_quality)
+                    length = [(b"content-length", str(len(body)).encode("latin-1"))]
+                else:
+                    compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                    body = compressor.compress(body, finish=False)
+                    length = []
+                start["headers"] = _with_headers(
+                    start.get("headers", []),
+                    [(b"content-encoding", encoding.encode("latin-1")), (b"vary", b"Accept-Encoding"), *length],
+                    drop=(b"content-length",),
+                )
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                if not more_body:
+                    passthrough = True
+                return
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, finish=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _weak_etag(headers) -> list:
+    return [
+        (key, b"W/" + value if key.lower() == b"etag" and not value.startswith(b"W/") else value)
+        for key, value in headers
+    ]
+
+
+def _with_headers(headers, extra: List[Tuple[bytes, bytes]], drop: Tuple[bytes, ...] = ()) -> list:
+    result = [(key, value) for key, value in headers if key.lower() not in drop]
+    for key, value in extra:
+        existing = next((i for i, (k, _) in enumerate(result) if k.lower() == key), None)
+        if key == b"vary" and existing is not None:
+            # Append to an existing Vary (CORS sets Vary: Origin) instead of replacing it.
+            current = result[existing][1]
+            if value.lower() not in current.lower():
+                result[existing] = (result[existing][0], current + b", " + value)
+        else:
+            if existing is not None:
+                result.pop(existing)
+            result.append((key, value))
+    return result
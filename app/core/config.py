@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Prompt Management App"
@@ -18,13 +18,117 @@ class Settings(BaseSettings):
              return self.DATABASE_URL.replace("sqlite:///./", "sqlite:////tmp/")
         return self.DATABASE_URL
 
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    # Schema changes normally run as a separate step (python -m app.migrate).
+    # None: only migrate at startup for SQLite, whose file may be ephemeral (Cloud Run /tmp).
+    DB_MIGRATE_ON_STARTUP: Optional[bool] = None
+
+    @property
+    def MIGRATE_ON_STARTUP(self) -> bool:
+        if self.DB_MIGRATE_ON_STARTUP is not None:
+            return self.DB_MIGRATE_ON_STARTUP
+        return self.DATABASE_URL.startswith("sqlite")
+
     # Firebase
     FIREBASE_CREDENTIALS_PATH: Optional[str] = None
+    FIREBASE_PROJECT_ID: Optional[str] = None
+
+    # Auth: "firebase" verifies Firebase ID tokens; "local" verifies HS256 tokens
+    # signed with AUTH_LOCAL_SECRET (offline benchmarks and tests only).
+    AUTH_MODE: str = "firebase"
+    AUTH_LOCAL_SECRET: Optional[str] = None
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
     
     # Models
     OPENAI_API_KEY: Optional[str] = None
     GEMINI_API_KEY: Optional[str] = None
     OLLAMA_BASE_URL: str = "http://localhost:11434"
+    # Extra provider kinds: {"kind": "module:AdapterClass"} or {"kind": "openai"} to alias an existing adapter
+    PROVIDER_ADAPTERS: Dict[str, str] = {}
+
+    # Upstream HTTP connection pooling
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_HTTP2: bool = True
+    LLM_HTTP_TIMEOUT: float = 60.0
+    # How long a replaced provider's client stays open for requests already using it
+    LLM_CLIENT_CLOSE_GRACE_SECONDS: float = 300.0
+
+    # Upstream resilience: retries, local rate limiting, circuit breaking
+    LLM_RETRY_MAX_ATTEMPTS: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_RETRY_MAX_DELAY: float = 20.0
+    LLM_RATE_LIMIT_MAX_WAIT: float = 30.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RECOVERY_SECONDS: float = 30.0
+
+    # Response cache (opt-in; only deterministic requests are cached)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_TTL_SECONDS: int = 24 * 3600
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1024
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_PERSIST: bool = True
+
+    # Requests with coalesce=true share one upstream call with identical requests in flight
+    COALESCING_ENABLED: bool = True
+
+    # Batch execution fan-out
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_DEFAULT_CONCURRENCY: int = 4
+    BATCH_PROVIDER_CONCURRENCY: Dict[str, int] = {"openai": 8, "gemini": 4, "ollama": 2}
+
+    # Background jobs. Items are leased from the database, so any number of
+    # workers (in-process or `python -m app.worker`) can share the queue.
+    JOB_MAX_ITEMS: int = 100000
+    JOB_WORKER_IN_PROCESS: bool = True
+    JOB_WORKER_CONCURRENCY: int = 8
+    JOB_LEASE_SECONDS: float = 60.0
+    JOB_POLL_SECONDS: float = 1.0
+    JOB_ITEM_MAX_ATTEMPTS: int = 3
+
+    # Compiled prompt templates
+    TEMPLATE_CACHE_MAX_ENTRIES: int = 512
+    TEMPLATE_CACHE_TTL_SECONDS: float = 300.0
+
+    # Template blob storage: larger templates are compressed, stored as deltas
+    # against the previous version, and left out of list responses.
+    TEMPLATE_COMPRESS_MIN_BYTES: int = 1024
+    TEMPLATE_DELTA_ENABLED: bool = True
+    TEMPLATE_DELTA_MAX_CHAIN: int = 8
+
+    # Bulk prompt import: lines are written in transactions of about this many versions
+    PROMPT_IMPORT_BATCH_VERSIONS: int = 2000
+    PROMPT_IMPORT_MAX_ERRORS: int = 1000
+
+    # Execution log: rows are buffered and inserted in batches by a background task
+    EXECUTION_LOG_ENABLED: bool = True
+    EXECUTION_LOG_BATCH_SIZE: int = 200
+    EXECUTION_LOG_FLUSH_SECONDS: float = 1.0
+    EXECUTION_LOG_MAX_QUEUE: int = 10000
+    # USD per million tokens by model name, e.g. {"gpt-4o": {"input": 2.5, "output": 10.0}}
+    MODEL_PRICING: Dict[str, Dict[str, float]] = {}
+
+    # Providers and models are served from memory; other workers' changes are picked up within this interval
+    PROVIDER_CATALOG_REFRESH_SECONDS: float = 2.0
+
+    # Conditional GETs: how long a cached ETag is trusted before re-checking the DB
+    ETAG_INDEX_TTL_SECONDS: float = 5.0
+    ETAG_INDEX_MAX_ENTRIES: int = 10000
+
+    # Response compression, negotiated on Accept-Encoding (brotli when installed, else gzip)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Observability: Prometheus /metrics and per-stage Server-Timing headers
+    METRICS_ENABLED: bool = True
+    SERVER_TIMING_ENABLED: bool = True
 
     class Config:
         env_file = ".env"
@@ -1,16 +1,34 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+
+def async_database_url(url: str) -> str:
+    # aiosqlite for local SQLite files, asyncpg for Postgres
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
 
 # Setup database connection
-# check_same_thread=False is needed only for SQLite
-connect_args = {"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+engine_kwargs = {"echo": settings.DB_ECHO, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+if "sqlite" not in settings.DATABASE_URL:
+    engine_kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+
+engine = create_async_engine(async_database_url(settings.SQLALCHEMY_DATABASE_URI), **engine_kwargs)
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, echo=True, connect_args=connect_args)
+if settings.METRICS_ENABLED:
+    instrument_engine(engine.sync_engine)
 
-def create_db_and_tables():
-    from app import models # noqa: F401
-    SQLModel.metadata.create_all(engine)
+async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
-def get_session():
-    with Session(engine) as session:
+async def get_session():
+    async with async_session_maker() as session:
         yield session
@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+def make_etag(*parts) -> str:
+    """
+    Strong ETag from the values that identify a representation's version,
+    e.g. (prompt id, updated_at).
+    """
+    values = []
+    for part in parts:
+        if isinstance(part, datetime):
+            part = int(part.timestamp() * 1_000_000)
+        values.append(format(part, "x") if isinstance(part, int) else str(part))
+    return '"' + "-".join(values) + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" matches "x".
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+class VersionIndex:
+    """
+    Current ETag per resource key ("prompt:42", "providers"), so conditional
+    GETs can be answered without touching the database. Mutation handlers in
+    this process invalidate their keys; the TTL bounds how long a change made
+    by another instance can go unnoticed.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] >= self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    def set(self, key: str, etag: str) -> None:
+        self._entries[key] = (etag, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+version_index = VersionIndex(
+    ttl_seconds=settings.ETAG_INDEX_TTL_SECONDS,
+    max_entries=settings.ETAG_INDEX_MAX_ENTRIES,
+)
+
+
+async def not_modified(
+    request: Request,
+    key: str,
+    current_etag: Callable[[], Awaitable[Optional[str]]],
+) -> Optional[Response]:
+    """
+    A 304 response when the request's If-None-Match still matches `key`.
+    The ETag comes from the version index, or else from `current_etag`,
+    which should be a cheap query (no row bodies, no relationships).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    etag = version_index.get(key)
+    if etag is None:
+        etag = await current_etag()
+        if etag is None:
+            return None
+        version_index.set(key, etag)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
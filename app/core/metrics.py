@@ -0,0 +1,218 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+from app.core.config import settings
+
+# Buckets cover both sub-millisecond DB/auth work and multi-second LLM calls.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served", multiprocess_mode="livesum",
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Time spent executing a single SQL statement", buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+AUTH_SECONDS = Histogram(
+    "auth_verification_duration_seconds", "Time spent verifying a bearer token",
+    ["cached"], buckets=LATENCY_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_duration_seconds", "Upstream completion latency by provider and model",
+    ["provider", "model", "outcome"], buckets=LATENCY_BUCKETS,
+)
+LLM_TTFT_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds", "Upstream time to first streamed token",
+    ["provider", "model"], buckets=LATENCY_BUCKETS,
+)
+LLM_ERRORS = Counter(
+    "llm_upstream_errors_total", "Failed upstream calls by error type",
+    ["provider", "model", "error"],
+)
+LLM_IN_FLIGHT = Gauge(
+    "llm_requests_in_flight", "Upstream calls currently open",
+    ["provider"], multiprocess_mode="livesum",
+)
+LLM_COALESCED_REQUESTS = Counter(
+    "llm_coalesced_requests_total", "Executions that opted into coalescing, by whether they started or joined an upstream call",
+    ["mode", "role"],
+)
+LLM_COALESCE_CALLERS = Histogram(
+    "llm_coalesce_callers", "Callers that shared one upstream call",
+    ["mode"], buckets=(1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+
+
+class RequestTimings:
+    """
+    Per-request accumulator behind the Server-Timing header.
+    """
+
+    __slots__ = ("stages", "db_queries")
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.db_queries = 0
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_coalesced_request(mode: str, joined: bool) -> None:
+    # Coalescing ratio: rate of role="joined" over the rate of all roles.
+    LLM_COALESCED_REQUESTS.labels(mode, "joined" if joined else "started").inc()
+
+
+def record_coalesced_flight(mode: str, callers: int) -> None:
+    LLM_COALESCE_CALLERS.labels(mode).observe(callers)
+
+
+def record_auth(seconds: float, cached: bool) -> None:
+    AUTH_SECONDS.labels("true" if cached else "false").observe(seconds)
+    record_stage("auth", seconds)
+
+
+def record_upstream(provider: str, model: str, seconds: float, error: Optional[BaseException] = None) -> None:
+    LLM_REQUEST_SECONDS.labels(provider, model, "error" if error else "ok").observe(seconds)
+    if error is not None:
+        LLM_ERRORS.labels(provider, model, type(error).__name__).inc()
+    record_stage("upstream", seconds)
+
+
+def instrument_engine(sync_engine) -> None:
+    """
+    Times every SQL statement on the engine and attributes it to the current request.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.add("db", elapsed)
+            timings.db_queries += 1
+
+
+def route_label(scope) -> str:
+    """
+    The matched route's template with its router prefix, e.g.
+    "/api/v1/prompts/{prompt_id}". Newer FastAPI keeps an included router's
+    prefix out of route.path, so the prefix is taken from the request path:
+    the literal part in front of what the route itself matched.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    regex = getattr(route, "path_regex", None)
+    if regex is not None and not regex.match(path):
+        for index, char in enumerate(path):
+            if char == "/" and index and regex.match(path[index:]):
+                return path[:index] + template
+    return template
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no response buffering, so streams pass straight
+    through): route latency, in-flight gauge, per-request DB query counts and
+    a Server-Timing header built from the stages recorded during the request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    header = timings.server_timing(time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", header.encode("latin-1"))
+                    ]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            _timings.reset(token)
+            # Label by route template, not raw path, to keep cardinality bounded.
+            route = route_label(scope)
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(timings.db_queries)
+
+
+def render_metrics() -> bytes:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Several worker processes: aggregate their files instead of this process' registry.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
@@ -0,0 +1,30 @@
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+__all__ = ["ORJSONResponse", "stream_ndjson"]
+
+# Lines are coalesced into chunks of about this size before being sent.
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+async def _coalesce(lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for line in lines:
+        buffer += line
+        if len(buffer) >= STREAM_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def stream_ndjson(lines: AsyncIterator[bytes], filename: Optional[str] = None) -> StreamingResponse:
+    """
+    Streams newline-terminated JSON lines, so a large collection is never
+    held in memory as one document. The generator runs after the endpoint
+    returns, when request-scoped dependencies (the DB session) are already
+    closed; it must open whatever it reads from.
+    """
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'} if filename else None
+    return StreamingResponse(_coalesce(lines), media_type="application/x-ndjson", headers=headers)
@@ -1,19 +1,41 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 from contextlib import asynccontextmanager
+import asyncio
 from app.core.config import settings
-from app.core.database import create_db_and_tables
-from app.api.v1.api import api_router
-from app.api.v1.endpoints import prompts, execute, providers
+from app.core.auth import start_auth, stop_auth
+from app.migrate import migrate
+from app.services.execution_log import execution_writer
+from app.services.jobs import job_worker
+from app.services.provider_catalog import provider_catalog
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.services.client_registry import init_client_registry, close_client_registry
+from app.api.v1.endpoints import prompts, execute, providers, executions, jobs, evaluations
 from fastapi.middleware.cors import CORSMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Initialize database
     print("Startup: Initializing application...")
-    create_db_and_tables()
+    if settings.MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate, configure_logging=False)
+    app.state.client_registry = init_client_registry()
+    await start_auth()
+    if settings.EXECUTION_LOG_ENABLED:
+        execution_writer.start()
+    # Loads in the background; a request that arrives first waits for the same load.
+    provider_catalog.start()
+    if settings.JOB_WORKER_IN_PROCESS:
+        job_worker.start()
     yield
     # Shutdown: Cleanup
     print("Shutdown: Cleaning up...")
+    await job_worker.stop()
+    await provider_catalog.stop()
+    await execution_writer.stop()
+    await stop_auth()
+    await close_client_registry()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -29,11 +51,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser devtools show the per-stage breakdown
+    expose_headers=["Server-Timing"],
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_BYTES,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+# Added last so it wraps compression too and times the whole response
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(prompts.router, prefix="/api/v1/prompts", tags=["prompts"])
 app.include_router(execute.router, prefix="/api/v1/execute", tags=["execute"])
 app.include_router(providers.router, prefix="/api/v1/providers", tags=["providers"])
+app.include_router(executions.router, prefix="/api/v1/executions", tags=["executions"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
+app.include_router(evaluations.router, prefix="/api/v1/evaluations", tags=["evaluations"])
 
 @app.get("/")
 async def root():
@@ -42,3 +81,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
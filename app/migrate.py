@@ -0,0 +1,32 @@
+"""
+Applies pending schema migrations outside the app's boot path:
+
+    python -m app.migrate            # upgrade to the latest revision
+    python -m app.migrate 0002       # or to a given one
+
+Run it before starting (or deploying) a new version. Other Alembic commands
+(history, downgrade, revision --autogenerate) work through `alembic` with the
+repository's alembic.ini.
+"""
+import os
+import sys
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+
+def migrate(revision: str = "head", configure_logging: bool = True) -> None:
+    """
+    Runs `alembic upgrade`. Blocking, and it runs its own event loop, so call it
+    from a worker thread when inside one.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logging"] = configure_logging
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else "head")
+    print("Database schema is up to date.")
@@ -1,2 +1,8 @@
 from .prompt import Prompt, PromptVersion
 from .provider import LLMProvider, LLMModel
+from .cache import CachedResponse
+from .execution import Execution
+from .template import TemplateBlob
+from .catalog import CatalogVersion
+from .job import Job, JobItem
+from .evaluation import Evaluation
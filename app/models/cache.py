@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+from typing import Optional
+from datetime import datetime
+
+class CachedResponse(SQLModel, table=True):
+    key: str = Field(primary_key=True, max_length=64)  # sha256 of the normalized request
+    response: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = Field(default=None, index=True)
@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class CatalogVersion(SQLModel, table=True):
+    # One row per in-process catalog ("providers"); writers bump it in the same
+    # transaction as their change so other workers know to reload.
+    name: str = Field(primary_key=True, max_length=64)
+    version: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,59 @@
+from sqlmodel import SQLModel, Field
+from typing import Any, Dict, List, Literal, Optional
+from datetime import datetime
+
+class EvaluationVariant(SQLModel):
+    # Defaults to "<model_name> @ version <version_id>"
+    label: Optional[str] = None
+    version_id: int
+    provider_id: Optional[int] = None
+    model_provider: str
+    model_name: str
+    config: Optional[Dict[str, Any]] = None
+
+class EvaluationRow(SQLModel):
+    variables: Dict[str, Any] = {}
+    expected: Optional[str] = None
+
+class MetricSpec(SQLModel):
+    # exact_match, regex, json_schema, length, latency, tokens, cost
+    type: str
+    # Defaults to the type; needed to use one type twice
+    name: Optional[str] = None
+    # Type-specific: case_sensitive, pattern, ignore_case, schema
+    params: Dict[str, Any] = {}
+
+class EvaluationCreate(SQLModel):
+    name: str
+    dataset: List[EvaluationRow]
+    variants: List[EvaluationVariant]
+    metrics: List[MetricSpec] = [MetricSpec(type="latency"), MetricSpec(type="cost")]
+    # Index into variants that the others are compared against
+    baseline: int = 0
+    # Bypass by default: a cache hit has no upstream latency, tokens or cost to compare
+    cache_mode: Literal["default", "bypass", "refresh"] = "bypass"
+
+class EvaluationBase(SQLModel):
+    name: str
+    user_id: Optional[str] = Field(default=None, index=True)
+    job_id: int = Field(foreign_key="job.id", index=True)
+    rows: int
+    baseline: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Evaluation(EvaluationBase, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # JSON: variants and metric specs as submitted, one expected output (or null) per row
+    variants_json: str
+    metrics_json: str
+    expected_json: str
+    # Final report, stored once every item has finished
+    report_json: Optional[str] = None
+
+class EvaluationRead(EvaluationBase):
+    id: int
+    variants: List[EvaluationVariant]
+    metrics: List[MetricSpec]
+    status: str
+    succeeded_items: int = 0
+    failed_items: int = 0
@@ -0,0 +1,36 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+
+class ExecutionBase(SQLModel):
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    user_id: Optional[str] = Field(default=None, index=True)
+    # Executions outlive the prompt versions and providers they ran against.
+    prompt_id: Optional[int] = Field(default=None, foreign_key="prompt.id", ondelete="SET NULL")
+    prompt_version_id: Optional[int] = Field(default=None, foreign_key="promptversion.id", ondelete="SET NULL")
+    provider_id: Optional[int] = Field(default=None, foreign_key="llmprovider.id", ondelete="SET NULL")
+    model_provider: str
+    model_name: str
+    status: str  # ok, error, cached, coalesced, cancelled
+    error: Optional[str] = None
+    streamed: bool = False
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    time_to_first_token_ms: Optional[float] = None
+    latency_ms: float
+    cost_usd: Optional[float] = None
+    metadata_json: Optional[str] = None # JSON provider extras (finish reason, Ollama timings, ...)
+
+class Execution(ExecutionBase, table=True):
+    # Aggregates filter on a time window and group by version or model
+    __table_args__ = (
+        Index("ix_execution_created_at", "created_at"),
+        Index("ix_execution_version_created_at", "prompt_version_id", "created_at"),
+        Index("ix_execution_model_created_at", "model_name", "created_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+class ExecutionRead(ExecutionBase):
+    id: int
@@ -0,0 +1,54 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+
+class JobBase(SQLModel):
+    kind: str = Field(max_length=32)  # execute
+    user_id: Optional[str] = Field(default=None, index=True)
+    status: str = "queued"  # queued, running, completed, cancelled
+    total_items: int = 0
+    succeeded_items: int = 0
+    failed_items: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class Job(JobBase, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+class JobRead(JobBase):
+    id: int
+
+class JobItemBase(SQLModel):
+    job_id: int = Field(foreign_key="job.id", ondelete="CASCADE")
+    position: int
+    status: str = "pending"  # pending, running, succeeded, failed, cancelled
+    error: Optional[str] = None
+    # Claims so far; an item whose worker keeps dying is eventually failed
+    attempts: int = 0
+    finished_at: Optional[datetime] = None
+
+class JobItem(JobItemBase, table=True):
+    __table_args__ = (
+        # Result paging walks a job's items in order
+        Index("ix_jobitem_job_id_position", "job_id", "position", unique=True),
+        # Workers claim pending items and running ones whose lease has expired
+        Index("ix_jobitem_status_lease_expires_at", "status", "lease_expires_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    payload_json: str
+    result_json: Optional[str] = None
+    # Worker holding the item and until when; renewed while it runs
+    lease_owner: Optional[str] = Field(default=None, max_length=128)
+    lease_expires_at: Optional[datetime] = None
+
+class JobItemRead(JobItemBase):
+    id: int
+    result: Optional[Dict[str, Any]] = None
+
+class JobItemPage(SQLModel):
+    items: List[JobItemRead]
+    # Pass as `after` for the next page
+    next_after: Optional[int] = None
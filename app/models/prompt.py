@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import List, Optional
 from datetime import datetime
 import uuid
@@ -7,40 +8,70 @@ class PromptBase(SQLModel):
     name: str = Field(index=True)
     description: Optional[str] = None
     tags: Optional[str] = None  # Comma-separated tags
+    execution_policy_json: Optional[str] = None # JSON ExecutionPolicy: fallback targets and hedge delay
 
 class Prompt(PromptBase, table=True):
+    # (sort column, id) pairs back keyset pagination in read_prompts
+    __table_args__ = (
+        Index("ix_prompt_created_at_id", "created_at", "id"),
+        Index("ix_prompt_updated_at_id", "updated_at", "id"),
+        Index("ix_prompt_name_id", "name", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     active_version_id: Optional[int] = None
     
-    versions: List["PromptVersion"] = Relationship(back_populates="prompt")
+    # Versions can't exist without their prompt (prompt_id is NOT NULL), so delete them with it.
+    versions: List["PromptVersion"] = Relationship(
+        back_populates="prompt",
+        sa_relationship_kwargs={"cascade": "all, delete-orphan"}
+    )
 
 class PromptVersionBase(SQLModel):
     version_number: int
-    template: str
     input_variables: Optional[str] = None # JSON string of variables
     model_config_json: Optional[str] = None # JSON string for model params (temp, top_k, etc.)
 
 class PromptVersion(PromptVersionBase, table=True):
+    # Serves every by-prompt lookup too (history pages, delete cascades)
+    __table_args__ = (
+        Index("ix_promptversion_prompt_id_version_number", "prompt_id", "version_number", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     prompt_id: int = Field(foreign_key="prompt.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     commit_message: Optional[str] = None
+    # The template text lives in a TemplateBlob (see app.services.template_store)
+    template_hash: str = Field(foreign_key="templateblob.hash", index=True, max_length=64)
     
     prompt: Prompt = Relationship(back_populates="versions")
 
 class PromptCreate(PromptBase):
     pass
 
+class PromptVersionRead(PromptVersionBase):
+    id: int
+    prompt_id: int
+    created_at: datetime
+    commit_message: Optional[str] = None
+    template_hash: str
+    template_size: int
+    # Omitted from version history pages (GET /{id}/versions) for templates stored
+    # compressed; the prompt detail and the version itself always carry it.
+    template: Optional[str] = None
+
 class PromptRead(PromptBase):
     id: int
     created_at: datetime
+    updated_at: datetime
     active_version_id: Optional[int] = None
-    versions: List["PromptVersion"] = []
+    versions: List[PromptVersionRead] = []
 
 class PromptVersionCreate(PromptVersionBase):
-    pass
+    template: str
 
 class PromptVersionUpdate(SQLModel):
     template: Optional[str] = None
@@ -52,9 +83,66 @@ class PromptUpdate(SQLModel):
     name: Optional[str] = None
     description: Optional[str] = None
     tags: Optional[str] = None
+    execution_policy_json: Optional[str] = None
+
+class PromptVersionSummary(SQLModel):
+    id: int
+    version_number: int
+    created_at: datetime
+    commit_message: Optional[str] = None
+
+class PromptListRead(PromptBase):
+    # Lean list projection: no version history or template bodies
+    id: int
+    created_at: datetime
+    updated_at: datetime
+    active_version_id: Optional[int] = None
+    active_version: Optional[PromptVersionSummary] = None
+    version_count: int = 0
+
+class PromptVersionPage(SQLModel):
+    items: List[PromptVersionRead]
+    next_cursor: Optional[str] = None
+
+class PromptVersionDiff(SQLModel):
+    from_version_id: int
+    from_version_number: int
+    to_version_id: int
+    to_version_number: int
+    added_lines: int
+    removed_lines: int
+    diff: str  # unified diff
 
 class PromptPaginatedRead(SQLModel):
-    items: List[PromptRead]
-    total: int
-    page: int
+    items: List[PromptListRead]
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+    page: Optional[int] = None  # null for cursor (keyset) pages, which have no page number
     size: int
+    next_cursor: Optional[str] = None
+
+class PromptTransferVersion(PromptVersionBase):
+    template: str
+    commit_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class PromptTransfer(PromptBase):
+    # One line of GET /prompts/export and POST /prompts/import (NDJSON)
+    created_at: Optional[datetime] = None
+    active_version_number: Optional[int] = None
+    versions: List[PromptTransferVersion] = []
+
+class PromptImportError(SQLModel):
+    line: int
+    name: Optional[str] = None
+    error: str
+
+class PromptImportResult(SQLModel):
+    prompts_created: int = 0
+    prompts_updated: int = 0
+    versions_created: int = 0
+    versions_updated: int = 0
+    versions_unchanged: int = 0
+    failed_lines: int = 0
+    # The first PROMPT_IMPORT_MAX_ERRORS of them
+    errors: List[PromptImportError] = []
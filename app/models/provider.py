@@ -4,13 +4,19 @@ from datetime import datetime
 
 class LLMProviderBase(SQLModel):
     name: str = Field(index=True)
+    kind: Optional[str] = None # normalized adapter kind: openai, gemini, ollama, vllm, ...
     api_key: Optional[str] = None
     base_url: Optional[str] = None
     is_active: bool = True
+    # Local limits applied before calling the provider; None means unlimited
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
 
 class LLMProvider(LLMProviderBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Bumped by every change to the provider or its models; the provider list ETag is derived from it
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
     
     models: List["LLMModel"] = Relationship(
         back_populates="provider",
@@ -29,9 +35,12 @@ class LLMModel(LLMModelBase, table=True):
 
 class LLMProviderUpdate(SQLModel):
     name: Optional[str] = None
+    kind: Optional[str] = None
     api_key: Optional[str] = None
     base_url: Optional[str] = None
     is_active: Optional[bool] = None
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
 
 class LLMModelUpdate(SQLModel):
     name: Optional[str] = None
@@ -39,6 +48,7 @@ class LLMModelUpdate(SQLModel):
 
 class LLMProviderRead(LLMProviderBase):
     id: int
+    updated_at: datetime
     models: List["LLMModel"] = []
 
 class LLMModelRead(LLMModelBase):
@@ -0,0 +1,14 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, LargeBinary
+from typing import Optional
+from datetime import datetime
+
+class TemplateBlob(SQLModel, table=True):
+    # Content-addressed and immutable: versions with identical templates share one row.
+    hash: str = Field(primary_key=True, max_length=64)  # sha256 of the template text
+    encoding: str  # raw (utf-8), zlib, or delta (zlib-compressed edit script against base_hash)
+    base_hash: Optional[str] = Field(default=None, foreign_key="templateblob.hash", index=True, max_length=64)
+    depth: int = 0  # deltas to apply on top of the nearest full blob
+    size_bytes: int  # utf-8 length of the decoded template
+    data: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
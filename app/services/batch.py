@@ -0,0 +1,94 @@
+"""
+Batch requests and their expansion into individual executions, shared by
+POST /execute/batch (run inline) and POST /jobs (queued).
+"""
+from typing import Any, Dict, List, Literal, NamedTuple, Optional
+
+from pydantic import BaseModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.services.execution_policy import ExecutionPolicy
+from app.services.template_service import TemplateError, compile_template, prompt_template_cache
+
+
+class ExecuteRequest(BaseModel):
+    provider_id: Optional[int] = None
+    model_provider: str # openai, gemini, ollama
+    model_name: str
+    # Either raw prompt_text, or a stored prompt (its active version) / version rendered with variables
+    prompt_text: Optional[str] = None
+    prompt_id: Optional[int] = None
+    version_id: Optional[int] = None
+    variables: Optional[Dict[str, Any]] = None
+    config: Optional[Dict[str, Any]] = {}
+    # "bypass" skips the response cache, "refresh" ignores a cached entry but stores the new result
+    cache_mode: Literal["default", "bypass", "refresh"] = "default"
+    # Fallbacks and hedging; defaults to the stored prompt's policy
+    execution_policy: Optional[ExecutionPolicy] = None
+    # Share one upstream call with identical requests already in flight
+    coalesce: bool = False
+
+
+class BatchTarget(BaseModel):
+    provider_id: Optional[int] = None
+    model_provider: str
+    model_name: str
+    config: Optional[Dict[str, Any]] = {}
+
+
+class BatchExecuteRequest(BaseModel):
+    # Either explicit executions...
+    items: Optional[List[ExecuteRequest]] = None
+    # ...or one template rendered with each variable set and run against every target.
+    template: Optional[str] = None
+    variable_sets: Optional[List[Dict[str, Any]]] = None
+    targets: Optional[List[BatchTarget]] = None
+    cache_mode: Literal["default", "bypass", "refresh"] = "default"
+    # Template source alternatives to `template`
+    prompt_id: Optional[int] = None
+    version_id: Optional[int] = None
+
+
+class BatchItem(NamedTuple):
+    request: ExecuteRequest
+    variables_index: Optional[int]
+    # Set when the item's variable set could not be rendered; it is not run.
+    error: Optional[str]
+
+
+async def expand_batch(batch: BatchExecuteRequest, session: AsyncSession) -> List[BatchItem]:
+    """
+    The batch's items in result order. A variable set the template can't
+    render gives every target an item carrying the error instead of failing
+    the batch. Raises ValueError for an incomplete batch and LookupError for
+    an unknown prompt or version.
+    """
+    if batch.items is not None:
+        return [BatchItem(item, None, None) for item in batch.items]
+
+    if not batch.targets or (batch.template is None and batch.prompt_id is None and batch.version_id is None):
+        raise ValueError("Provide either items, or a template (or prompt_id/version_id) and targets")
+    base_config: Dict[str, Any] = {}
+    if batch.template is not None:
+        render = compile_template(batch.template).render
+    else:
+        prepared = await prompt_template_cache.resolve(session, batch.prompt_id, batch.version_id)
+        render = prepared.render
+        base_config = prepared.model_config
+
+    expanded = []
+    for variables_index, variables in enumerate(batch.variable_sets or [{}]):
+        try:
+            prompt_text, error = render(variables), None
+        except TemplateError as e:
+            prompt_text, error = None, str(e)
+        for target in batch.targets:
+            expanded.append(BatchItem(ExecuteRequest(
+                provider_id=target.provider_id,
+                model_provider=target.model_provider,
+                model_name=target.model_name,
+                prompt_text=prompt_text,
+                config={**base_config, **(target.config or {})},
+                cache_mode=batch.cache_mode
+            ), variables_index, error))
+    return expanded
@@ -0,0 +1,192 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+ClientKey = Tuple[str, Optional[str], Optional[str]]
+
+
+class ClientRegistry:
+    """
+    Long-lived upstream clients keyed by (provider kind, api_key, base_url).
+
+    Every client shares one pooled httpx transport per key so that requests to
+    the same provider reuse keep-alive (and HTTP/2) connections instead of
+    paying for a new TCP/TLS handshake on every call.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        timeout: float = 60.0,
+        close_grace_seconds: float = 300.0,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.timeout = timeout
+        self.close_grace_seconds = close_grace_seconds
+        self._clients: Dict[ClientKey, Any] = {}
+        self._http_clients: Dict[ClientKey, httpx.AsyncClient] = {}
+        # api_key -> the grpc GenerativeServiceAsyncClient its Gemini models share
+        self._gemini_services: Dict[str, Any] = {}
+        # Evicted clients waiting out their grace period -> the task that closes them
+        self._retiring: Dict[Any, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "ClientRegistry":
+        return cls(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+            http2=settings.LLM_HTTP2,
+            timeout=settings.LLM_HTTP_TIMEOUT,
+            close_grace_seconds=settings.LLM_CLIENT_CLOSE_GRACE_SECONDS,
+        )
+
+    def _new_http_client(self) -> httpx.AsyncClient:
+        kwargs: Dict[str, Any] = {
+            "limits": self.limits,
+            "timeout": self.timeout,
+            "http2": self.http2,
+        }
+        try:
+            return httpx.AsyncClient(**kwargs)
+        except ImportError:
+            # http2=True needs the optional `h2` package; fall back to HTTP/1.1 keep-alive.
+            kwargs["http2"] = False
+            return httpx.AsyncClient(**kwargs)
+
+    async def http_client(self, kind: str, base_url: Optional[str] = None) -> httpx.AsyncClient:
+        key = (kind, None, base_url)
+        client = self._http_clients.get(key)
+        if client is not None:
+            return client
+        async with self._lock:
+            client = self._http_clients.get(key)
+            if client is None:
+                client = self._new_http_client()
+                self._http_clients[key] = client
+            return client
+
+    async def openai_client(self, api_key: str, base_url: Optional[str] = None):
+        key = ("openai", api_key, base_url)
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        async with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                import openai
+
+                http_client = self._new_http_client()
+                self._http_clients[key] = http_client
+                # Retries are handled by LLMService so they respect the provider limiter and breaker.
+                client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+                self._clients[key] = client
+            return client
+
+    async def gemini_model(self, api_key: str, model: str):
+        # genai.configure() would switch the key for the whole process, so each
+        # key gets its own GenerativeServiceAsyncClient, shared by its models.
+        # Setting GenerativeModel._async_client relies on google-generativeai
+        # internals; requirements.txt pins the version this was checked against.
+        key = ("gemini", api_key, model)
+        gemini_model = self._clients.get(key)
+        if gemini_model is not None:
+            return gemini_model
+        async with self._lock:
+            gemini_model = self._clients.get(key)
+            if gemini_model is None:
+                import google.ai.generativelanguage as glm
+                import google.generativeai as genai
+
+                service = self._gemini_services.get(api_key)
+                if service is None:
+                    service = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+                    self._gemini_services[api_key] = service
+                gemini_model = genai.GenerativeModel(model)
+                # The model only falls back to the process-wide default client when this is unset.
+                gemini_model._async_client = service
+                self._clients[key] = gemini_model
+            return gemini_model
+
+    async def evict(self, key: ClientKey) -> bool:
+        """
+        Drops the client stored under exactly `key` (see ProviderAdapter.client_key);
+        a ("gemini", api_key, None) key drops that key's service client and
+        every model using it. Called when an LLMProvider row is changed or
+        deleted; new requests get a fresh client, and the old one is closed
+        once requests that already hold it have had `close_grace_seconds` to finish.
+        """
+        async with self._lock:
+            self._clients.pop(key, None)
+            client = self._http_clients.pop(key, None)
+            if key[0] == "gemini" and key[2] is None:
+                for model_key in [k for k in self._clients if k[:2] == key[:2]]:
+                    del self._clients[model_key]
+                client = self._gemini_services.pop(key[1], None)
+        if client is None:
+            return False
+        task = asyncio.create_task(self._close_later(client))
+        self._retiring[client] = task
+        task.add_done_callback(lambda _: self._retiring.pop(client, None))
+        return True
+
+    @staticmethod
+    async def _close(client: Any) -> None:
+        if isinstance(client, httpx.AsyncClient):
+            await client.aclose()
+        else:
+            # A grpc service client: closing its transport closes the channel.
+            await client.transport.close()
+
+    async def _close_later(self, client: Any) -> None:
+        await asyncio.sleep(self.close_grace_seconds)
+        await self._close(client)
+
+    async def aclose(self) -> None:
+        async with self._lock:
+            clients = [*self._http_clients.values(), *self._gemini_services.values()]
+            self._http_clients.clear()
+            self._gemini_services.clear()
+            self._clients.clear()
+        # Evicted clients still in their grace period are closed now too.
+        retiring = dict(self._retiring)
+        for task in retiring.values():
+            task.cancel()
+        clients.extend(retiring)
+        await asyncio.gather(*(self._close(client) for client in clients), return_exceptions=True)
+
+
+_registry: Optional[ClientRegistry] = None
+
+
+def init_client_registry() -> ClientRegistry:
+    global _registry
+    _registry = ClientRegistry.from_settings()
+    return _registry
+
+
+def get_client_registry() -> ClientRegistry:
+    # Scripts and tests that never run the app lifespan still get a working registry.
+    global _registry
+    if _registry is None:
+        _registry = ClientRegistry.from_settings()
+    return _registry
+
+
+async def close_client_registry() -> None:
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
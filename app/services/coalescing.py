@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from app.core.metrics import record_coalesced_flight, record_coalesced_request
+from app.services.execution_policy import Attempt, Candidate, PolicyStream
+from app.services.providers import StreamChunk, resolve_provider_kind
+
+T = TypeVar("T")
+
+
+def flight_key(mode: str, candidates: List[Candidate], prompt_text: str, hedge_delay_ms: Optional[int] = None) -> str:
+    """
+    sha256 over the normalized request: every candidate's provider, model and
+    config, the prompt and the hedge delay. Completions and streams never share.
+    """
+    normalized = {
+        "mode": mode,
+        "candidates": [
+            {
+                "provider": candidate.provider_config.get("kind") or resolve_provider_kind(candidate.model_provider),
+                "provider_id": candidate.provider_config.get("id"),
+                "model": candidate.model_name.strip(),
+                "config": candidate.config or {},
+            }
+            for candidate in candidates
+        ],
+        "prompt": prompt_text,
+        "hedge_delay_ms": hedge_delay_ms,
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+        self.joined = 0
+
+
+class _StreamFlight:
+    """
+    One upstream PolicyStream read by a producer task into a chunk buffer.
+    Subscribers replay the buffer from the start, so a late joiner still
+    receives every token.
+    """
+
+    def __init__(self, stream: PolicyStream):
+        self.stream = stream
+        self.chunks: List[StreamChunk] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.joined = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self._produce())
+
+    async def _produce(self) -> None:
+        try:
+            async for chunk in self.stream:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            # Closing the PolicyStream tears down the upstream HTTP stream.
+            await self.stream.aclose()
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def chunks_from(self, index: int) -> Tuple[List[StreamChunk], bool]:
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self.chunks) > index or self.done)
+            return self.chunks[index:], self.done
+
+
+class CoalescedStream:
+    """
+    A subscriber's view of a shared stream, with the same interface as
+    PolicyStream (served_by, attempts, async iteration, aclose).
+    """
+
+    def __init__(self, flights: "SingleFlight", key: str, flight: _StreamFlight, coalesced: bool):
+        self._flights = flights
+        self._key = key
+        self._flight = flight
+        self.coalesced = coalesced
+        self._generator: Optional[AsyncIterator[StreamChunk]] = None
+        self._released = False
+
+    @property
+    def served_by(self) -> Optional[Candidate]:
+        return self._flight.stream.served_by
+
+    @property
+    def attempts(self) -> List[Attempt]:
+        return self._flight.stream.attempts
+
+    async def _chunks(self) -> AsyncIterator[StreamChunk]:
+        flight = self._flight
+        try:
+            flight.start()
+            index = 0
+            while True:
+                chunks, done = await flight.chunks_from(index)
+                for chunk in chunks:
+                    yield chunk
+                index += len(chunks)
+                if done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._flights._leave_stream(self._key, self._flight)
+
+    def __aiter__(self) -> AsyncIterator[StreamChunk]:
+        self._generator = self._chunks()
+        return self._generator
+
+    async def aclose(self) -> None:
+        if self._generator is not None:
+            await self._generator.aclose()
+        self._release()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical upstream calls. The first caller for a key
+    starts the call; callers that arrive while it is in flight share its
+    result (or error) instead of starting their own. Nothing is kept once
+    the call finishes, so this is not a cache.
+
+    The call runs in its own task: a caller that goes away does not cancel it
+    for the others, and it is only cancelled once every caller has gone.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.stats = {"calls": 0, "joined": 0, "streams": 0, "stream_joined": 0}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Returns the call's result and whether it was shared with an earlier caller.
+        """
+        flight = self._calls.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.create_task(call()))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish_call(key, flight))
+            self.stats["calls"] += 1
+        else:
+            flight.joined += 1
+            self.stats["joined"] += 1
+        record_coalesced_request("complete", coalesced)
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), coalesced
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def stream(self, key: str, open_stream: Callable[[], PolicyStream]) -> CoalescedStream:
+        """
+        Subscribes to the in-flight stream for `key`, or opens one. The
+        upstream stream starts when the first subscriber starts iterating
+        and is closed once every subscriber has finished or been closed.
+        """
+        flight = self._streams.get(key)
+        coalesced = flight is not None and not flight.done
+        if not coalesced:
+            flight = _StreamFlight(open_stream())
+            self._streams[key] = flight
+            self.stats["streams"] += 1
+        else:
+            flight.joined += 1
+            self.stats["stream_joined"] += 1
+        flight.subscribers += 1
+        record_coalesced_request("stream", coalesced)
+        return CoalescedStream(self, key, flight, coalesced)
+
+    def _finish_call(self, key: str, flight: _Flight) -> None:
+        if self._calls.get(key) is flight:
+            del self._calls[key]
+        record_coalesced_flight("complete", flight.joined + 1)
+
+    def _leave_stream(self, key: str, flight: _StreamFlight) -> None:
+        flight.subscribers -= 1
+        if flight.subscribers > 0:
+            return
+        if self._streams.get(key) is flight:
+            del self._streams[key]
+        record_coalesced_flight("stream", flight.joined + 1)
+        # Everyone has gone; stop reading from upstream.
+        if flight.task is not None and not flight.task.done():
+            flight.task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        requests = self.stats["calls"] + self.stats["joined"] + self.stats["streams"] + self.stats["stream_joined"]
+        joined = self.stats["joined"] + self.stats["stream_joined"]
+        return {
+            **self.stats,
+            "in_flight": len(self._calls),
+            "streams_in_flight": len(self._streams),
+            "waiters": sum(flight.waiters for flight in self._calls.values())
+                + sum(flight.subscribers for flight in self._streams.values()),
+            "coalescing_ratio": joined / requests if requests else 0.0,
+        }
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,340 @@
+"""
+Scores evaluation results as NumPy arrays: one array per metric over every
+(row, variant) result, reshaped to rows x variants for per-variant stats and
+paired significance tests against the baseline variant.
+
+Imported lazily by the evaluation endpoints, so NumPy is only loaded by
+processes that score something.
+"""
+import json
+import math
+import re
+import warnings
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+STRING = np.dtypes.StringDType()
+
+# Markdown code fences models like to wrap JSON in
+_FENCE = re.compile(r"^\s*```[\w-]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+
+
+@dataclass
+class ScoringInput:
+    """
+    Flat arrays over every result, row-major: result i is row i // variants,
+    variant i % variants.
+    """
+
+    responses: np.ndarray  # StringDType, "" for failed items
+    expected: np.ndarray  # StringDType, "" where the row has no expected output
+    has_expected: np.ndarray  # bool
+    ok: np.ndarray  # bool: the execution succeeded
+    latency_ms: np.ndarray  # float, NaN when not run or served from the cache
+    input_tokens: np.ndarray
+    output_tokens: np.ndarray
+    cost_usd: np.ndarray
+
+
+MetricFn = Callable[[ScoringInput, Dict[str, Any]], np.ndarray]
+
+
+@dataclass
+class Metric:
+    fn: MetricFn
+    # 0/1 scores, where a failed execution counts as 0 rather than being left out
+    binary: bool = False
+    # None when neither direction is better (e.g. length)
+    higher_is_better: Optional[bool] = None
+    # Raises ValueError for unusable params, so they are rejected up front
+    check: Optional[Callable[[Dict[str, Any]], Any]] = None
+
+
+def _per_unique(responses: np.ndarray, predicate: Callable[[str], bool]) -> np.ndarray:
+    # Checks that need Python (regex, JSON) run once per distinct response
+    # and are broadcast back, which is what keeps repetitive outputs cheap.
+    uniques, inverse = np.unique(responses, return_inverse=True)
+    hits = np.fromiter((predicate(str(value)) for value in uniques), dtype=bool, count=len(uniques))
+    return hits[inverse.reshape(-1)]
+
+
+def _binary(inputs: ScoringInput, hits: np.ndarray) -> np.ndarray:
+    return np.where(inputs.ok, hits, False).astype(np.float64)
+
+
+def exact_match(inputs: ScoringInput, params: Dict[str, Any]) -> np.ndarray:
+    responses = np.strings.strip(inputs.responses)
+    expected = np.strings.strip(inputs.expected)
+    if not params.get("case_sensitive", False):
+        responses, expected = np.strings.lower(responses), np.strings.lower(expected)
+    scores = _binary(inputs, responses == expected)
+    # Rows without an expected output have nothing to match against.
+    scores[~inputs.has_expected] = np.nan
+    return scores
+
+
+def _pattern(params: Dict[str, Any]) -> "re.Pattern[str]":
+    pattern = params.get("pattern")
+    if not pattern:
+        raise ValueError("regex metric needs a pattern")
+    try:
+        return re.compile(pattern, re.IGNORECASE if params.get("ignore_case") else 0)
+    except re.error as e:
+        raise ValueError(f"Invalid regex pattern: {e}")
+
+
+def _schema_validator(params: Dict[str, Any]) -> Any:
+    if params.get("schema") is None:
+        return None
+    try:
+        from jsonschema import SchemaError, validators
+    except ImportError:
+        raise ValueError("json_schema validation needs the jsonschema package")
+    cls = validators.validator_for(params["schema"])
+    try:
+        cls.check_schema(params["schema"])
+    except SchemaError as e:
+        raise ValueError(f"Invalid JSON schema: {e.message}")
+    return cls(params["schema"])
+
+
+def regex(inputs: ScoringInput, params: Dict[str, Any]) -> np.ndarray:
+    compiled = _pattern(params)
+    return _binary(inputs, _per_unique(inputs.responses, lambda text: compiled.search(text) is not None))
+
+
+def json_schema(inputs: ScoringInput, params: Dict[str, Any]) -> np.ndarray:
+    """
+    1 when the response parses as JSON (code fences allowed) and, if a
+    `schema` is given, validates against it.
+    """
+    validator = _schema_validator(params)
+
+    def valid(text: str) -> bool:
+        fenced = _FENCE.match(text)
+        try:
+            document = json.loads(fenced.group(1) if fenced else text)
+        except ValueError:
+            return False
+        return validator is None or validator.is_valid(document)
+
+    return _binary(inputs, _per_unique(inputs.responses, valid))
+
+
+def length(inputs: ScoringInput, params: Dict[str, Any]) -> np.ndarray:
+    lengths = np.strings.str_len(np.strings.strip(inputs.responses)).astype(np.float64)
+    return np.where(inputs.ok, lengths, np.nan)
+
+
+def latency(inputs: ScoringInput, params: Dict[str, Any]) -> np.ndarray:
+    return np.where(inputs.ok, inputs.latency_ms, np.nan)
+
+
+def tokens(inputs: ScoringInput, params: Dict[str, Any]) -> np.ndarray:
+    return np.where(inputs.ok, inputs.input_tokens + inputs.output_tokens, np.nan)
+
+
+def cost(inputs: ScoringInput, params: Dict[str, Any]) -> np.ndarray:
+    # NaN for models without MODEL_PRICING entries
+    return np.where(inputs.ok, inputs.cost_usd, np.nan)
+
+
+METRICS: Dict[str, Metric] = {
+    "exact_match": Metric(exact_match, binary=True, higher_is_better=True),
+    "regex": Metric(regex, binary=True, higher_is_better=True, check=_pattern),
+    "json_schema": Metric(json_schema, binary=True, higher_is_better=True, check=_schema_validator),
+    "length": Metric(length),
+    "latency": Metric(latency, higher_is_better=False),
+    "tokens": Metric(tokens, higher_is_better=False),
+    "cost": Metric(cost, higher_is_better=False),
+}
+
+
+def register_metric(
+    name: str,
+    fn: MetricFn,
+    binary: bool = False,
+    higher_is_better: Optional[bool] = None,
+    check: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> None:
+    """
+    Adds a metric. `fn` gets the ScoringInput and the spec's params and
+    returns one float per result (NaN to leave a result out).
+    """
+    METRICS[name] = Metric(fn, binary, higher_is_better, check)
+
+
+def check_params(metric_type: str, params: Dict[str, Any]) -> None:
+    """
+    Raises ValueError if `params` can't be scored with, before any item runs.
+    """
+    metric = METRICS[metric_type]
+    if metric.check is not None:
+        metric.check(params)
+
+
+def build_input(
+    rows: int,
+    variants: int,
+    expected: List[Optional[str]],
+    results: Dict[int, Dict[str, Any]],
+) -> ScoringInput:
+    """
+    `results` maps item position (row * variants + variant) to the item's
+    stored result, for items that succeeded. Cached results count for the
+    output metrics but not for latency, tokens or cost, which they didn't incur.
+    """
+    size = rows * variants
+    responses = [""] * size
+    latency_ms = np.full(size, np.nan)
+    input_tokens = np.full(size, np.nan)
+    output_tokens = np.full(size, np.nan)
+    cost_usd = np.full(size, np.nan)
+    ok = np.zeros(size, dtype=bool)
+    for position, result in results.items():
+        responses[position] = result.get("response") or ""
+        ok[position] = True
+        if result.get("cached"):
+            continue
+        latency_ms[position] = result.get("latency_ms", np.nan)
+        input_tokens[position] = _number(result.get("input_tokens"))
+        output_tokens[position] = _number(result.get("output_tokens"))
+        cost_usd[position] = _number(result.get("cost_usd"))
+    expected_array = np.array([value or "" for value in expected], dtype=STRING)
+    has_expected = np.array([value is not None for value in expected], dtype=bool)
+    return ScoringInput(
+        responses=np.array(responses, dtype=STRING),
+        expected=np.repeat(expected_array, variants),
+        has_expected=np.repeat(has_expected, variants),
+        ok=ok,
+        latency_ms=latency_ms,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cost_usd=cost_usd,
+    )
+
+
+def _number(value: Any) -> float:
+    return float(value) if value is not None else np.nan
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    # Continued fraction for the incomplete beta function (modified Lentz).
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        m2 = 2 * m
+        for numerator in (
+            m * (b - m) * x / ((a + m2 - 1) * (a + m2)),
+            -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1)),
+        ):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-12:
+            break
+    return h
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def t_test_p_value(t: float, df: float) -> float:
+    """
+    Two-sided p-value of Student's t statistic with `df` degrees of freedom.
+    """
+    if math.isinf(t):
+        return 0.0
+    return _incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+
+
+def paired_test(scores: np.ndarray, baseline: np.ndarray) -> Dict[str, Optional[float]]:
+    """
+    Paired t-test of `scores` against `baseline` over the rows where both
+    have a score. For 0/1 metrics this approximates McNemar's test.
+    """
+    mask = ~(np.isnan(scores) | np.isnan(baseline))
+    differences = scores[mask] - baseline[mask]
+    n = int(differences.size)
+    if n < 2:
+        return {"n": n, "diff": float(differences.mean()) if n else None, "t": None, "p_value": None}
+    mean = float(differences.mean())
+    sd = float(differences.std(ddof=1))
+    if sd == 0.0:
+        return {"n": n, "diff": mean, "t": None, "p_value": 1.0 if mean == 0.0 else 0.0}
+    t = mean / (sd / math.sqrt(n))
+    return {"n": n, "diff": mean, "t": t, "p_value": t_test_p_value(t, n - 1)}
+
+
+def _float(value: Any) -> Optional[float]:
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def summarize_metric(scores: np.ndarray, metric: Metric, baseline: int, alpha: float) -> List[Dict[str, Any]]:
+    """
+    Per-variant stats for one metric, `scores` shaped rows x variants.
+    """
+    with warnings.catch_warnings():
+        # All-NaN columns (e.g. no pricing) are reported as None, not warned about.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        counts = np.count_nonzero(~np.isnan(scores), axis=0)
+        means = np.nanmean(scores, axis=0)
+        stds = np.nanstd(scores, axis=0, ddof=1)
+        p50, p95 = np.nanpercentile(scores, [50, 95], axis=0)
+    half_widths = 1.96 * stds / np.sqrt(np.maximum(counts, 1))
+
+    summaries = []
+    for variant in range(scores.shape[1]):
+        summary: Dict[str, Any] = {
+            "n": int(counts[variant]),
+            "mean": _float(means[variant]),
+            "std": _float(stds[variant]),
+            "ci95": [_float(means[variant] - half_widths[variant]), _float(means[variant] + half_widths[variant])],
+        }
+        if not metric.binary:
+            summary["p50"] = _float(p50[variant])
+            summary["p95"] = _float(p95[variant])
+        if variant != baseline:
+            test = paired_test(scores[:, variant], scores[:, baseline])
+            test["significant"] = test["p_value"] is not None and test["p_value"] < alpha
+            if metric.higher_is_better is not None and test["diff"] is not None:
+                test["better"] = test["significant"] and (test["diff"] > 0) == metric.higher_is_better
+            summary["vs_baseline"] = test
+        summaries.append(summary)
+    return summaries
+
+
+def score(
+    inputs: ScoringInput,
+    rows: int,
+    variants: int,
+    metric_specs: List[Dict[str, Any]],
+    baseline: int = 0,
+    alpha: float = 0.05,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    {metric name: [per-variant summary, ...]} for each metric spec.
+    """
+    report = {}
+    for spec in metric_specs:
+        metric = METRICS.get(spec["type"])
+        if metric is None:
+            raise ValueError(f"Unknown metric: {spec['type']}")
+        scores = np.asarray(metric.fn(inputs, spec.get("params") or {}), dtype=np.float64).reshape(rows, variants)
+        report[spec.get("name") or spec["type"]] = summarize_metric(scores, metric, baseline, alpha)
+    return report
@@ -0,0 +1,120 @@
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.execution import Execution
+
+
+def estimate_cost(model_name: str, input_tokens: Optional[int], output_tokens: Optional[int]) -> Optional[float]:
+    # MODEL_PRICING is USD per million tokens: {"gpt-4o": {"input": 2.5, "output": 10.0}}
+    pricing = settings.MODEL_PRICING.get(model_name)
+    if pricing is None or (input_tokens is None and output_tokens is None):
+        return None
+    return (
+        (input_tokens or 0) * pricing.get("input", 0.0)
+        + (output_tokens or 0) * pricing.get("output", 0.0)
+    ) / 1_000_000
+
+
+def server_time_to_first_token_ms(metadata: Optional[Dict[str, Any]]) -> Optional[float]:
+    # Ollama reports load and prompt-eval time (ns), i.e. its time to first token, even when not streaming.
+    if not metadata or "prompt_eval_duration" not in metadata:
+        return None
+    return (metadata.get("load_duration", 0) + metadata["prompt_eval_duration"]) / 1_000_000
+
+
+class ExecutionWriter:
+    """
+    Buffers Execution rows in memory and inserts them in batches from a
+    background task, so recording an execution never waits on the database.
+    When the buffer is full, new rows are dropped (and counted) rather than
+    slowing requests down.
+    """
+
+    def __init__(self, batch_size: int = 200, flush_seconds: float = 1.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.written = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, **fields: Any) -> None:
+        if self._queue is None:
+            return
+        metadata = fields.pop("metadata", None)
+        if metadata:
+            fields["metadata_json"] = json.dumps(metadata)
+        if fields.get("cost_usd") is None:
+            fields["cost_usd"] = estimate_cost(fields["model_name"], fields.get("input_tokens"), fields.get("output_tokens"))
+        try:
+            self._queue.put_nowait(Execution(**fields))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _write(self, rows: List[Execution]) -> None:
+        from app.core.database import async_session_maker
+
+        try:
+            async with async_session_maker() as session:
+                session.add_all(rows)
+                await session.commit()
+            self.written += len(rows)
+        except Exception as e:
+            self.dropped += len(rows)
+            print(f"WARNING: Failed to write {len(rows)} execution records: {e}")
+
+    def _take(self, first: Optional[Execution]) -> Tuple[List[Execution], bool]:
+        # Up to batch_size buffered rows; None is the shutdown sentinel.
+        rows, stopping = [], first is None
+        if first is not None:
+            rows.append(first)
+        while len(rows) < self.batch_size and not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is None:
+                stopping = True
+            else:
+                rows.append(row)
+        return rows, stopping
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping or not self._queue.empty():
+            first = await self._queue.get() if not stopping else None
+            # Give a burst a moment to accumulate so it lands in one INSERT.
+            if first is not None and self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.flush_seconds)
+            rows, stop_seen = self._take(first)
+            stopping = stopping or stop_seen
+            if rows:
+                await self._write(rows)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Flushes everything buffered before returning.
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+execution_writer = ExecutionWriter(
+    batch_size=settings.EXECUTION_LOG_BATCH_SIZE,
+    flush_seconds=settings.EXECUTION_LOG_FLUSH_SECONDS,
+    max_queue=settings.EXECUTION_LOG_MAX_QUEUE,
+)
@@ -0,0 +1,207 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from app.services.providers import CompletionResult, StreamChunk
+
+
+class PolicyTarget(BaseModel):
+    provider_id: Optional[int] = None
+    # Defaults to the stored provider's kind, then to the request's model_provider
+    model_provider: Optional[str] = None
+    model_name: str
+    config: Optional[Dict[str, Any]] = None
+
+
+class ExecutionPolicy(BaseModel):
+    """
+    Ordered fallbacks tried after the request's own target. With a hedge
+    delay, the next target is also started whenever the current ones have not
+    answered (or, for streams, sent a first token) within the delay.
+    """
+
+    fallbacks: List[PolicyTarget] = []
+    hedge_delay_ms: Optional[int] = Field(default=None, ge=0)
+
+
+@dataclass
+class Candidate:
+    model_provider: str
+    model_name: str
+    config: Dict[str, Any]
+    provider_config: Dict[str, Any] = field(default_factory=dict)
+
+    def label(self) -> Dict[str, Any]:
+        return {
+            "provider_id": self.provider_config.get("id"),
+            "model_provider": self.model_provider,
+            "model_name": self.model_name,
+        }
+
+
+@dataclass
+class Attempt:
+    candidate: Candidate
+    hedged: bool
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+    # "ok", "error" or "cancelled"
+    outcome: str = "pending"
+    error: Optional[str] = None
+
+    def finish(self, outcome: str, error: Optional[BaseException] = None) -> None:
+        self.finished = time.perf_counter()
+        self.outcome = outcome
+        self.error = str(error) if error is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        latency = (self.finished or time.perf_counter()) - self.started
+        return {
+            **self.candidate.label(),
+            "hedged": self.hedged,
+            "outcome": self.outcome,
+            "latency_ms": round(latency * 1000, 1),
+            "error": self.error,
+        }
+
+
+class _Race:
+    """
+    Launches candidates in order: the next one starts when every running
+    attempt has failed, or when the hedge delay passes without an answer.
+    """
+
+    def __init__(self, candidates: List[Candidate], hedge_delay_ms: Optional[int]):
+        self.remaining = list(candidates)
+        self.hedge_delay = hedge_delay_ms / 1000 if hedge_delay_ms is not None else None
+        self.attempts: List[Attempt] = []
+        self.pending: Dict[asyncio.Task, Attempt] = {}
+        self.last_launch = 0.0
+
+    def launch(self, start: Callable[[Candidate], Awaitable[Any]]) -> None:
+        candidate = self.remaining.pop(0)
+        attempt = Attempt(candidate, hedged=bool(self.pending))
+        self.attempts.append(attempt)
+        self.pending[asyncio.create_task(start(candidate))] = attempt
+        self.last_launch = time.perf_counter()
+
+    def hedge_timeout(self) -> Optional[float]:
+        if self.hedge_delay is None or not self.remaining:
+            return None
+        return max(0.0, self.last_launch + self.hedge_delay - time.perf_counter())
+
+    async def run(self, start: Callable[[Candidate], Awaitable[Any]]) -> Tuple[Any, Attempt]:
+        last_error: Optional[BaseException] = None
+        self.launch(start)
+        while self.pending:
+            done, _ = await asyncio.wait(
+                self.pending, timeout=self.hedge_timeout(), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                self.launch(start)
+                continue
+            # Take the earliest launched success among the finished attempts.
+            for task in sorted(done, key=lambda t: self.pending[t].started):
+                attempt = self.pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    attempt.finish("ok")
+                    return task.result(), attempt
+                attempt.finish("error", error)
+                last_error = error
+            if not self.pending and self.remaining:
+                self.launch(start)
+        raise last_error
+
+    async def cancel_pending(self, cleanup: Optional[Callable[[Any], Awaitable[None]]] = None) -> None:
+        tasks = list(self.pending)
+        for task in tasks:
+            task.cancel()
+            self.pending[task].finish("cancelled")
+        self.pending.clear()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        if cleanup:
+            for result in results:
+                if not isinstance(result, BaseException):
+                    await cleanup(result)
+
+
+async def complete_with_policy(
+    complete: Callable[[Candidate], Awaitable[CompletionResult]],
+    candidates: List[Candidate],
+    hedge_delay_ms: Optional[int] = None,
+) -> Tuple[CompletionResult, Candidate, List[Attempt]]:
+    """
+    Returns the first successful completion, the candidate that served it and
+    every attempt made. Losing attempts are cancelled; if all fail, the last
+    error is raised.
+    """
+    race = _Race(candidates, hedge_delay_ms)
+    try:
+        result, winner = await race.run(complete)
+        return result, winner.candidate, race.attempts
+    finally:
+        await race.cancel_pending()
+
+
+class PolicyStream:
+    """
+    Async iterator of StreamChunks from whichever candidate sends its first
+    chunk first. Hedging and fallback only apply until then; after that the
+    winning stream is passed through and the others are closed.
+    """
+
+    def __init__(
+        self,
+        stream: Callable[[Candidate], AsyncIterator[StreamChunk]],
+        candidates: List[Candidate],
+        hedge_delay_ms: Optional[int] = None,
+    ):
+        self._stream = stream
+        self._race = _Race(candidates, hedge_delay_ms)
+        self._iterator: Optional[AsyncIterator[StreamChunk]] = None
+        self.served_by: Optional[Candidate] = None
+
+    @property
+    def attempts(self) -> List[Attempt]:
+        return self._race.attempts
+
+    async def _first_chunk(self, candidate: Candidate) -> Tuple[AsyncIterator[StreamChunk], Optional[StreamChunk]]:
+        iterator = self._stream(candidate)
+        try:
+            return iterator, await iterator.__anext__()
+        except StopAsyncIteration:
+            return iterator, None
+        except BaseException:
+            await iterator.aclose()
+            raise
+
+    async def _close_loser(self, started: Tuple[AsyncIterator[StreamChunk], Optional[StreamChunk]]) -> None:
+        await started[0].aclose()
+
+    async def _chunks(self) -> AsyncIterator[StreamChunk]:
+        try:
+            (iterator, first), winner = await self._race.run(self._first_chunk)
+        finally:
+            await self._race.cancel_pending(self._close_loser)
+        self.served_by = winner.candidate
+        self._iterator = iterator
+        if first is None:
+            return
+        yield first
+        async for chunk in iterator:
+            yield chunk
+
+    def __aiter__(self) -> AsyncIterator[StreamChunk]:
+        self._generator = self._chunks()
+        return self._generator
+
+    async def aclose(self) -> None:
+        generator = getattr(self, "_generator", None)
+        if generator is not None:
+            await generator.aclose()
+        if self._iterator is not None:
+            await self._iterator.aclose()
@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, case, or_
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.execution import Execution
+
+WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+}
+
+GROUP_COLUMNS = {
+    "prompt_version": Execution.prompt_version_id,
+    "prompt": Execution.prompt_id,
+    "model": Execution.model_name,
+}
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+# SQLite has no date_trunc; bucket by formatting the timestamp instead.
+SQLITE_BUCKET_FORMATS = {
+    "minute": "%Y-%m-%dT%H:%M:00",
+    "hour": "%Y-%m-%dT%H:00:00",
+    "day": "%Y-%m-%dT00:00:00",
+}
+
+
+def _conditions(since: datetime, until: datetime, prompt_version_id: Optional[int], model_name: Optional[str]) -> list:
+    conditions = [Execution.created_at >= since, Execution.created_at < until]
+    if prompt_version_id is not None:
+        conditions.append(Execution.prompt_version_id == prompt_version_id)
+    if model_name is not None:
+        conditions.append(Execution.model_name == model_name)
+    return conditions
+
+
+def _totals():
+    return (
+        func.count().label("executions"),
+        func.sum(case((Execution.status == "error", 1), else_=0)).label("errors"),
+        func.sum(case((Execution.status == "cached", 1), else_=0)).label("cached"),
+        func.sum(Execution.input_tokens).label("input_tokens"),
+        func.sum(Execution.output_tokens).label("output_tokens"),
+        func.sum(Execution.cost_usd).label("cost_usd"),
+    )
+
+
+def _nearest_rank(n: int, q: float) -> int:
+    # Smallest 1-based rank covering q of n values, as percentile_disc picks it;
+    # integer hundredths so SQL and Python agree exactly.
+    return max(1, -(-round(q * 100) * n // 100))
+
+
+async def _ranked_percentiles(session: AsyncSession, column, value, conditions: list) -> Dict[Any, Dict[float, float]]:
+    """
+    Nearest-rank percentiles of `value` per group, ranked with window
+    functions so only the picked rows leave the database.
+    """
+    ranked = select(
+        column.label("grp"),
+        value.label("value"),
+        func.row_number().over(partition_by=column, order_by=value).label("rank"),
+        func.count().over(partition_by=column).label("n"),
+    ).where(*conditions, value.is_not(None)).subquery()
+    picks = [
+        and_(ranked.c.rank * 100 >= hundredths * ranked.c.n, (ranked.c.rank - 1) * 100 < hundredths * ranked.c.n)
+        for hundredths in {round(q * 100) for q in PERCENTILES}
+    ]
+    rows = (await session.exec(
+        select(ranked.c.grp, ranked.c.rank, ranked.c.n, ranked.c.value).where(or_(*picks))
+    )).all()
+    results: Dict[Any, Dict[float, float]] = {}
+    for group, rank, n, picked in rows:
+        for q in PERCENTILES:
+            if _nearest_rank(n, q) == rank:
+                results.setdefault(group, {})[q] = picked
+    return results
+
+
+async def _latency_percentiles(session: AsyncSession, column, conditions: list, dialect: str) -> Dict[Any, Dict[str, Optional[float]]]:
+    """
+    p50/p95/p99 of latency and time to first token per group, over upstream
+    calls that succeeded (cache hits and errors would skew them).
+    """
+    conditions = [*conditions, Execution.status == "ok"]
+    results: Dict[Any, Dict[str, Optional[float]]] = {}
+    if dialect == "postgresql":
+        aggregates = []
+        for q in PERCENTILES:
+            aggregates.append(func.percentile_disc(q).within_group(Execution.latency_ms))
+            aggregates.append(func.percentile_disc(q).within_group(Execution.time_to_first_token_ms))
+        rows = (await session.exec(select(column, *aggregates).where(*conditions).group_by(column))).all()
+        for group, *values in rows:
+            results[group] = {}
+            for index, q in enumerate(PERCENTILES):
+                label = f"p{round(q * 100)}"
+                results[group][f"latency_{label}_ms"] = values[index * 2]
+                results[group][f"ttft_{label}_ms"] = values[index * 2 + 1]
+        return results
+
+    # Elsewhere (SQLite 3.25+), rank in SQL with window functions.
+    latencies = await _ranked_percentiles(session, column, Execution.latency_ms, conditions)
+    ttfts = await _ranked_percentiles(session, column, Execution.time_to_first_token_ms, conditions)
+    for group, picked in latencies.items():
+        results[group] = {}
+        for q in PERCENTILES:
+            label = f"p{round(q * 100)}"
+            results[group][f"latency_{label}_ms"] = picked.get(q)
+            results[group][f"ttft_{label}_ms"] = ttfts.get(group, {}).get(q)
+    return results
+
+
+async def summarize(
+    session: AsyncSession,
+    dialect: str,
+    group_by: str,
+    since: datetime,
+    until: datetime,
+    prompt_version_id: Optional[int] = None,
+    model_name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Per-group throughput, token usage, cost and latency percentiles for executions in [since, until).
+    """
+    column = GROUP_COLUMNS[group_by]
+    conditions = _conditions(since, until, prompt_version_id, model_name)
+    rows = (await session.exec(
+        select(
+            column,
+            *_totals(),
+            func.sum(case((Execution.status == "ok", Execution.latency_ms), else_=0)).label("ok_latency_ms"),
+        ).where(*conditions).group_by(column)
+    )).all()
+    percentiles = await _latency_percentiles(session, column, conditions, dialect)
+
+    minutes = max((until - since).total_seconds() / 60, 1 / 60)
+    groups = []
+    for row in rows:
+        group, executions, errors, cached, input_tokens, output_tokens, cost, ok_latency_ms = row
+        groups.append({
+            group_by: group,
+            "executions": executions,
+            "errors": errors or 0,
+            "cached": cached or 0,
+            "error_rate": (errors or 0) / executions if executions else 0.0,
+            "requests_per_minute": executions / minutes,
+            "input_tokens": input_tokens or 0,
+            "output_tokens": output_tokens or 0,
+            # Generation speed while a call was in progress, not wall-clock throughput
+            "output_tokens_per_second": (output_tokens or 0) / (ok_latency_ms / 1000) if ok_latency_ms else None,
+            "cost_usd": cost,
+            **percentiles.get(group, {}),
+        })
+    groups.sort(key=lambda item: item["executions"], reverse=True)
+    return groups
+
+
+async def timeseries(
+    session: AsyncSession,
+    dialect: str,
+    bucket: str,
+    since: datetime,
+    until: datetime,
+    prompt_version_id: Optional[int] = None,
+    model_name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Executions, errors, tokens, cost and mean latency per time bucket.
+    """
+    if dialect == "postgresql":
+        bucket_column = func.date_trunc(bucket, Execution.created_at)
+    else:
+        bucket_column = func.strftime(SQLITE_BUCKET_FORMATS[bucket], Execution.created_at)
+    query = select(bucket_column.label("bucket"), *_totals(), func.avg(Execution.latency_ms)).where(
+        *_conditions(since, until, prompt_version_id, model_name)
+    ).group_by(bucket_column).order_by(bucket_column)
+    points = []
+    for row in (await session.exec(query)).all():
+        start, executions, errors, cached, input_tokens, output_tokens, cost, mean_latency = row
+        points.append({
+            "bucket": start.isoformat() if isinstance(start, datetime) else start,
+            "executions": executions,
+            "errors": errors or 0,
+            "cached": cached or 0,
+            "input_tokens": input_tokens or 0,
+            "output_tokens": output_tokens or 0,
+            "cost_usd": cost,
+            "latency_mean_ms": mean_latency,
+        })
+    return points
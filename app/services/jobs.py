@@ -0,0 +1,344 @@
+import asyncio
+import importlib
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, insert, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.job import Job, JobItem
+
+JobHandler = Callable[[Dict[str, Any], Optional[str]], Awaitable[Dict[str, Any]]]
+
+# kind -> "module:function". A handler takes an item's payload and the job's
+# user id and returns the item's result; raising marks the item failed.
+_HANDLER_PATHS: Dict[str, str] = {
+    "execute": "app.api.v1.endpoints.execute:run_job_item",
+    "evaluation": "app.api.v1.endpoints.evaluations:run_evaluation_item",
+}
+
+_handlers: Dict[str, JobHandler] = {}
+
+INSERT_CHUNK_SIZE = 1000
+
+
+def register_job_handler(kind: str, target: str) -> None:
+    _HANDLER_PATHS[kind] = target
+    _handlers.pop(kind, None)
+
+
+def get_job_handler(kind: str) -> JobHandler:
+    handler = _handlers.get(kind)
+    if handler is None:
+        if kind not in _HANDLER_PATHS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        module_name, attribute = _HANDLER_PATHS[kind].split(":")
+        handler = getattr(importlib.import_module(module_name), attribute)
+        _handlers[kind] = handler
+    return handler
+
+
+async def create_job(
+    session: AsyncSession,
+    kind: str,
+    payloads: List[Dict[str, Any]],
+    user_id: Optional[str],
+    commit: bool = True,
+) -> Job:
+    """
+    Persists a job and one pending item per payload, in a single transaction.
+    With commit=False the caller commits, e.g. to add rows referencing the job.
+    Raises ValueError for an empty job, which no worker would ever complete.
+    """
+    if not payloads:
+        raise ValueError("A job needs at least one item")
+    job = Job(kind=kind, user_id=user_id, total_items=len(payloads))
+    session.add(job)
+    await session.flush()
+    for start in range(0, len(payloads), INSERT_CHUNK_SIZE):
+        await session.execute(insert(JobItem), [
+            {"job_id": job.id, "position": position, "status": "pending", "attempts": 0, "payload_json": json.dumps(payload)}
+            for position, payload in enumerate(payloads[start:start + INSERT_CHUNK_SIZE], start)
+        ])
+    if commit:
+        await session.commit()
+    return job
+
+
+async def cancel_job(session: AsyncSession, job: Job) -> Job:
+    """
+    Cancels every item not yet finished. Workers running one notice on their
+    next lease renewal and stop it; results already written are kept.
+    """
+    now = datetime.utcnow()
+    await session.execute(
+        update(JobItem)
+        .where(JobItem.job_id == job.id, JobItem.status.in_(("pending", "running")))
+        .values(status="cancelled", finished_at=now, lease_owner=None, lease_expires_at=None)
+    )
+    job.status = "cancelled"
+    job.finished_at = now
+    session.add(job)
+    await session.commit()
+    return job
+
+
+def _claimable(now: datetime):
+    return or_(
+        JobItem.status == "pending",
+        and_(JobItem.status == "running", JobItem.lease_expires_at < now),
+    )
+
+
+class JobWorker:
+    """
+    Claims job items from the database and runs up to `concurrency` at once.
+
+    Workers share nothing but the database: an item is claimed by writing this
+    worker's id and a lease expiry onto its row, and the lease is renewed while
+    the item runs. If the worker dies, the lease runs out and another worker
+    claims the item again. Each finished item is committed with its result, so
+    a crash only loses the items in flight.
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        lease_seconds: float,
+        poll_seconds: float,
+        max_attempts: int,
+        owner: Optional[str] = None,
+    ):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"claimed": 0, "succeeded": 0, "failed": 0, "lost": 0}
+        self._running: Dict[int, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        # New work was queued by this process; skip the rest of the poll interval.
+        self._wake.set()
+
+    async def _claim(self, limit: int) -> List[Tuple[JobItem, str, Optional[str]]]:
+        from app.core.database import async_session_maker, engine
+
+        now = datetime.utcnow()
+        async with async_session_maker() as session:
+            query = select(JobItem.id).where(_claimable(now)).order_by(JobItem.job_id, JobItem.position).limit(limit)
+            if engine.dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+            ids = [item_id for item_id in (await session.exec(query)).all() if item_id not in self._running]
+            if not ids:
+                return []
+            # Re-checked in the UPDATE: an item another worker claimed in between no longer matches.
+            await session.execute(
+                update(JobItem)
+                .where(JobItem.id.in_(ids), _claimable(now))
+                .values(
+                    status="running",
+                    lease_owner=self.owner,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    attempts=JobItem.attempts + 1,
+                )
+            )
+            rows = (await session.exec(
+                select(JobItem, Job.kind, Job.user_id)
+                .join(Job, Job.id == JobItem.job_id)
+                .where(JobItem.id.in_(ids), JobItem.lease_owner == self.owner, JobItem.status == "running")
+            )).all()
+            if rows:
+                await session.execute(
+                    update(Job)
+                    .where(Job.id.in_({item.job_id for item, _, _ in rows}), Job.status == "queued")
+                    .values(status="running", started_at=now)
+                )
+            await session.commit()
+        self.stats["claimed"] += len(rows)
+        return rows
+
+    async def _run_item(self, item: JobItem, kind: str, user_id: Optional[str]) -> None:
+        result_json, error = None, None
+        if item.attempts > self.max_attempts:
+            error = f"Abandoned after {self.max_attempts} attempts; its worker stopped each time"
+        else:
+            try:
+                result = await get_job_handler(kind)(json.loads(item.payload_json), user_id)
+                result_json = json.dumps(result, default=str)
+            except asyncio.CancelledError:
+                # Cancelled job, lost lease or shutdown: the item is not ours to finish.
+                raise
+            except Exception as e:
+                error = str(e) or type(e).__name__
+        # No more lease renewals: the item is being finished.
+        self._running.pop(item.id, None)
+        await self._finish(item, result_json, error)
+
+    async def _finish(self, item: JobItem, result_json: Optional[str], error: Optional[str]) -> None:
+        from app.core.database import async_session_maker
+
+        now = datetime.utcnow()
+        succeeded = error is None
+        async with async_session_maker() as session:
+            result = await session.execute(
+                update(JobItem)
+                .where(JobItem.id == item.id, JobItem.lease_owner == self.owner, JobItem.status == "running")
+                .values(
+                    status="succeeded" if succeeded else "failed",
+                    result_json=result_json,
+                    error=error,
+                    finished_at=now,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                )
+            )
+            if result.rowcount == 0:
+                # Cancelled, or the lease expired and another worker has the item now.
+                self.stats["lost"] += 1
+                await session.rollback()
+                return
+            counter = Job.succeeded_items if succeeded else Job.failed_items
+            await session.execute(update(Job).where(Job.id == item.job_id).values({counter: counter + 1}))
+            await session.execute(
+                update(Job)
+                .where(
+                    Job.id == item.job_id,
+                    Job.status == "running",
+                    Job.succeeded_items + Job.failed_items >= Job.total_items,
+                )
+                .values(status="completed", finished_at=now)
+            )
+            await session.commit()
+        self.stats["succeeded" if succeeded else "failed"] += 1
+
+    async def _renew_leases(self) -> None:
+        from app.core.database import async_session_maker
+
+        ids = list(self._running)
+        if not ids:
+            return
+        held_by_us = and_(JobItem.id.in_(ids), JobItem.lease_owner == self.owner, JobItem.status == "running")
+        async with async_session_maker() as session:
+            await session.execute(
+                update(JobItem)
+                .where(held_by_us)
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.lease_seconds))
+            )
+            held = set((await session.exec(select(JobItem.id).where(held_by_us))).all())
+            await session.commit()
+        for item_id in ids:
+            task = self._running.get(item_id)
+            if item_id not in held and task is not None:
+                self._running.pop(item_id, None)
+                task.cancel()
+                self.stats["lost"] += 1
+
+    async def _release(self, ids: List[int]) -> None:
+        """
+        Hands unfinished items back on shutdown so another worker picks them
+        up now instead of after the lease runs out.
+        """
+        from app.core.database import async_session_maker
+
+        async with async_session_maker() as session:
+            await session.execute(
+                update(JobItem)
+                .where(JobItem.id.in_(ids), JobItem.lease_owner == self.owner, JobItem.status == "running")
+                .values(status="pending", lease_owner=None, lease_expires_at=None, attempts=JobItem.attempts - 1)
+            )
+            await session.commit()
+
+    def _item_done(self, item_id: int, task: asyncio.Task) -> None:
+        if self._running.get(item_id) is task:
+            self._running.pop(item_id)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"WARNING: Failed to finish job item {item_id}: {task.exception()}")
+        self._wake.set()
+
+    async def _idle(self) -> None:
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=self.poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    async def _claim_forever(self) -> None:
+        while not self._stopping:
+            free = self.concurrency - len(self._running)
+            claimed = []
+            if free > 0:
+                try:
+                    claimed = await self._claim(free)
+                except Exception as e:
+                    print(f"WARNING: Failed to claim job items: {e}")
+            for item, kind, user_id in claimed:
+                task = asyncio.create_task(self._run_item(item, kind, user_id))
+                self._running[item.id] = task
+                task.add_done_callback(lambda task, item_id=item.id: self._item_done(item_id, task))
+            # A full claim suggests more is queued; otherwise wait for a free slot or new work.
+            if not claimed or len(claimed) < free:
+                await self._idle()
+
+    async def _renew_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._renew_leases()
+            except Exception as e:
+                print(f"WARNING: Failed to renew job leases: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._claim_forever())
+            self._heartbeat = asyncio.create_task(self._renew_forever())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        self._heartbeat.cancel()
+        try:
+            await self._heartbeat
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat = None
+        running = dict(self._running)
+        self._running.clear()
+        for task in running.values():
+            task.cancel()
+        await asyncio.gather(*running.values(), return_exceptions=True)
+        if running:
+            try:
+                await self._release(list(running))
+            except Exception as e:
+                print(f"WARNING: Failed to release {len(running)} job items: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "owner": self.owner, "running": len(self._running), "concurrency": self.concurrency}
+
+    @classmethod
+    def from_settings(cls, concurrency: Optional[int] = None) -> "JobWorker":
+        return cls(
+            concurrency=concurrency or settings.JOB_WORKER_CONCURRENCY,
+            lease_seconds=settings.JOB_LEASE_SECONDS,
+            poll_seconds=settings.JOB_POLL_SECONDS,
+            max_attempts=settings.JOB_ITEM_MAX_ATTEMPTS,
+        )
+
+
+job_worker = JobWorker.from_settings()
@@ -1,73 +1,211 @@
-import httpx
-import openai
-import google.generativeai as genai
-from app.core.config import settings
-from typing import Dict, Any, Optional
+from app.services.providers import CompletionResult, StreamChunk, get_adapter, resolve_provider_kind
+from app.services.providers.base import ProviderAdapter
+from app.services.resilience import ProviderGuard, estimate_tokens, guard_for
+from app.services.execution_policy import Attempt, Candidate, PolicyStream, complete_with_policy
+from app.services.coalescing import CoalescedStream, flight_key, single_flight
+from app.core.metrics import LLM_IN_FLIGHT, LLM_TTFT_SECONDS, record_upstream
+from typing import AsyncIterator, Awaitable, Dict, Any, List, Optional, Tuple, TypeVar
+import time
+
+T = TypeVar("T")
 
 class LLMService:
+    @staticmethod
+    def _adapter(model_provider: str, provider_config: Dict[str, Any]) -> Tuple[ProviderAdapter, ProviderGuard]:
+        # A stored provider's kind wins over the free-form model_provider string.
+        kind = provider_config.get("kind") or resolve_provider_kind(model_provider)
+        return get_adapter(kind), guard_for(kind, provider_config)
+
+    @staticmethod
+    async def _observed(kind: str, model_name: str, call: Awaitable[T]) -> T:
+        # One upstream attempt: latency, errors and in-flight count per provider/model.
+        started = time.perf_counter()
+        in_flight = LLM_IN_FLIGHT.labels(kind)
+        in_flight.inc()
+        try:
+            result = await call
+        except Exception as e:
+            record_upstream(kind, model_name, time.perf_counter() - started, e)
+            raise
+        finally:
+            in_flight.dec()
+        record_upstream(kind, model_name, time.perf_counter() - started)
+        return result
+
+    @staticmethod
+    async def _observed_stream(kind: str, model_name: str, stream: AsyncIterator[StreamChunk]) -> AsyncIterator[StreamChunk]:
+        started = time.perf_counter()
+        first = True
+        error = None
+        in_flight = LLM_IN_FLIGHT.labels(kind)
+        in_flight.inc()
+        try:
+            async for chunk in stream:
+                if first:
+                    first = False
+                    LLM_TTFT_SECONDS.labels(kind, model_name).observe(time.perf_counter() - started)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            in_flight.dec()
+            await stream.aclose()
+            record_upstream(kind, model_name, time.perf_counter() - started, error)
+
+    @staticmethod
+    def _check_candidates(candidates: List[Candidate]) -> None:
+        # Surface unknown providers and missing credentials up front rather than
+        # mid-race, or (for streams) after the response has already started.
+        for candidate in candidates:
+            adapter = get_adapter(candidate.provider_config.get("kind") or resolve_provider_kind(candidate.model_provider))
+            adapter.check_config(candidate.provider_config)
+
     @staticmethod
     async def execute_prompt(
-        model_provider: str, 
-        model_name: str, 
-        prompt_text: str, 
+        model_provider: str,
+        model_name: str,
+        prompt_text: str,
         config: Dict[str, Any] = {},
         provider_config: Dict[str, Any] = {}
     ) -> str:
-        provider = model_provider.lower()
-        if "openai" in provider:
-            return await LLMService._run_openai(model_name, prompt_text, config, provider_config)
-        elif "gemini" in provider:
-            return await LLMService._run_gemini(model_name, prompt_text, config, provider_config)
-        elif "ollama" in provider:
-            return await LLMService._run_ollama(model_name, prompt_text, config, provider_config)
-        else:
-            raise ValueError(f"Unknown provider: {model_provider}")
+        result = await LLMService.complete(model_provider, model_name, prompt_text, config, provider_config)
+        return result.text
 
     @staticmethod
-    async def _run_openai(model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> str:
-        api_key = provider_config.get("api_key") or settings.OPENAI_API_KEY
-        base_url = provider_config.get("base_url")
-        if not api_key:
-             raise ValueError("OpenAI API Key not set")
-        
-        client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url)
-        response = await client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=config.get("temperature", 0.7)
+    async def complete(
+        model_provider: str,
+        model_name: str,
+        prompt_text: str,
+        config: Dict[str, Any] = {},
+        provider_config: Dict[str, Any] = {}
+    ) -> CompletionResult:
+        config = config or {}
+        adapter, guard = LLMService._adapter(model_provider, provider_config)
+        estimated = estimate_tokens(prompt_text, config)
+        result = await guard.call(
+            lambda: LLMService._observed(
+                adapter.kind, model_name, adapter.complete(model_name, prompt_text, config, provider_config)
+            ),
+            estimated_tokens=estimated
         )
-        return response.choices[0].message.content
+        guard.settle_tokens(estimated, result.usage)
+        return result
 
     @staticmethod
-    async def _run_gemini(model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> str:
-        api_key = provider_config.get("api_key") or settings.GEMINI_API_KEY
-        if not api_key:
-            raise ValueError("Gemini API Key not set")
-        genai.configure(api_key=api_key)
-        gemini_model = genai.GenerativeModel(model)
-        response = await gemini_model.generate_content_async(prompt)
-        return response.text
+    def stream_prompt(
+        model_provider: str,
+        model_name: str,
+        prompt_text: str,
+        config: Dict[str, Any] = {},
+        provider_config: Dict[str, Any] = {}
+    ) -> AsyncIterator[StreamChunk]:
+        """
+        Async generator of StreamChunks as they arrive from the upstream model.
+        Closing the generator (e.g. on client disconnect) closes the upstream request.
+        """
+        config = config or {}
+        adapter, guard = LLMService._adapter(model_provider, provider_config)
+        estimated = estimate_tokens(prompt_text, config)
+        return guard.stream(
+            lambda: LLMService._observed_stream(
+                adapter.kind, model_name, adapter.stream(model_name, prompt_text, config, provider_config)
+            ),
+            estimated_tokens=estimated
+        )
 
     @staticmethod
-    async def _run_ollama(model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> str:
-        base_url = provider_config.get("base_url") or settings.OLLAMA_BASE_URL
-        # Ollama API is usually at /api/generate
-        url = f"{base_url.rstrip('/')}/api/generate"
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "stream": False,
-            **config
-        }
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(url, json=payload, timeout=60.0)
-                if response.status_code == 400:
-                    detail = response.json().get("error", "")
-                    if "embed" in model.lower() or "nomic" in model.lower():
-                        raise ValueError(f"Model '{model}' appears to be an embedding model. Use a chat/generation model like 'llama3' for prompts.")
-                    raise ValueError(f"Ollama 400 Bad Request: {detail}")
-                response.raise_for_status()
-                return response.json().get("response", "")
-            except httpx.ConnectError:
-                raise ValueError(f"Could not connect to Ollama at {base_url}")
+    async def batch(
+        model_provider: str,
+        model_name: str,
+        prompts: List[str],
+        config: Dict[str, Any] = {},
+        provider_config: Dict[str, Any] = {}
+    ) -> List[CompletionResult]:
+        config = config or {}
+        adapter, guard = LLMService._adapter(model_provider, provider_config)
+        estimated = sum(estimate_tokens(prompt, config) for prompt in prompts)
+        results = await guard.call(
+            lambda: LLMService._observed(
+                adapter.kind, model_name, adapter.batch(model_name, prompts, config, provider_config)
+            ),
+            estimated_tokens=estimated,
+            requests=len(prompts)
+        )
+        guard.settle_tokens(estimated, {
+            "total_tokens": sum((result.usage or {}).get("total_tokens", 0) for result in results)
+        })
+        return results
+
+    @staticmethod
+    async def complete_with_policy(
+        candidates: List[Candidate],
+        prompt_text: str,
+        hedge_delay_ms: Optional[int] = None
+    ) -> Tuple[CompletionResult, Candidate, List[Attempt]]:
+        """
+        Tries the candidates in order (falling back on errors, hedging after
+        `hedge_delay_ms`) and returns the first success, who served it and
+        every attempt made.
+        """
+        LLMService._check_candidates(candidates)
+        return await complete_with_policy(
+            lambda candidate: LLMService.complete(
+                candidate.model_provider, candidate.model_name, prompt_text,
+                candidate.config, candidate.provider_config
+            ),
+            candidates,
+            hedge_delay_ms
+        )
+
+    @staticmethod
+    def stream_with_policy(
+        candidates: List[Candidate],
+        prompt_text: str,
+        hedge_delay_ms: Optional[int] = None
+    ) -> PolicyStream:
+        """
+        Like stream_prompt, but hedges/falls back until the first token arrives.
+        """
+        LLMService._check_candidates(candidates)
+        return PolicyStream(
+            lambda candidate: LLMService.stream_prompt(
+                candidate.model_provider, candidate.model_name, prompt_text,
+                candidate.config, candidate.provider_config
+            ),
+            candidates,
+            hedge_delay_ms
+        )
+
+    @staticmethod
+    async def complete_coalesced(
+        candidates: List[Candidate],
+        prompt_text: str,
+        hedge_delay_ms: Optional[int] = None
+    ) -> Tuple[CompletionResult, Candidate, List[Attempt], bool]:
+        """
+        complete_with_policy, but identical calls already in flight are joined
+        instead of repeated. The last element is whether this call joined one.
+        """
+        LLMService._check_candidates(candidates)
+        (result, served_by, attempts), coalesced = await single_flight.do(
+            flight_key("complete", candidates, prompt_text, hedge_delay_ms),
+            lambda: LLMService.complete_with_policy(candidates, prompt_text, hedge_delay_ms)
+        )
+        return result, served_by, attempts, coalesced
+
+    @staticmethod
+    def stream_coalesced(
+        candidates: List[Candidate],
+        prompt_text: str,
+        hedge_delay_ms: Optional[int] = None
+    ) -> CoalescedStream:
+        """
+        stream_with_policy, fanned out: every identical stream in flight reads
+        the same upstream chunks, replayed from the start for late joiners.
+        """
+        LLMService._check_candidates(candidates)
+        return single_flight.stream(
+            flight_key("stream", candidates, prompt_text, hedge_delay_ms),
+            lambda: LLMService.stream_with_policy(candidates, prompt_text, hedge_delay_ms)
+        )
@@ -0,0 +1,113 @@
+import base64
+import json
+import re
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import text, tuple_
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.prompt import Prompt
+
+# Columns read_prompts can sort by; each has a (column, id) composite index.
+SORTABLE_COLUMNS = {
+    "created_at": Prompt.created_at,
+    "updated_at": Prompt.updated_at,
+    "name": Prompt.name,
+    "id": Prompt.id,
+}
+
+# Postgres: the expression must match the ix_prompt_search GIN index (migration
+# 0001) exactly for the planner to use it. SQLite searches its prompt_fts table.
+PG_SEARCH_VECTOR = (
+    "to_tsvector('simple', coalesce(prompt.name, '') || ' ' || "
+    "coalesce(prompt.description, '') || ' ' || coalesce(prompt.tags, ''))"
+)
+
+# Searches report an exact total only up to this many matches.
+ESTIMATE_CAP = 1000
+
+
+def _fts5_query(search: str) -> str:
+    # Quote every term so user input can't inject FTS5 syntax; prefix-match the terms.
+    terms = re.findall(r"\w+", search)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def apply_search(query, search: str, dialect: str):
+    if dialect == "sqlite":
+        match = _fts5_query(search)
+        if not match:
+            return query
+        return query.where(Prompt.id.in_(
+            text("SELECT rowid FROM prompt_fts WHERE prompt_fts MATCH :match").bindparams(match=match)
+        ))
+    if dialect == "postgresql":
+        return query.where(
+            text(f"{PG_SEARCH_VECTOR} @@ websearch_to_tsquery('simple', :search)").bindparams(search=search)
+        )
+    return query.where((Prompt.name.contains(search)) | (Prompt.description.contains(search)) | (Prompt.tags.contains(search)))
+
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, sort_by: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        if sort_by in ("created_at", "updated_at"):
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def apply_keyset(query, sort_by: str, order: str, cursor: Optional[str]):
+    """
+    Orders by (sort column, id) and, given a cursor from the previous page,
+    seeks past it instead of using OFFSET.
+    """
+    column = SORTABLE_COLUMNS[sort_by]
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort_by)
+        if order == "desc":
+            query = query.where(tuple_(column, Prompt.id) < tuple_(value, row_id))
+        else:
+            query = query.where(tuple_(column, Prompt.id) > tuple_(value, row_id))
+    if order == "desc":
+        return query.order_by(column.desc(), Prompt.id.desc())
+    return query.order_by(column.asc(), Prompt.id.asc())
+
+
+async def count_prompts(session: AsyncSession, filtered_query, dialect: str, mode: str, searching: bool) -> Tuple[Optional[int], bool]:
+    """
+    Returns (total, is_estimate). "exact" counts every match; "estimate" uses
+    table statistics for unfiltered listings and a capped count for searches.
+    """
+    if mode == "none":
+        return None, False
+    if mode == "exact":
+        total = (await session.exec(select(func.count()).select_from(filtered_query.subquery()))).one()
+        return total, False
+
+    if not searching:
+        if dialect == "postgresql":
+            estimate = (await session.exec(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'prompt'")
+            )).first()
+            if estimate and estimate[0] >= 0:
+                return int(estimate[0]), True
+        elif dialect == "sqlite":
+            # max(id) is answered from the primary key; it over-counts only by deleted rows.
+            estimate = (await session.exec(select(func.max(Prompt.id)))).one()
+            return int(estimate or 0), True
+
+    capped = filtered_query.with_only_columns(Prompt.id).order_by(None).limit(ESTIMATE_CAP + 1).subquery()
+    total = (await session.exec(select(func.count()).select_from(capped))).one()
+    return min(total, ESTIMATE_CAP), total > ESTIMATE_CAP
@@ -0,0 +1,354 @@
+"""
+Bulk export and import of the prompt library as NDJSON: one PromptTransfer
+per line, a prompt with all of its versions and their full templates.
+
+Export reads through a server-side cursor, so memory stays flat however
+large the library is. Import parses the upload line by line and writes it in
+batches, each a handful of multi-row statements and one commit, instead of a
+transaction per prompt and per version.
+"""
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import func, insert, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.etags import version_index
+from app.models.prompt import Prompt, PromptImportError, PromptImportResult, PromptTransfer, PromptVersion
+from app.services.execution_policy import ExecutionPolicy
+from app.services.template_service import prompt_template_cache
+from app.services.template_store import template_hash, template_store
+
+EXPORT_FETCH_ROWS = 1000
+
+_PROMPT_FIELDS = ("description", "tags", "execution_policy_json")
+_VERSION_FIELDS = ("input_variables", "model_config_json", "commit_message")
+
+
+async def export_ndjson() -> AsyncIterator[bytes]:
+    """
+    Yields one line per prompt, in id order. Runs after the endpoint has
+    returned, so it opens its own session.
+    """
+    from app.core.database import async_session_maker
+
+    query = (
+        select(
+            Prompt.id, Prompt.name, Prompt.description, Prompt.tags, Prompt.execution_policy_json,
+            Prompt.created_at, Prompt.active_version_id,
+            PromptVersion.id, PromptVersion.version_number, PromptVersion.input_variables,
+            PromptVersion.model_config_json, PromptVersion.commit_message, PromptVersion.created_at,
+            PromptVersion.template_hash,
+        )
+        .outerjoin(PromptVersion, PromptVersion.prompt_id == Prompt.id)
+        .order_by(Prompt.id, PromptVersion.version_number)
+        .execution_options(yield_per=EXPORT_FETCH_ROWS)
+    )
+    current_id, line = None, None
+    async with async_session_maker() as session:
+        result = await session.stream(query)
+        async for rows in result.partitions():
+            templates = await template_store.load_many(session, {row[-1] for row in rows if row[-1]})
+            for (
+                prompt_id, name, description, tags, policy_json, created_at, active_version_id,
+                version_id, version_number, input_variables, model_config_json, commit_message,
+                version_created_at, digest,
+            ) in rows:
+                if prompt_id != current_id:
+                    if line is not None:
+                        yield orjson.dumps(line) + b"\n"
+                    current_id = prompt_id
+                    line = {
+                        "name": name,
+                        "description": description,
+                        "tags": tags,
+                        "execution_policy_json": policy_json,
+                        "created_at": created_at,
+                        "active_version_number": None,
+                        "versions": [],
+                    }
+                if version_id is None:
+                    continue
+                if version_id == active_version_id:
+                    line["active_version_number"] = version_number
+                line["versions"].append({
+                    "version_number": version_number,
+                    "template": templates[digest],
+                    "input_variables": input_variables,
+                    "model_config_json": model_config_json,
+                    "commit_message": commit_message,
+                    "created_at": version_created_at,
+                })
+    if line is not None:
+        yield orjson.dumps(line) + b"\n"
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if b"\n" in chunk:
+            *lines, rest = buffer.split(b"\n")
+            buffer = bytearray(rest)
+            for line in lines:
+                yield bytes(line)
+    if buffer:
+        yield bytes(buffer)
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}" if detail["loc"] else detail["msg"]
+        for detail in error.errors()[:5]
+    )
+
+
+def _check(prompt: PromptTransfer) -> Optional[str]:
+    if prompt.execution_policy_json:
+        try:
+            ExecutionPolicy.model_validate_json(prompt.execution_policy_json)
+        except ValueError as e:
+            return f"Invalid execution_policy_json: {e}"
+    numbers = [version.version_number for version in prompt.versions]
+    if len(set(numbers)) != len(numbers):
+        return "Duplicate version_number"
+    return None
+
+
+def _changes(current: Dict[str, Any], model: Any, fields: Tuple[str, ...]) -> Dict[str, Any]:
+    # Fields left out of a line keep their current value.
+    return {
+        field: getattr(model, field)
+        for field in fields
+        if field in model.model_fields_set and getattr(model, field) != current[field]
+    }
+
+
+class PromptImporter:
+    """
+    Upserts prompts by name: a line whose name matches an existing prompt
+    updates it (the oldest, if several share the name), and its versions are
+    matched by version_number. Anything else is created.
+
+    Lines are buffered into batches of about `batch_versions` versions, each
+    written in one transaction. A bad line is reported and skipped; a batch
+    the database rejects is rolled back and each of its lines reported.
+    """
+
+    def __init__(self, session: AsyncSession, batch_versions: int, max_errors: int):
+        self.session = session
+        self.batch_versions = batch_versions
+        self.max_errors = max_errors
+        self.result = PromptImportResult()
+        self._batch: List[Tuple[int, PromptTransfer]] = []
+        self._names: Set[str] = set()
+        self._versions = 0
+
+    def _error(self, line: int, name: Optional[str], error: str) -> None:
+        self.result.failed_lines += 1
+        if len(self.result.errors) < self.max_errors:
+            self.result.errors.append(PromptImportError(line=line, name=name, error=error))
+
+    async def add(self, line: int, raw: bytes) -> None:
+        if not raw.strip():
+            return
+        try:
+            prompt = PromptTransfer.model_validate_json(raw)
+        except ValidationError as e:
+            self._error(line, None, _validation_message(e))
+            return
+        problem = _check(prompt)
+        if problem:
+            self._error(line, prompt.name, problem)
+            return
+        # A name seen twice in one batch would be created twice; write the first one out.
+        if prompt.name in self._names:
+            await self.flush()
+        self._batch.append((line, prompt))
+        self._names.add(prompt.name)
+        self._versions += len(prompt.versions)
+        if self._versions >= self.batch_versions or len(self._batch) >= self.batch_versions:
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch = self._batch
+        self._batch, self._names, self._versions = [], set(), 0
+        if not batch:
+            return
+        counts = PromptImportResult()
+        try:
+            failures, changed_prompts, changed_versions = await self._write(batch, counts)
+            await self.session.commit()
+        except SQLAlchemyError as e:
+            await self.session.rollback()
+            # The driver's message, without the statement and its (many) parameters
+            error = f"Batch rolled back: {getattr(e, 'orig', None) or e}"
+            for line, prompt in batch:
+                self._error(line, prompt.name, error)
+            return
+        for field in ("prompts_created", "prompts_updated", "versions_created", "versions_updated", "versions_unchanged"):
+            setattr(self.result, field, getattr(self.result, field) + getattr(counts, field))
+        for line, name, error in failures:
+            self._error(line, name, error)
+        for prompt_id in changed_prompts:
+            prompt_template_cache.invalidate_prompt(prompt_id)
+            version_index.invalidate(f"prompt:{prompt_id}")
+        for version_id in changed_versions:
+            prompt_template_cache.invalidate_version(version_id)
+
+    async def _write(
+        self, batch: List[Tuple[int, PromptTransfer]], counts: PromptImportResult
+    ) -> Tuple[List[Tuple[int, str, str]], Set[int], List[int]]:
+        session = self.session
+        now = datetime.utcnow()
+        failures: List[Tuple[int, str, str]] = []
+
+        existing: Dict[str, Dict[str, Any]] = {}
+        rows = (await session.exec(
+            select(Prompt.id, Prompt.name, Prompt.active_version_id, *(getattr(Prompt, field) for field in _PROMPT_FIELDS))
+            .where(Prompt.name.in_([prompt.name for _, prompt in batch]))
+            .order_by(Prompt.id)
+        )).all()
+        for prompt_id, name, active_version_id, *values in rows:
+            existing.setdefault(name, {"id": prompt_id, "active_version_id": active_version_id, **dict(zip(_PROMPT_FIELDS, values))})
+
+        ids = {name: current["id"] for name, current in existing.items()}
+        created = [prompt for _, prompt in batch if prompt.name not in existing]
+        if created:
+            inserted = await session.execute(
+                insert(Prompt).returning(Prompt.id, Prompt.name, sort_by_parameter_order=True),
+                [
+                    {
+                        "name": prompt.name,
+                        **{field: getattr(prompt, field) for field in _PROMPT_FIELDS},
+                        "created_at": prompt.created_at or now,
+                        "updated_at": now,
+                        "active_version_id": None,
+                    }
+                    for prompt in created
+                ],
+            )
+            ids.update({name: prompt_id for prompt_id, name in inserted.all()})
+            counts.prompts_created = len(created)
+        # prompt id -> column changes, for existing prompts and every prompt's active version
+        prompt_updates: Dict[int, Dict[str, Any]] = {}
+        for _, prompt in batch:
+            if prompt.name in existing:
+                changes = _changes(existing[prompt.name], prompt, _PROMPT_FIELDS)
+                if changes:
+                    prompt_updates[ids[prompt.name]] = changes
+
+        # Versions already stored under the imported numbers, and each existing prompt's
+        # newest version, which the first imported template is delta-encoded against.
+        existing_ids = [current["id"] for current in existing.values()]
+        current_versions: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        newest_hash: Dict[int, str] = {}
+        if existing_ids:
+            keys = [(ids[prompt.name], version.version_number) for _, prompt in batch if prompt.name in existing for version in prompt.versions]
+            if keys:
+                rows = (await session.exec(
+                    select(
+                        PromptVersion.id, PromptVersion.prompt_id, PromptVersion.version_number, PromptVersion.template_hash,
+                        *(getattr(PromptVersion, field) for field in _VERSION_FIELDS)
+                    ).where(tuple_(PromptVersion.prompt_id, PromptVersion.version_number).in_(keys))
+                )).all()
+                for version_id, prompt_id, version_number, digest, *values in rows:
+                    current_versions[(prompt_id, version_number)] = {"id": version_id, "template_hash": digest, **dict(zip(_VERSION_FIELDS, values))}
+            newer = aliased(PromptVersion)
+            newest = select(func.max(newer.version_number)).where(newer.prompt_id == PromptVersion.prompt_id).scalar_subquery()
+            newest_hash = dict((await session.exec(
+                select(PromptVersion.prompt_id, PromptVersion.template_hash)
+                .where(PromptVersion.prompt_id.in_(existing_ids), PromptVersion.version_number == newest)
+            )).all())
+
+        ordered = [(ids[prompt.name], sorted(prompt.versions, key=lambda version: version.version_number)) for _, prompt in batch]
+        items = []
+        for prompt_id, versions in ordered:
+            base = newest_hash.get(prompt_id)
+            for version in versions:
+                items.append((version.template, base))
+                base = template_hash(version.template)
+        digests = iter(await template_store.store_many(session, items))
+
+        inserts, updates, replaced, changed_versions = [], [], [], []
+        for prompt_id, versions in ordered:
+            for version in versions:
+                digest = next(digests)
+                current = current_versions.get((prompt_id, version.version_number))
+                if current is None:
+                    inserts.append({
+                        "prompt_id": prompt_id,
+                        "version_number": version.version_number,
+                        **{field: getattr(version, field) for field in _VERSION_FIELDS},
+                        "template_hash": digest,
+                        "created_at": version.created_at or now,
+                    })
+                    prompt_updates.setdefault(prompt_id, {})
+                    continue
+                changes = _changes(current, version, _VERSION_FIELDS)
+                if digest != current["template_hash"]:
+                    changes["template_hash"] = digest
+                    replaced.append(current["template_hash"])
+                if not changes:
+                    counts.versions_unchanged += 1
+                    continue
+                updates.append({"id": current["id"], **changes})
+                changed_versions.append(current["id"])
+                prompt_updates.setdefault(prompt_id, {})
+        if inserts:
+            await session.execute(insert(PromptVersion), inserts)
+        if updates:
+            await session.execute(update(PromptVersion), updates)
+        if replaced:
+            await template_store.release(session, replaced)
+        counts.versions_created, counts.versions_updated = len(inserts), len(updates)
+
+        # The requested active version, else (like creating a first version) the
+        # lowest imported one when the prompt has none yet.
+        targets: Dict[Tuple[int, int], Tuple[int, str]] = {}
+        for line, prompt in batch:
+            number = prompt.active_version_number
+            has_active = prompt.name in existing and existing[prompt.name]["active_version_id"] is not None
+            if number is None and not has_active and prompt.versions:
+                number = min(version.version_number for version in prompt.versions)
+            if number is not None:
+                targets[(ids[prompt.name], number)] = (line, prompt.name)
+        if targets:
+            found = {
+                (prompt_id, version_number): version_id
+                for version_id, prompt_id, version_number in (await session.exec(
+                    select(PromptVersion.id, PromptVersion.prompt_id, PromptVersion.version_number)
+                    .where(tuple_(PromptVersion.prompt_id, PromptVersion.version_number).in_(list(targets)))
+                )).all()
+            }
+            active_before = {current["id"]: current["active_version_id"] for current in existing.values()}
+            for (prompt_id, number), (line, name) in targets.items():
+                version_id = found.get((prompt_id, number))
+                if version_id is None:
+                    failures.append((line, name, f"Active version {number} not found; the active version was left unchanged"))
+                elif version_id != active_before.get(prompt_id):
+                    prompt_updates.setdefault(prompt_id, {})["active_version_id"] = version_id
+
+        touched = set(prompt_updates)
+        counts.prompts_updated = len(touched & set(existing_ids))
+        if prompt_updates:
+            await session.execute(update(Prompt), [
+                {"id": prompt_id, **changes, "updated_at": now} for prompt_id, changes in prompt_updates.items()
+            ])
+        return failures, touched, changed_versions
+
+
+async def import_ndjson(session: AsyncSession, chunks: AsyncIterator[bytes]) -> PromptImportResult:
+    importer = PromptImporter(session, settings.PROMPT_IMPORT_BATCH_VERSIONS, settings.PROMPT_IMPORT_MAX_ERRORS)
+    line = 0
+    async for raw in _lines(chunks):
+        line += 1
+        await importer.add(line, raw)
+    await importer.flush()
+    return importer.result
@@ -0,0 +1,172 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.catalog import CatalogVersion
+from app.models.provider import LLMProvider, LLMProviderRead
+
+CATALOG_NAME = "providers"
+
+
+async def bump_catalog_version(session: AsyncSession) -> None:
+    """
+    Marks the provider catalog as changed. Call inside the transaction that
+    changes a provider or model, before committing.
+    """
+    # Migrations seed the row, but an upsert keeps two first writers on an
+    # unseeded database from both inserting it.
+    dialect = session.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(CatalogVersion).values(
+            name=CATALOG_NAME, version=1, updated_at=datetime.utcnow()
+        )
+        await session.execute(insert.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"version": CatalogVersion.version + 1, "updated_at": insert.excluded.updated_at},
+        ))
+        return
+    result = await session.execute(
+        update(CatalogVersion)
+        .where(CatalogVersion.name == CATALOG_NAME)
+        .values(version=CatalogVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        session.add(CatalogVersion(name=CATALOG_NAME, version=1))
+
+
+class ProviderCatalog:
+    """
+    Every provider and its models, held in memory so execute calls and the
+    provider list never query the database for them. The list includes
+    inactive providers (so they can be re-enabled); adapter configs are only
+    kept for active ones.
+
+    Provider handlers reload it after committing a change. A background task
+    polls the CatalogVersion stamp every `refresh_seconds` and reloads when
+    another worker has bumped it.
+    """
+
+    def __init__(self, refresh_seconds: float = 2.0):
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[int] = None
+        self._configs: Dict[int, Dict[str, Any]] = {}
+        self._inactive: Set[int] = set()
+        self._list_json = b"[]"
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.version is not None
+
+    async def reload(self) -> None:
+        async with self._lock:
+            await self._load()
+
+    async def ensure_loaded(self) -> None:
+        if not self.loaded:
+            async with self._lock:
+                # Concurrent first requests wait for one load instead of each doing their own.
+                if not self.loaded:
+                    await self._load()
+
+    async def _load(self) -> None:
+        from app.core.database import async_session_maker
+
+        async with async_session_maker() as session:
+            version = await self._read_version(session)
+            providers = (await session.exec(
+                select(LLMProvider).options(selectinload(LLMProvider.models)).order_by(LLMProvider.id)
+            )).all()
+        configs: Dict[int, Dict[str, Any]] = {}
+        inactive: Set[int] = set()
+        serialized: List[bytes] = []
+        for provider in providers:
+            serialized.append(LLMProviderRead.model_validate(provider).model_dump_json().encode("utf-8"))
+            if not provider.is_active:
+                inactive.add(provider.id)
+                continue
+            configs[provider.id] = {
+                "id": provider.id,
+                "kind": provider.kind,
+                "api_key": provider.api_key,
+                "base_url": provider.base_url,
+                "requests_per_minute": provider.requests_per_minute,
+                "tokens_per_minute": provider.tokens_per_minute,
+            }
+        # Swap everything at once so readers never see a half-built catalog.
+        list_json = b"[" + b",".join(serialized) + b"]"
+        self._configs, self._inactive, self._list_json, self.version = configs, inactive, list_json, version
+
+    async def refresh_if_stale(self) -> bool:
+        """
+        Reloads when the DB stamp differs from the loaded one. Returns whether it did.
+        """
+        from app.core.database import async_session_maker
+
+        async with async_session_maker() as session:
+            version = await self._read_version(session)
+        if version == self.version:
+            return False
+        await self.reload()
+        return True
+
+    async def config(self, provider_id: int) -> Optional[Dict[str, Any]]:
+        """
+        The provider's adapter config, or None if no such active provider exists.
+        """
+        await self.ensure_loaded()
+        config = self._configs.get(provider_id)
+        if config is None and provider_id not in self._inactive and await self.refresh_if_stale():
+            # Possibly created on another worker since the last poll.
+            config = self._configs.get(provider_id)
+        return dict(config) if config is not None else None
+
+    def is_inactive(self, provider_id: int) -> bool:
+        return provider_id in self._inactive
+
+    async def list_json(self) -> bytes:
+        await self.ensure_loaded()
+        return self._list_json
+
+    async def _read_version(self, session: AsyncSession) -> int:
+        version = (await session.exec(
+            select(CatalogVersion.version).where(CatalogVersion.name == CATALOG_NAME)
+        )).first()
+        return version or 0
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            try:
+                if self.loaded:
+                    await self.refresh_if_stale()
+                else:
+                    await self.ensure_loaded()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WARNING: Failed to refresh provider catalog: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+provider_catalog = ProviderCatalog(refresh_seconds=settings.PROVIDER_CATALOG_REFRESH_SECONDS)
@@ -0,0 +1,3 @@
+from .base import ProviderAdapter, CompletionResult, StreamChunk
+from .registry import get_adapter, register_adapter, normalize_provider_kind, infer_provider_kind, resolve_provider_kind
+from .errors import ProviderError, ProviderRateLimited, ProviderTimeout, ProviderUnavailable, CircuitOpen
@@ -0,0 +1,62 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+
+@dataclass
+class StreamChunk:
+    text: str = ""
+    # Only set on the final chunk: {"input_tokens", "output_tokens", "total_tokens"}
+    usage: Optional[Dict[str, Any]] = None
+    # Final chunk only: provider-specific extras, as in CompletionResult.metadata
+    metadata: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class CompletionResult:
+    text: str
+    usage: Optional[Dict[str, Any]] = None
+    # Provider-specific extras (timings, finish reason, ...)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class ProviderAdapter:
+    """
+    Common async interface every upstream backend implements. Adapters are
+    instantiated once per process by the registry and must be safe to share
+    between concurrent requests; per-credential clients come from the
+    ClientRegistry.
+    """
+
+    kind: str = ""
+
+    def check_config(self, provider_config: Dict[str, Any]) -> None:
+        """
+        Raises ValueError when a call could not even be attempted (e.g. no API
+        key), so callers can reject the request before streaming a response.
+        """
+
+    def client_key(self, provider_config: Dict[str, Any]) -> Optional[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        The ClientRegistry key this provider's pooled client lives under, so
+        it can be evicted when the provider changes. None if it has none.
+        """
+        return None
+
+    async def complete(
+        self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]
+    ) -> CompletionResult:
+        raise NotImplementedError
+
+    def stream(
+        self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]
+    ) -> AsyncIterator[StreamChunk]:
+        raise NotImplementedError
+
+    async def batch(
+        self, model: str, prompts: List[str], config: Dict[str, Any], provider_config: Dict[str, Any]
+    ) -> List[CompletionResult]:
+        # Backends without a native batch API just fan out over the pooled client.
+        return list(await asyncio.gather(
+            *(self.complete(model, prompt, config, provider_config) for prompt in prompts)
+        ))
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class ProviderError(Exception):
+    """
+    An upstream failure, classified so LLMService can decide whether to
+    retry and whether it counts against the provider's circuit breaker.
+    """
+
+    status_code = 502
+    retryable = False
+    # Whether the failure says something about the provider's health.
+    counts_as_failure = False
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ProviderRateLimited(ProviderError):
+    status_code = 429
+    retryable = True
+
+
+class ProviderTimeout(ProviderError):
+    status_code = 504
+    retryable = True
+    counts_as_failure = True
+
+
+class ProviderUnavailable(ProviderError):
+    status_code = 503
+    retryable = True
+    counts_as_failure = True
+
+
+class CircuitOpen(ProviderError):
+    status_code = 503
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delta-seconds or an HTTP-date.
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_for_status(status_code: int, message: str, retry_after: Optional[str] = None) -> Optional[ProviderError]:
+    if status_code == 429:
+        return ProviderRateLimited(message, parse_retry_after(retry_after))
+    if status_code in (408, 504):
+        return ProviderTimeout(message, parse_retry_after(retry_after))
+    if status_code >= 500:
+        return ProviderUnavailable(message, parse_retry_after(retry_after))
+    return None
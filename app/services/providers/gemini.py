@@ -0,0 +1,72 @@
+import contextlib
+from typing import Any, AsyncIterator, Dict, Optional
+
+from google.api_core import exceptions as google_exceptions
+
+from app.core.config import settings
+from app.services.client_registry import get_client_registry
+from app.services.providers.base import CompletionResult, ProviderAdapter, StreamChunk
+from app.services.providers.errors import ProviderRateLimited, ProviderTimeout, ProviderUnavailable
+
+
+@contextlib.contextmanager
+def _translate_errors():
+    try:
+        yield
+    except google_exceptions.ResourceExhausted as e:
+        raise ProviderRateLimited(str(e)) from e
+    except (google_exceptions.DeadlineExceeded, google_exceptions.GatewayTimeout) as e:
+        raise ProviderTimeout(str(e)) from e
+    except (google_exceptions.ServiceUnavailable, google_exceptions.InternalServerError) as e:
+        raise ProviderUnavailable(str(e)) from e
+
+
+def _usage(metadata) -> Optional[Dict[str, Any]]:
+    if not metadata:
+        return None
+    return {
+        "input_tokens": metadata.prompt_token_count,
+        "output_tokens": metadata.candidates_token_count,
+        "total_tokens": metadata.total_token_count,
+    }
+
+
+class GeminiAdapter(ProviderAdapter):
+    kind = "gemini"
+
+    @staticmethod
+    def _api_key(provider_config: Dict[str, Any]) -> str:
+        api_key = provider_config.get("api_key") or settings.GEMINI_API_KEY
+        if not api_key:
+            raise ValueError("Gemini API Key not set")
+        return api_key
+
+    def check_config(self, provider_config: Dict[str, Any]) -> None:
+        self._api_key(provider_config)
+
+    def client_key(self, provider_config: Dict[str, Any]):
+        # Evicting this drops the key's service client and every model using it.
+        try:
+            return ("gemini", self._api_key(provider_config), None)
+        except ValueError:
+            return None
+
+    async def _model(self, model: str, provider_config: Dict[str, Any]):
+        return await get_client_registry().gemini_model(self._api_key(provider_config), model)
+
+    async def complete(self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> CompletionResult:
+        gemini_model = await self._model(model, provider_config)
+        with _translate_errors():
+            response = await gemini_model.generate_content_async(prompt)
+        return CompletionResult(text=response.text, usage=_usage(getattr(response, "usage_metadata", None)))
+
+    async def stream(self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> AsyncIterator[StreamChunk]:
+        gemini_model = await self._model(model, provider_config)
+        usage = None
+        with _translate_errors():
+            response = await gemini_model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                usage = _usage(getattr(chunk, "usage_metadata", None)) or usage
+                if chunk.text:
+                    yield StreamChunk(text=chunk.text)
+        yield StreamChunk(usage=usage)
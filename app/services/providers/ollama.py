@@ -0,0 +1,100 @@
+import json
+from typing import Any, AsyncIterator, Dict
+
+import httpx
+
+from app.core.config import settings
+from app.services.client_registry import get_client_registry
+from app.services.providers.base import CompletionResult, ProviderAdapter, StreamChunk
+from app.services.providers.errors import ProviderTimeout, ProviderUnavailable, error_for_status
+
+
+def _usage(data: Dict[str, Any]) -> Dict[str, Any]:
+    input_tokens = data.get("prompt_eval_count", 0)
+    output_tokens = data.get("eval_count", 0)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+    }
+
+
+# Server-side timings Ollama reports with the final response, in nanoseconds.
+TIMING_FIELDS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+
+
+def _metadata(data: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = {field: data[field] for field in TIMING_FIELDS if field in data}
+    if data.get("done_reason"):
+        metadata["finish_reason"] = data["done_reason"]
+    return metadata
+
+
+class OllamaAdapter(ProviderAdapter):
+    kind = "ollama"
+
+    def client_key(self, provider_config: Dict[str, Any]):
+        return ("ollama", None, provider_config.get("base_url") or settings.OLLAMA_BASE_URL)
+
+    @staticmethod
+    async def _error(response: httpx.Response, model: str) -> Exception:
+        await response.aread()
+        if response.status_code != 400:
+            return error_for_status(
+                response.status_code,
+                f"Ollama {response.status_code}: {response.text}",
+                response.headers.get("retry-after")
+            ) or httpx.HTTPStatusError(f"Ollama {response.status_code}", request=response.request, response=response)
+        detail = response.json().get("error", "")
+        if "embed" in model.lower() or "nomic" in model.lower():
+            return ValueError(f"Model '{model}' appears to be an embedding model. Use a chat/generation model like 'llama3' for prompts.")
+        return ValueError(f"Ollama 400 Bad Request: {detail}")
+
+    async def complete(self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> CompletionResult:
+        base_url = provider_config.get("base_url") or settings.OLLAMA_BASE_URL
+        # Ollama API is usually at /api/generate
+        url = f"{base_url.rstrip('/')}/api/generate"
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            **config
+        }
+        client = await get_client_registry().http_client("ollama", base_url)
+        try:
+            response = await client.post(url, json=payload)
+            if response.status_code >= 400:
+                raise await self._error(response, model)
+            data = response.json()
+            return CompletionResult(text=data.get("response", ""), usage=_usage(data), metadata=_metadata(data))
+        except httpx.ConnectError:
+            raise ProviderUnavailable(f"Could not connect to Ollama at {base_url}")
+        except httpx.TimeoutException:
+            raise ProviderTimeout(f"Ollama at {base_url} timed out")
+
+    async def stream(self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> AsyncIterator[StreamChunk]:
+        base_url = provider_config.get("base_url") or settings.OLLAMA_BASE_URL
+        url = f"{base_url.rstrip('/')}/api/generate"
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            **config,
+            "stream": True
+        }
+        client = await get_client_registry().http_client("ollama", base_url)
+        try:
+            async with client.stream("POST", url, json=payload) as response:
+                if response.status_code >= 400:
+                    raise await self._error(response, model)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        yield StreamChunk(text=data["response"])
+                    if data.get("done"):
+                        yield StreamChunk(usage=_usage(data), metadata=_metadata(data))
+        except httpx.ConnectError:
+            raise ProviderUnavailable(f"Could not connect to Ollama at {base_url}")
+        except httpx.TimeoutException:
+            raise ProviderTimeout(f"Ollama at {base_url} timed out")
@@ -0,0 +1,99 @@
+import contextlib
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import openai
+
+from app.core.config import settings
+from app.services.client_registry import get_client_registry
+from app.services.providers.base import CompletionResult, ProviderAdapter, StreamChunk
+from app.services.providers.errors import ProviderTimeout, ProviderUnavailable, error_for_status
+
+
+@contextlib.contextmanager
+def _translate_errors():
+    try:
+        yield
+    except openai.APITimeoutError as e:
+        raise ProviderTimeout(str(e)) from e
+    except openai.APIConnectionError as e:
+        raise ProviderUnavailable(str(e)) from e
+    except openai.APIStatusError as e:
+        error = error_for_status(e.status_code, str(e), e.response.headers.get("retry-after"))
+        if error is None:
+            raise
+        raise error from e
+
+
+def _usage(usage) -> Dict[str, Any]:
+    return {
+        "input_tokens": usage.prompt_tokens,
+        "output_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+
+class OpenAIAdapter(ProviderAdapter):
+    """
+    OpenAI chat completions. Also serves any OpenAI-compatible server
+    (vLLM, LM Studio, ...) through the provider's base_url.
+    """
+
+    kind = "openai"
+
+    def _credentials(self, provider_config: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        api_key = provider_config.get("api_key") or settings.OPENAI_API_KEY
+        base_url = provider_config.get("base_url")
+        if not api_key:
+            if not base_url:
+                raise ValueError("OpenAI API Key not set")
+            # Self-hosted OpenAI-compatible servers usually don't check the key.
+            api_key = "not-needed"
+        return api_key, base_url
+
+    def check_config(self, provider_config: Dict[str, Any]) -> None:
+        self._credentials(provider_config)
+
+    def client_key(self, provider_config: Dict[str, Any]):
+        try:
+            return ("openai", *self._credentials(provider_config))
+        except ValueError:
+            return None
+
+    async def _client(self, provider_config: Dict[str, Any]):
+        return await get_client_registry().openai_client(*self._credentials(provider_config))
+
+    async def complete(self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> CompletionResult:
+        client = await self._client(provider_config)
+        with _translate_errors():
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=config.get("temperature", 0.7)
+            )
+        return CompletionResult(
+            text=response.choices[0].message.content,
+            usage=_usage(response.usage) if response.usage else None,
+            metadata={"finish_reason": response.choices[0].finish_reason},
+        )
+
+    async def stream(self, model: str, prompt: str, config: Dict[str, Any], provider_config: Dict[str, Any]) -> AsyncIterator[StreamChunk]:
+        client = await self._client(provider_config)
+        with _translate_errors():
+            stream = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=config.get("temperature", 0.7),
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        usage = None
+        try:
+            with _translate_errors():
+                async for chunk in stream:
+                    if chunk.usage:
+                        usage = _usage(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield StreamChunk(text=chunk.choices[0].delta.content)
+        finally:
+            await stream.close()
+        yield StreamChunk(usage=usage)
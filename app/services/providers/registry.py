@@ -0,0 +1,88 @@
+import importlib
+import re
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services.providers.base import ProviderAdapter
+
+# kind -> "module:Class". Modules are imported on first use, so SDKs for
+# backends a deployment never calls are never loaded.
+_ADAPTER_PATHS: Dict[str, str] = {
+    "openai": "app.services.providers.openai_adapter:OpenAIAdapter",
+    "gemini": "app.services.providers.gemini:GeminiAdapter",
+    "ollama": "app.services.providers.ollama:OllamaAdapter",
+}
+
+# OpenAI-compatible servers only differ by base_url.
+_ALIASES: Dict[str, str] = {
+    "openai_compatible": "openai",
+    "vllm": "openai",
+    "lmstudio": "openai",
+    "lm_studio": "openai",
+    "google": "gemini",
+}
+
+_adapters: Dict[str, ProviderAdapter] = {}
+
+
+def register_adapter(kind: str, target: str) -> None:
+    """
+    Registers a backend: `target` is either "module:Class" or an existing
+    kind to alias (e.g. register_adapter("together", "openai")).
+    """
+    kind = normalize_provider_kind(kind)
+    if ":" in target:
+        _ADAPTER_PATHS[kind] = target
+    else:
+        _ALIASES[kind] = normalize_provider_kind(target)
+    _adapters.pop(kind, None)
+
+
+def normalize_provider_kind(kind: str) -> str:
+    return re.sub(r"[\s\-]+", "_", kind.strip().lower())
+
+
+def infer_provider_kind(name: str) -> Optional[str]:
+    """
+    Best-effort kind from a display name, e.g. "OpenAI GPT-4" -> "openai":
+    for providers created without a kind, and requests whose free-form
+    model_provider isn't a kind itself.
+    """
+    normalized = normalize_provider_kind(name)
+    if normalized in _ADAPTER_PATHS or normalized in _ALIASES:
+        return normalized
+    for kind in list(_ADAPTER_PATHS) + list(_ALIASES):
+        if kind in normalized:
+            return kind
+    return None
+
+
+def resolve_provider_kind(model_provider: str) -> str:
+    """
+    The kind for a request's model_provider when no stored provider gives
+    one: an exact (normalized) kind, else one inferred from the name.
+    Unresolvable names come back normalized, for get_adapter to reject.
+    """
+    return infer_provider_kind(model_provider) or normalize_provider_kind(model_provider)
+
+
+def get_adapter(kind: str) -> ProviderAdapter:
+    adapter = _adapters.get(kind)
+    if adapter is not None:
+        return adapter
+
+    resolved = _ALIASES.get(kind, kind)
+    path = _ADAPTER_PATHS.get(resolved)
+    if path is None:
+        raise ValueError(f"Unknown provider: {kind}")
+    adapter = _adapters.get(resolved)
+    if adapter is None:
+        module_name, class_name = path.split(":")
+        adapter = getattr(importlib.import_module(module_name), class_name)()
+        _adapters[resolved] = adapter
+    _adapters[kind] = adapter
+    return adapter
+
+
+for _kind, _target in settings.PROVIDER_ADAPTERS.items():
+    register_adapter(_kind, _target)
@@ -0,0 +1,277 @@
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.services.providers.errors import CircuitOpen, ProviderError, ProviderRateLimited
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Reservation-style token bucket: callers debit up front and sleep for the
+    deficit, so waiters are served in arrival order without a lock.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        # Kept as configured: rate * 60 doesn't round-trip for limits like 500.
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waiters = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Debits `amount` and returns how long the caller must wait for it.
+        """
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        # Returns a reservation of `amount` that won't be used.
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+    def adjust(self, amount: float) -> None:
+        # Settle the difference between an estimate and the actual usage.
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    async def acquire(self, amount: float, max_wait: float) -> None:
+        wait = self.reserve(amount)
+        if wait <= 0:
+            return
+        if wait > max_wait:
+            self.refund(amount)
+            raise ProviderRateLimited("Local rate limit exceeded", retry_after=wait)
+        self.waiters += 1
+        try:
+            await asyncio.sleep(wait)
+        except BaseException:
+            # Cancelled while queued (hedge loser, client gone): the tokens
+            # were never used, so give them back to the waiters behind us.
+            self.refund(amount)
+            raise
+        finally:
+            self.waiters -= 1
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open fails
+    fast for `recovery_seconds`, then lets a single half-open probe through.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            remaining = self.opened_at + self.recovery_seconds - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpen("Provider circuit is open", retry_after=remaining)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                raise CircuitOpen("Provider circuit is half-open; probe in flight", retry_after=1.0)
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        # A half-open probe that ended without a verdict (e.g. a non-upstream error).
+        self._probing = False
+
+
+class ProviderGuard:
+    """
+    Rate limiting, retries and circuit breaking for one provider.
+    """
+
+    def __init__(self, key: str, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.key = key
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.breaker = CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RECOVERY_SECONDS)
+        self.in_flight = 0
+
+    def configure(self, requests_per_minute: Optional[int], tokens_per_minute: Optional[int]) -> None:
+        if (self.requests.per_minute if self.requests else None) != (requests_per_minute or None):
+            self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        if (self.tokens.per_minute if self.tokens else None) != (tokens_per_minute or None):
+            self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def _admit(self, estimated_tokens: int, requests: int = 1) -> None:
+        self.breaker.before_call()
+        # The bucket actually debited, in case configure() swaps it meanwhile.
+        admitted: Optional[TokenBucket] = None
+        try:
+            if self.requests:
+                bucket = self.requests
+                await bucket.acquire(requests, settings.LLM_RATE_LIMIT_MAX_WAIT)
+                admitted = bucket
+            if self.tokens and estimated_tokens:
+                await self.tokens.acquire(estimated_tokens, settings.LLM_RATE_LIMIT_MAX_WAIT)
+        except BaseException:
+            # Not admitted after all: return the request slot already taken.
+            if admitted is not None:
+                admitted.refund(requests)
+            self.breaker.release()
+            raise
+
+    def settle_tokens(self, estimated_tokens: int, usage: Optional[Dict[str, Any]]) -> None:
+        if self.tokens and usage and usage.get("total_tokens") is not None:
+            self.tokens.adjust(usage["total_tokens"] - estimated_tokens)
+
+    def _record(self, error: BaseException) -> None:
+        if isinstance(error, ProviderError) and error.counts_as_failure:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    async def call(self, fn: Callable[[], Awaitable[T]], estimated_tokens: int = 0, requests: int = 1) -> T:
+        attempts = settings.LLM_RETRY_MAX_ATTEMPTS
+        for attempt in range(attempts):
+            await self._admit(estimated_tokens, requests)
+            self.in_flight += 1
+            try:
+                result = await fn()
+            except ProviderError as e:
+                self._record(e)
+                delay = retry_delay(attempt, e.retry_after)
+                if not e.retryable or attempt == attempts - 1 or delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException as e:
+                self._record(e)
+                raise
+            finally:
+                self.in_flight -= 1
+            self.breaker.record_success()
+            return result
+        raise AssertionError("unreachable")
+
+    async def stream(self, factory: Callable[[], AsyncIterator[T]], estimated_tokens: int = 0) -> AsyncIterator[T]:
+        """
+        Retries a stream only until its first chunk; after that a failure is
+        passed to the caller, who has already seen partial output.
+        """
+        attempts = settings.LLM_RETRY_MAX_ATTEMPTS
+        for attempt in range(attempts):
+            await self._admit(estimated_tokens)
+            self.in_flight += 1
+            stream = factory()
+            started = False
+            try:
+                async for chunk in stream:
+                    if not started:
+                        started = True
+                        self.breaker.record_success()
+                    yield chunk
+                if not started:
+                    self.breaker.record_success()
+                return
+            except ProviderError as e:
+                self._record(e)
+                delay = retry_delay(attempt, e.retry_after)
+                if started or not e.retryable or attempt == attempts - 1 or delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            except BaseException as e:
+                if not started:
+                    self._record(e)
+                raise
+            finally:
+                self.in_flight -= 1
+                await stream.aclose()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "key": self.key,
+            "circuit_state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self.in_flight,
+            "queued": (self.requests.waiters if self.requests else 0) + (self.tokens.waiters if self.tokens else 0),
+            "requests_per_minute": self.requests.per_minute if self.requests else None,
+            "tokens_per_minute": self.tokens.per_minute if self.tokens else None,
+        }
+
+
+def retry_delay(attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds to wait before retrying: the server's Retry-After if it gave one,
+    otherwise exponential backoff with full jitter. None when Retry-After is
+    longer than LLM_RETRY_MAX_DELAY; retrying sooner would be refused again, so
+    the caller gives up and passes the error (and its retry_after) on.
+    """
+    if retry_after is not None:
+        return retry_after if retry_after <= settings.LLM_RETRY_MAX_DELAY else None
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+DEFAULT_COMPLETION_TOKENS = 256
+
+
+def estimate_tokens(prompt: str, config: Dict[str, Any]) -> int:
+    # ~4 characters per token plus the requested completion budget. The budget
+    # comes from user-supplied config, so anything that isn't a positive
+    # number falls back to the default rather than failing the request.
+    completion = config.get("max_tokens") or config.get("num_predict")
+    try:
+        completion = int(completion)
+    except (TypeError, ValueError, OverflowError):
+        completion = DEFAULT_COMPLETION_TOKENS
+    if completion <= 0:
+        completion = DEFAULT_COMPLETION_TOKENS
+    return len(prompt) // 4 + completion
+
+
+_guards: Dict[str, ProviderGuard] = {}
+
+
+def guard_for(kind: str, provider_config: Dict[str, Any]) -> ProviderGuard:
+    provider_id = provider_config.get("id")
+    key = f"provider:{provider_id}" if provider_id else f"kind:{kind}"
+    rpm = provider_config.get("requests_per_minute")
+    tpm = provider_config.get("tokens_per_minute")
+    guard = _guards.get(key)
+    if guard is None:
+        guard = _guards[key] = ProviderGuard(key, rpm, tpm)
+    else:
+        guard.configure(rpm, tpm)
+    return guard
+
+
+def forget_guard(provider_id: int) -> None:
+    _guards.pop(f"provider:{provider_id}", None)
+
+
+def guard_snapshots() -> list:
+    return [guard.snapshot() for guard in _guards.values()]
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import record_cache_lookup
+from app.models.cache import CachedResponse
+
+
+def cache_key(
+    model_provider: str,
+    model_name: str,
+    prompt_text: str,
+    config: Optional[Dict[str, Any]] = None,
+    provider_id: Optional[int] = None,
+) -> str:
+    """
+    Content address of an execution: sha256 over the normalized request.
+    """
+    normalized = {
+        "provider": model_provider.strip().lower(),
+        "provider_id": provider_id,
+        "model": model_name.strip(),
+        "prompt": prompt_text,
+        "config": config or {},
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(config: Optional[Dict[str, Any]]) -> bool:
+    # Sampling at temperature > 0 is non-deterministic, so only requests that pin
+    # temperature to 0 are worth caching.
+    config = config or {}
+    try:
+        return float(config["temperature"]) == 0.0
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+class ResponseCache:
+    """
+    Two-tier cache for execution results: an in-process LRU bounded by entry
+    count, total bytes and TTL, backed by the CachedResponse table so results
+    survive restarts and are shared between workers.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, max_bytes: int, persist: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.persist = persist
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @classmethod
+    def from_settings(cls) -> "ResponseCache":
+        return cls(
+            ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+            max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+            persist=settings.RESPONSE_CACHE_PERSIST,
+        )
+
+    async def get(self, session: AsyncSession, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            record_cache_lookup("response", True)
+            return value
+
+        if self.persist:
+            row = await session.get(CachedResponse, key)
+            if row is not None:
+                if row.expires_at is None or row.expires_at > datetime.utcnow():
+                    remaining = (row.expires_at - datetime.utcnow()).total_seconds() if row.expires_at else self.ttl_seconds
+                    self._set_memory(key, row.response, remaining)
+                    self.stats["db_hits"] += 1
+                    record_cache_lookup("response", True)
+                    return row.response
+                await session.delete(row)
+                await session.commit()
+
+        self.stats["misses"] += 1
+        record_cache_lookup("response", False)
+        return None
+
+    async def set(self, session: AsyncSession, key: str, value: str) -> None:
+        """
+        Stores `value` under `key`. A failed database write is logged and
+        swallowed: the caller already has its answer.
+        """
+        self._set_memory(key, value, self.ttl_seconds)
+        self.stats["stores"] += 1
+        if self.persist:
+            try:
+                await self._upsert(session, key, value)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                print(f"WARNING: Failed to persist cached response {key}: {e}")
+
+    async def _upsert(self, session: AsyncSession, key: str, value: str) -> None:
+        # Identical concurrent requests all miss and then all store the same
+        # key; the later writes refresh the row instead of hitting the primary key.
+        row = {
+            "key": key,
+            "response": value,
+            "created_at": datetime.utcnow(),
+            "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds),
+        }
+        dialect = session.bind.dialect.name
+        if dialect not in ("postgresql", "sqlite"):
+            await session.merge(CachedResponse(**row))
+            return
+        insert = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(CachedResponse).values(**row)
+        await session.execute(insert.on_conflict_do_update(
+            index_elements=["key"],
+            set_={
+                "response": insert.excluded.response,
+                "created_at": insert.excluded.created_at,
+                "expires_at": insert.excluded.expires_at,
+            },
+        ))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["db_hits"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_memory(self, key: str, value: str, ttl: float) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+response_cache = ResponseCache.from_settings()
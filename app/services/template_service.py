@@ -0,0 +1,170 @@
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import record_cache_lookup
+from app.models.prompt import Prompt, PromptVersion
+from app.services.template_store import template_store
+
+# Prompt templates reference variables as {{ name }}.
+VARIABLE_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}")
+
+
+class TemplateError(ValueError):
+    pass
+
+
+class CompiledTemplate:
+    """
+    A template pre-split into literal and variable parts, so rendering is a
+    single join instead of a regex pass over the template text.
+    """
+
+    def __init__(self, template: str):
+        self.source = template
+        self.parts: List[Tuple[bool, str]] = []
+        position = 0
+        for match in VARIABLE_PATTERN.finditer(template):
+            if match.start() > position:
+                self.parts.append((False, template[position:match.start()]))
+            self.parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(template):
+            self.parts.append((False, template[position:]))
+        self.variables: Set[str] = {value for is_var, value in self.parts if is_var}
+
+    def render(self, variables: Dict[str, Any]) -> str:
+        missing = self.variables - variables.keys()
+        if missing:
+            raise TemplateError(f"Missing template variables: {', '.join(sorted(missing))}")
+        return "".join(str(variables[value]) if is_var else value for is_var, value in self.parts)
+
+
+def compile_template(template: str) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
+def render_template(template: Union[str, CompiledTemplate], variables: Dict[str, Any]) -> str:
+    if isinstance(template, str):
+        template = compile_template(template)
+    return template.render(variables)
+
+
+class PreparedVersion:
+    """
+    Everything needed to execute a PromptVersion, parsed once: the compiled
+    template, declared input variables and the model config.
+    """
+
+    def __init__(self, version_id: int, prompt_id: int, template: str, input_variables: Optional[str], model_config_json: Optional[str]):
+        self.version_id = version_id
+        self.prompt_id = prompt_id
+        self.template = compile_template(template)
+        self.input_variables = _parse_input_variables(input_variables)
+        self.model_config: Dict[str, Any] = json.loads(model_config_json) if model_config_json else {}
+        self.loaded_at = time.monotonic()
+
+    def render(self, variables: Dict[str, Any]) -> str:
+        missing = [name for name in self.input_variables if name not in variables]
+        if missing:
+            raise TemplateError(f"Missing input variables: {', '.join(missing)}")
+        return self.template.render(variables)
+
+
+def _parse_input_variables(raw: Optional[str]) -> List[str]:
+    # Stored either as a JSON list of names, a list of {"name": ...} objects, or a {name: default} map.
+    if not raw:
+        return []
+    try:
+        parsed = json.loads(raw)
+    except ValueError:
+        return [name.strip() for name in raw.split(",") if name.strip()]
+    if isinstance(parsed, dict):
+        return list(parsed.keys())
+    if isinstance(parsed, list):
+        return [item["name"] if isinstance(item, dict) else str(item) for item in parsed]
+    return []
+
+
+class PromptTemplateCache:
+    """
+    Prepared versions keyed by version id, plus a prompt_id -> active_version_id
+    map, so executing a hot prompt never re-reads or re-parses its version.
+    Entries are dropped by the prompt/version mutation handlers; the TTL bounds
+    staleness for changes made by other workers.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._versions: "OrderedDict[int, PreparedVersion]" = OrderedDict()
+        # prompt_id -> (active_version_id, execution_policy_json, loaded_at)
+        self._active: Dict[int, Tuple[Optional[int], Optional[str], float]] = {}
+
+    async def resolve(self, session: AsyncSession, prompt_id: Optional[int] = None, version_id: Optional[int] = None) -> PreparedVersion:
+        if version_id is None:
+            if prompt_id is None:
+                raise LookupError("Either prompt_id or version_id is required")
+            version_id, _ = await self._prompt_state(session, prompt_id)
+            if version_id is None:
+                raise LookupError(f"Prompt {prompt_id} has no active version")
+
+        prepared = self._versions.get(version_id)
+        hit = prepared is not None and time.monotonic() - prepared.loaded_at < self.ttl_seconds
+        record_cache_lookup("template", hit)
+        if hit:
+            self._versions.move_to_end(version_id)
+        else:
+            version = await session.get(PromptVersion, version_id)
+            if version is None:
+                raise LookupError(f"Prompt version {version_id} not found")
+            template = await template_store.load(session, version.template_hash)
+            prepared = PreparedVersion(
+                version.id, version.prompt_id, template,
+                version.input_variables, version.model_config_json
+            )
+            self._versions[version_id] = prepared
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+        if prompt_id is not None and prepared.prompt_id != prompt_id:
+            raise LookupError(f"Version {version_id} does not belong to prompt {prompt_id}")
+        return prepared
+
+    async def execution_policy(self, session: AsyncSession, prompt_id: int) -> Optional[str]:
+        """
+        The prompt's execution_policy_json, cached alongside its active version id.
+        """
+        _, policy = await self._prompt_state(session, prompt_id)
+        return policy
+
+    def invalidate_version(self, version_id: int) -> None:
+        self._versions.pop(version_id, None)
+
+    def invalidate_prompt(self, prompt_id: int) -> None:
+        self._active.pop(prompt_id, None)
+
+    def clear(self) -> None:
+        self._versions.clear()
+        self._active.clear()
+
+    async def _prompt_state(self, session: AsyncSession, prompt_id: int) -> Tuple[Optional[int], Optional[str]]:
+        cached = self._active.get(prompt_id)
+        if cached is not None and time.monotonic() - cached[2] < self.ttl_seconds:
+            return cached[0], cached[1]
+        prompt = await session.get(Prompt, prompt_id)
+        if prompt is None:
+            raise LookupError(f"Prompt {prompt_id} not found")
+        self._active[prompt_id] = (prompt.active_version_id, prompt.execution_policy_json, time.monotonic())
+        return prompt.active_version_id, prompt.execution_policy_json
+
+
+prompt_template_cache = PromptTemplateCache(
+    max_entries=settings.TEMPLATE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TEMPLATE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,278 @@
+import difflib
+import hashlib
+import json
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models.prompt import PromptVersion
+from app.models.template import TemplateBlob
+
+
+def template_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _lines(text: str) -> List[str]:
+    return text.splitlines(keepends=True)
+
+
+def make_delta(base: str, text: str) -> bytes:
+    """
+    Line-level edit script turning `base` into `text`: [start, end] copies base
+    lines, a string inserts new text. Stored zlib-compressed.
+    """
+    base_lines, lines = _lines(base), _lines(text)
+    script: list = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            script.append([i1, i2])
+        elif tag in ("replace", "insert"):
+            script.append("".join(lines[j1:j2]))
+    return zlib.compress(json.dumps(script, separators=(",", ":")).encode("utf-8"))
+
+
+def apply_delta(base: str, delta: bytes) -> str:
+    base_lines = _lines(base)
+    parts = []
+    for step in json.loads(zlib.decompress(delta)):
+        parts.append("".join(base_lines[step[0]:step[1]]) if isinstance(step, list) else step)
+    return "".join(parts)
+
+
+def unified_diff(old: str, new: str, old_label: str, new_label: str, context: int = 3) -> Tuple[str, int, int]:
+    """
+    Returns (unified diff, lines added, lines removed).
+    """
+    diff = list(difflib.unified_diff(_lines(old), _lines(new), old_label, new_label, n=context))
+    added = sum(1 for line in diff if line.startswith("+") and not line.startswith("+++"))
+    removed = sum(1 for line in diff if line.startswith("-") and not line.startswith("---"))
+    # Keep the output a valid patch when a side doesn't end with a newline.
+    text = "".join(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n" for line in diff)
+    return text, added, removed
+
+
+def _existing(digests: Iterable[str]):
+    # FOR KEY SHARE (Postgres; a no-op elsewhere) holds an existing blob until
+    # the version about to reference it commits, so a concurrent `release`
+    # can't delete it in between. A blob deleted meanwhile is not returned,
+    # and the caller writes it again.
+    return (
+        select(TemplateBlob.hash, TemplateBlob.depth)
+        .where(TemplateBlob.hash.in_(digests))
+        .with_for_update(read=True, key_share=True)
+    )
+
+
+def _decode(encoding: str, data: bytes, base: Optional[str]) -> str:
+    if encoding == "delta":
+        return apply_delta(base, data)
+    if encoding == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    return bytes(data).decode("utf-8")
+
+
+class TemplateStore:
+    """
+    Prompt version templates as content-addressed TemplateBlob rows. Templates
+    under `compress_min_bytes` are stored as plain utf-8; larger ones are
+    zlib-compressed, or stored as a delta against the previous version's blob
+    when that is smaller, with chains capped at `delta_max_chain`.
+
+    Blobs never change, so decoded text is cached by hash without invalidation.
+    """
+
+    def __init__(self, compress_min_bytes: int, delta_enabled: bool, delta_max_chain: int, max_cached: int = 256):
+        self.compress_min_bytes = compress_min_bytes
+        self.delta_enabled = delta_enabled
+        self.delta_max_chain = delta_max_chain
+        self.max_cached = max_cached
+        self._decoded: "OrderedDict[str, str]" = OrderedDict()
+
+    @classmethod
+    def from_settings(cls) -> "TemplateStore":
+        return cls(
+            compress_min_bytes=settings.TEMPLATE_COMPRESS_MIN_BYTES,
+            delta_enabled=settings.TEMPLATE_DELTA_ENABLED,
+            delta_max_chain=settings.TEMPLATE_DELTA_MAX_CHAIN,
+        )
+
+    async def store(self, session: AsyncSession, text: str, base_hash: Optional[str] = None) -> str:
+        """
+        Writes the blob for `text` unless it already exists and returns its
+        hash. `base_hash` is the blob to try a delta against, normally the
+        prompt's previous version.
+        """
+        digest = template_hash(text)
+        if (await session.exec(_existing([digest]))).first() is not None:
+            return digest
+
+        raw = text.encode("utf-8")
+        blob = TemplateBlob(hash=digest, encoding="raw", size_bytes=len(raw), data=raw)
+        if len(raw) >= self.compress_min_bytes:
+            blob.encoding, blob.data = "zlib", zlib.compress(raw)
+            base = await session.get(TemplateBlob, base_hash) if self.delta_enabled and base_hash else None
+            if base is not None and base.depth < self.delta_max_chain:
+                delta = make_delta(await self.load(session, base.hash), text)
+                if len(delta) < len(blob.data):
+                    blob.encoding, blob.data = "delta", delta
+                    blob.base_hash, blob.depth = base.hash, base.depth + 1
+        await self._insert(session, [blob])
+        self._remember(digest, text)
+        return digest
+
+    async def store_many(self, session: AsyncSession, items: List[Tuple[str, Optional[str]]]) -> List[str]:
+        """
+        Bulk `store`: (text, base_hash) pairs in, hashes out, with one lookup
+        for the blobs that already exist and one multi-row insert for the rest.
+        A base may be an earlier item of the same call.
+        """
+        digests = [template_hash(text) for text, _ in items]
+        wanted = set(digests) | {base for _, base in items if base}
+        known = dict((await session.exec(_existing(wanted))).all()) if wanted else {}
+        # hash -> (blob, text) for blobs written by this call
+        fresh: Dict[str, Tuple[TemplateBlob, str]] = {}
+        for (text, base_hash), digest in zip(items, digests):
+            if digest in known or digest in fresh:
+                continue
+            raw = text.encode("utf-8")
+            blob = TemplateBlob(hash=digest, encoding="raw", size_bytes=len(raw), data=raw)
+            if len(raw) >= self.compress_min_bytes:
+                blob.encoding, blob.data = "zlib", zlib.compress(raw)
+                if self.delta_enabled and base_hash:
+                    if base_hash in fresh:
+                        depth, base_text = fresh[base_hash][0].depth, fresh[base_hash][1]
+                    elif base_hash in known:
+                        depth, base_text = known[base_hash], None
+                    else:
+                        depth = None
+                    if depth is not None and depth < self.delta_max_chain:
+                        delta = make_delta(base_text if base_text is not None else await self.load(session, base_hash), text)
+                        if len(delta) < len(blob.data):
+                            blob.encoding, blob.data = "delta", delta
+                            blob.base_hash, blob.depth = base_hash, depth + 1
+            fresh[digest] = (blob, text)
+        await self._insert(session, [blob for blob, _ in fresh.values()])
+        return digests
+
+    async def load(self, session: AsyncSession, digest: str) -> str:
+        text = self._decoded.get(digest)
+        if text is not None:
+            self._decoded.move_to_end(digest)
+            return text
+        blob = await session.get(TemplateBlob, digest)
+        if blob is None:
+            raise LookupError(f"Template blob {digest} not found")
+        base = await self.load(session, blob.base_hash) if blob.encoding == "delta" else None
+        text = _decode(blob.encoding, blob.data, base)
+        self._remember(digest, text)
+        return text
+
+    async def load_many(self, session: AsyncSession, digests: Iterable[str]) -> Dict[str, str]:
+        """
+        Bulk `load`, one query per level of delta chain. Results are not
+        added to the cache, so a bulk read doesn't evict the hot templates.
+        """
+        digests = set(digests)
+        texts = {digest: self._decoded[digest] for digest in digests if digest in self._decoded}
+        blobs: Dict[str, Tuple[str, bytes, Optional[str]]] = {}
+        missing = digests - texts.keys()
+        while missing:
+            rows = (await session.exec(
+                select(TemplateBlob.hash, TemplateBlob.encoding, TemplateBlob.data, TemplateBlob.base_hash)
+                .where(TemplateBlob.hash.in_(missing))
+            )).all()
+            if len(rows) < len(missing):
+                raise LookupError(f"Template blobs {sorted(missing - {row[0] for row in rows})} not found")
+            for digest, encoding, data, base_hash in rows:
+                blobs[digest] = (encoding, data, base_hash)
+            bases = {base_hash for _, encoding, _, base_hash in rows if encoding == "delta"} - blobs.keys() - texts.keys()
+            texts.update({digest: self._decoded[digest] for digest in bases if digest in self._decoded})
+            missing = bases - texts.keys()
+
+        def resolve(digest: str) -> str:
+            if digest not in texts:
+                encoding, data, base_hash = blobs[digest]
+                texts[digest] = _decode(encoding, data, resolve(base_hash) if encoding == "delta" else None)
+            return texts[digest]
+
+        return {digest: resolve(digest) for digest in digests}
+
+    async def summaries(self, session: AsyncSession, digests: Iterable[str]) -> Dict[str, Tuple[int, Optional[str]]]:
+        """
+        hash -> (size in bytes, text). Text is only read for small (raw) blobs;
+        larger templates are left for the detail view to load.
+        """
+        digests = set(digests)
+        if not digests:
+            return {}
+        rows = (await session.exec(
+            select(
+                TemplateBlob.hash,
+                TemplateBlob.size_bytes,
+                case((TemplateBlob.encoding == "raw", TemplateBlob.data), else_=None),
+            ).where(TemplateBlob.hash.in_(digests))
+        )).all()
+        return {
+            digest: (size, bytes(data).decode("utf-8") if data is not None else None)
+            for digest, size, data in rows
+        }
+
+    async def release(self, session: AsyncSession, digests: Iterable[str]) -> None:
+        """
+        Deletes blobs no version references any more, then any delta bases
+        that frees. Call after the referencing versions were deleted or
+        repointed, before committing.
+
+        The candidates are locked first (FOR UPDATE on Postgres), which waits
+        for writers holding them for a new version (see `_existing`), so the
+        references checked below include those versions once committed.
+        """
+        pending = {digest for digest in digests if digest}
+        await session.flush()
+        while pending:
+            await session.execute(
+                select(TemplateBlob.hash).where(TemplateBlob.hash.in_(pending)).with_for_update()
+            )
+            in_use = select(PromptVersion.template_hash).where(PromptVersion.template_hash.in_(pending))
+            bases = select(TemplateBlob.base_hash).where(TemplateBlob.base_hash.in_(pending))
+            orphans = (await session.exec(
+                select(TemplateBlob.hash, TemplateBlob.base_hash).where(
+                    TemplateBlob.hash.in_(pending),
+                    TemplateBlob.hash.not_in(in_use),
+                    TemplateBlob.hash.not_in(bases),
+                )
+            )).all()
+            if not orphans:
+                return
+            await session.execute(delete(TemplateBlob).where(TemplateBlob.hash.in_([digest for digest, _ in orphans])))
+            pending = {base for _, base in orphans if base}
+
+    async def _insert(self, session: AsyncSession, blobs: List[TemplateBlob]) -> None:
+        # Concurrent writers of the same template race on the primary key;
+        # whichever lands second is a no-op rather than an IntegrityError.
+        if not blobs:
+            return
+        dialect = session.bind.dialect.name
+        if dialect not in ("postgresql", "sqlite"):
+            session.add_all(blobs)
+            return
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = insert(TemplateBlob).on_conflict_do_nothing(index_elements=["hash"])
+        await session.execute(statement, [blob.model_dump() for blob in blobs])
+
+    def _remember(self, digest: str, text: str) -> None:
+        self._decoded[digest] = text
+        self._decoded.move_to_end(digest)
+        while len(self._decoded) > self.max_cached:
+            self._decoded.popitem(last=False)
+
+
+template_store = TemplateStore.from_settings()
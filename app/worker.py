@@ -0,0 +1,61 @@
+"""
+Standalone job worker: claims and runs queued job items until stopped.
+
+    python -m app.worker                     # JOB_WORKER_CONCURRENCY items at a time
+    python -m app.worker --concurrency 32
+
+Workers coordinate only through row leases in the database, so throughput
+scales by running more of them, on any number of machines. When dedicated
+workers are deployed, set JOB_WORKER_IN_PROCESS=false on the API service.
+SIGTERM hands unfinished items back to the queue before exiting.
+"""
+import argparse
+import asyncio
+import signal
+from typing import List, Optional
+
+from app.core.config import settings
+
+
+async def run(concurrency: Optional[int] = None) -> None:
+    from app.services.client_registry import close_client_registry, init_client_registry
+    from app.services.execution_log import execution_writer
+    from app.services.jobs import JobWorker
+    from app.services.provider_catalog import provider_catalog
+
+    init_client_registry()
+    if settings.EXECUTION_LOG_ENABLED:
+        execution_writer.start()
+    provider_catalog.start()
+    worker = JobWorker.from_settings(concurrency)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still raises KeyboardInterrupt
+            pass
+
+    worker.start()
+    print(f"Job worker {worker.owner} running {worker.concurrency} items at a time")
+    try:
+        await stop.wait()
+    finally:
+        print("Job worker stopping...")
+        await worker.stop()
+        await provider_catalog.stop()
+        await execution_writer.stop()
+        await close_client_registry()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=None, help="items run at once (default JOB_WORKER_CONCURRENCY)")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Load test: runs app.main:app in-process (auth stubbed) against the mock LLM
+server and drives the execute, prompt listing and CRUD paths at each
+concurrency level.
+
+    python -m benchmarks.load --concurrency 1,8,32 --requests 300
+    python -m benchmarks.load --scenarios list_prompts,crud --json out.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks import mock_llm
+
+SCENARIOS = ["execute", "execute_stream", "execute_openai", "list_prompts", "search_prompts", "crud"]
+
+
+def prepare_environment(database_url: str) -> None:
+    # Must run before anything imports app.core.config.
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("AUTH_MODE", "local")
+    os.environ.setdefault("METRICS_ENABLED", "true")
+
+
+def start_app(port: int):
+    """
+    Serves app.main:app on its own thread and event loop, so the load
+    generator does not compete with the server for the same loop.
+    """
+    import uvicorn
+    from app.core.auth import get_current_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_user] = lambda: {"uid": "bench-user"}
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def db_query_totals() -> Dict[str, float]:
+    # Read straight from the in-process registry populated by MetricsMiddleware.
+    from prometheus_client import REGISTRY
+
+    totals = {"queries": 0.0, "requests": 0.0}
+    for metric in REGISTRY.collect():
+        if metric.name != "db_queries_per_request":
+            continue
+        for sample in metric.samples:
+            if sample.name.endswith("_sum"):
+                totals["queries"] += sample.value
+            elif sample.name.endswith("_count"):
+                totals["requests"] += sample.value
+    return totals
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
+
+
+class Fixtures:
+    def __init__(self):
+        self.ollama_provider_id: Optional[int] = None
+        self.openai_provider_id: Optional[int] = None
+        self.prompt_ids: List[int] = []
+
+
+async def seed(client: httpx.AsyncClient, mock_url: str, prompts: int) -> Fixtures:
+    fixtures = Fixtures()
+    response = await client.post("/api/v1/providers/", json={"name": "Bench Ollama", "kind": "ollama", "base_url": mock_url})
+    fixtures.ollama_provider_id = response.json()["id"]
+    response = await client.post("/api/v1/providers/", json={
+        "name": "Bench OpenAI", "kind": "openai", "base_url": f"{mock_url}/v1", "api_key": "bench"
+    })
+    fixtures.openai_provider_id = response.json()["id"]
+    for index in range(prompts):
+        response = await client.post("/api/v1/prompts/", json={
+            "name": f"bench prompt {index}",
+            "description": f"benchmark fixture number {index}",
+            "tags": "bench,fixture",
+        })
+        prompt_id = response.json()["id"]
+        await client.post(f"/api/v1/prompts/{prompt_id}/versions", json={
+            "version_number": 1,
+            "template": "Summarize {{ topic }} in {{ words }} words.",
+            "input_variables": '["topic", "words"]',
+        })
+        fixtures.prompt_ids.append(prompt_id)
+    return fixtures
+
+
+def _check(response: httpx.Response) -> None:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code}")
+
+
+def scenario(name: str, fixtures: Fixtures) -> Callable[[httpx.AsyncClient, int], Awaitable[None]]:
+    def prompt_id(i: int) -> int:
+        return fixtures.prompt_ids[i % len(fixtures.prompt_ids)]
+
+    async def execute(client: httpx.AsyncClient, i: int) -> None:
+        _check(await client.post("/api/v1/execute/", json={
+            "provider_id": fixtures.ollama_provider_id, "model_provider": "ollama", "model_name": "bench",
+            "prompt_id": prompt_id(i), "variables": {"topic": f"topic {i}", "words": 10},
+        }))
+
+    async def execute_openai(client: httpx.AsyncClient, i: int) -> None:
+        _check(await client.post("/api/v1/execute/", json={
+            "provider_id": fixtures.openai_provider_id, "model_provider": "openai", "model_name": "bench",
+            "prompt_text": f"Say something about {i}",
+        }))
+
+    async def execute_stream(client: httpx.AsyncClient, i: int) -> None:
+        async with client.stream("POST", "/api/v1/execute/stream", json={
+            "provider_id": fixtures.ollama_provider_id, "model_provider": "ollama", "model_name": "bench",
+            "prompt_id": prompt_id(i), "variables": {"topic": f"topic {i}", "words": 10},
+        }) as response:
+            _check(response)
+            async for line in response.aiter_lines():
+                if line.startswith("event: error"):
+                    raise RuntimeError("stream error event")
+
+    async def list_prompts(client: httpx.AsyncClient, i: int) -> None:
+        _check(await client.get("/api/v1/prompts/", params={"limit": 50, "sort_by": "updated_at"}))
+
+    async def search_prompts(client: httpx.AsyncClient, i: int) -> None:
+        _check(await client.get("/api/v1/prompts/", params={"search": f"fixture {i % 100}", "limit": 20}))
+
+    async def crud(client: httpx.AsyncClient, i: int) -> None:
+        response = await client.post("/api/v1/prompts/", json={"name": f"crud {i}", "tags": "crud"})
+        _check(response)
+        created = response.json()["id"]
+        _check(await client.post(f"/api/v1/prompts/{created}/versions", json={"version_number": 1, "template": "Hi {{ name }}"}))
+        _check(await client.patch(f"/api/v1/prompts/{created}", json={"description": "updated"}))
+        _check(await client.get(f"/api/v1/prompts/{created}"))
+        _check(await client.delete(f"/api/v1/prompts/{created}"))
+
+    return {
+        "execute": execute,
+        "execute_openai": execute_openai,
+        "execute_stream": execute_stream,
+        "list_prompts": list_prompts,
+        "search_prompts": search_prompts,
+        "crud": crud,
+    }[name]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    operation: Callable[[httpx.AsyncClient, int], Awaitable[None]],
+    concurrency: int,
+    requests: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: List[str] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                await operation(client, i)
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    before = db_query_totals()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = db_query_totals()
+
+    latencies.sort()
+    http_requests = after["requests"] - before["requests"]
+    return {
+        "concurrency": concurrency,
+        "operations": requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_ops": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _ms(percentile(latencies, 0.50)),
+        "p95_ms": _ms(percentile(latencies, 0.95)),
+        "p99_ms": _ms(percentile(latencies, 0.99)),
+        "db_queries_per_request": (after["queries"] - before["queries"]) / http_requests if http_requests else None,
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def print_row(name: str, result: Dict[str, Any]) -> None:
+    db = result["db_queries_per_request"]
+    print(
+        f"{name:<16} c={result['concurrency']:<4} ops={result['operations']:<6} err={result['errors']:<4} "
+        f"{result['throughput_ops']:>9.1f} ops/s  p50={result['p50_ms']}ms  p95={result['p95_ms']}ms  "
+        f"p99={result['p99_ms']}ms  db/req={'-' if db is None else f'{db:.2f}'}"
+    )
+    if result["first_error"]:
+        print(f"{'':<16} first error: {result['first_error']}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    mock_llm.configure(args)
+    mock_llm.serve_in_thread(port=args.mock_port)
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    server = start_app(args.port)
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2, max_keepalive_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=120.0) as client:
+        fixtures = await seed(client, mock_url, args.seed_prompts)
+        for name in args.scenarios:
+            operation = scenario(name, fixtures)
+            # Warm pools, caches and lazy imports before measuring.
+            await run_level(client, operation, min(4, max(args.concurrency)), args.warmup)
+            for concurrency in args.concurrency:
+                result = await run_level(client, operation, concurrency, args.requests)
+                results.setdefault(name, []).append(result)
+                print_row(name, result)
+
+    server.should_exit = True
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mock": vars(mock_llm.config), "results": results}, f, indent=2)
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=SCENARIOS)
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="operations per concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed-prompts", type=int, default=200)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--mock-port", type=int, default=18000)
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    parser.add_argument("--json", help="write results to this file")
+    mock_llm.add_arguments(parser)
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{tempfile.mkdtemp(prefix='prompt-bench-')}/bench.db"
+    prepare_environment(args.database_url)
+    sys.exit(asyncio.run(main(args)))
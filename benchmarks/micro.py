@@ -0,0 +1,153 @@
+"""
+Micro-benchmarks for hot in-process paths, compared against stored baselines.
+
+    python -m benchmarks.micro                 # run and compare with baselines.json
+    python -m benchmarks.micro --update        # rewrite baselines.json from this run
+
+Exits non-zero when a benchmark is slower than its baseline by more than
+--tolerance. Baselines are machine-specific: refresh them on the machine
+that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.providers import CompletionResult, ProviderAdapter, register_adapter
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+TEMPLATE = (
+    "You are a {{ role }}. Summarize the following {{ kind }} for a {{ audience }} "
+    "in at most {{ words }} words, keeping the tone {{ tone }}.\n\n{{ body }}"
+)
+VARIABLES = {
+    "role": "careful editor",
+    "kind": "release notes",
+    "audience": "busy engineer",
+    "words": 50,
+    "tone": "neutral",
+    "body": "lorem ipsum " * 200,
+}
+
+
+class NoopAdapter(ProviderAdapter):
+    """
+    Returns immediately, so LLMService benchmarks measure only dispatch overhead.
+    """
+
+    kind = "bench_noop"
+
+    async def complete(self, model, prompt, config, provider_config) -> CompletionResult:
+        return CompletionResult(text="ok", usage={"input_tokens": 1, "output_tokens": 1, "total_tokens": 2})
+
+
+def bench_sync(fn: Callable[[], Any], number: int, repeat: int) -> float:
+    # Best of `repeat` runs, in microseconds per call (timeit's convention).
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    return best / number * 1e6
+
+
+def bench_async(fn: Callable[[], Any], number: int, repeat: int) -> float:
+    async def run() -> float:
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                await fn()
+            best = min(best, time.perf_counter() - started)
+        return best / number * 1e6
+
+    return asyncio.run(run())
+
+
+def benchmarks(number: int, repeat: int) -> Dict[str, float]:
+    from app.services.execution_policy import Candidate
+    from app.services.llm_service import LLMService
+    from app.services.response_cache import cache_key
+    from app.services.template_service import PreparedVersion, compile_template
+
+    register_adapter("bench_noop", "benchmarks.micro:NoopAdapter")
+    prepared = PreparedVersion(1, 1, TEMPLATE, json.dumps(list(VARIABLES)), '{"temperature": 0}')
+    candidates = [Candidate("bench_noop", "bench", {"temperature": 0})]
+
+    results = {
+        "template.compile_and_render": bench_sync(lambda: compile_template(TEMPLATE).render(VARIABLES), number, repeat),
+        "template.prepared_render": bench_sync(lambda: prepared.render(VARIABLES), number, repeat),
+        "response_cache.key": bench_sync(
+            lambda: cache_key("openai", "gpt-4o", TEMPLATE, {"temperature": 0, "max_tokens": 256}, provider_id=1),
+            number, repeat,
+        ),
+        "llm_service.complete_dispatch": bench_async(
+            lambda: LLMService.complete("bench_noop", "bench", "hello", {"temperature": 0}, {}), number, repeat
+        ),
+        "llm_service.policy_dispatch": bench_async(
+            lambda: LLMService.complete_with_policy(candidates, "hello"), number, repeat
+        ),
+    }
+    return results
+
+
+def compare(results: Dict[str, float], baselines: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for name, value in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            status = "new"
+        else:
+            change = (value - baseline) / baseline
+            status = f"{change:+.1%}"
+            if change > tolerance:
+                status += "  REGRESSION"
+                regressions.append(name)
+        baseline_text = f"{baseline:.2f}" if baseline is not None else "-"
+        print(f"{name:<34} {value:>10.2f} us   baseline {baseline_text:>10} us   {status}")
+    return regressions
+
+
+def load_baselines() -> Dict[str, Any]:
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH) as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs; the fastest is kept")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing, e.g. 0.25 = 25%%")
+    parser.add_argument("--update", action="store_true", help="store this run as the new baselines")
+    args = parser.parse_args(argv)
+
+    results = benchmarks(args.number, args.repeat)
+    stored = load_baselines()
+    regressions = compare(results, stored.get("benchmarks", {}), args.tolerance)
+
+    if args.update:
+        with open(BASELINES_PATH, "w") as f:
+            json.dump({
+                "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+                "unit": "microseconds per call",
+                "benchmarks": {name: round(value, 3) for name, value in results.items()},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Baselines written to {BASELINES_PATH}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
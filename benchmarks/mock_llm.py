@@ -0,0 +1,184 @@
+"""
+Mock LLM server speaking the OpenAI chat-completions and Ollama generate APIs.
+
+    python -m benchmarks.mock_llm --port 18000 --ttft-ms 150 --tokens-per-second 80
+
+Point an "openai" provider's base_url at http://127.0.0.1:18000/v1 and an
+"ollama" provider's at http://127.0.0.1:18000.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+@dataclass
+class MockConfig:
+    # Latency before the first token, with +/- jitter applied uniformly
+    ttft_ms: float = 100.0
+    jitter_ms: float = 20.0
+    tokens_per_second: float = 100.0
+    output_tokens: int = 32
+    # Fraction of requests answered with a 503
+    error_rate: float = 0.0
+
+
+config = MockConfig()
+stats = {"requests": 0, "errors": 0}
+
+
+def _prompt_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+async def _first_token_delay() -> None:
+    delay = max(0.0, config.ttft_ms + random.uniform(-config.jitter_ms, config.jitter_ms)) / 1000
+    await asyncio.sleep(delay)
+
+
+def _token_interval() -> float:
+    return 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+
+
+def _should_fail() -> bool:
+    stats["requests"] += 1
+    if config.error_rate and random.random() < config.error_rate:
+        stats["errors"] += 1
+        return True
+    return False
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    if _should_fail():
+        return JSONResponse({"error": {"message": "mock overloaded"}}, status_code=503)
+    prompt = " ".join(str(message.get("content", "")) for message in body.get("messages", []))
+    usage = {
+        "prompt_tokens": _prompt_tokens(prompt),
+        "completion_tokens": config.output_tokens,
+        "total_tokens": _prompt_tokens(prompt) + config.output_tokens,
+    }
+    created = int(time.time())
+    base = {"id": "chatcmpl-mock", "created": created, "model": body.get("model", "mock")}
+
+    if body.get("stream"):
+        async def events():
+            await _first_token_delay()
+            for index in range(config.output_tokens):
+                if index:
+                    await asyncio.sleep(_token_interval())
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [
+                    {"index": 0, "delta": {"content": "tok "}, "finish_reason": None}
+                ]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {**base, "object": "chat.completion.chunk", "choices": [
+                {"index": 0, "delta": {}, "finish_reason": "stop"}
+            ]}
+            yield f"data: {json.dumps(final)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await _first_token_delay()
+    await asyncio.sleep(_token_interval() * max(0, config.output_tokens - 1))
+    return JSONResponse({
+        **base,
+        "object": "chat.completion",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "tok " * config.output_tokens},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    })
+
+
+async def generate(request: Request):
+    body = await request.json()
+    if _should_fail():
+        return JSONResponse({"error": "mock overloaded"}, status_code=503)
+    prompt_tokens = _prompt_tokens(body.get("prompt", ""))
+    started = time.perf_counter()
+
+    def final(response: str = "") -> dict:
+        total_ns = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": body.get("model", "mock"),
+            "response": response,
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": config.output_tokens,
+            "total_duration": total_ns,
+            "load_duration": 0,
+            "prompt_eval_duration": int(config.ttft_ms * 1e6),
+            "eval_duration": max(0, total_ns - int(config.ttft_ms * 1e6)),
+        }
+
+    if body.get("stream", True):
+        async def lines():
+            await _first_token_delay()
+            for index in range(config.output_tokens):
+                if index:
+                    await asyncio.sleep(_token_interval())
+                yield json.dumps({"model": body.get("model", "mock"), "response": "tok ", "done": False}) + "\n"
+            yield json.dumps(final()) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    await _first_token_delay()
+    await asyncio.sleep(_token_interval() * max(0, config.output_tokens - 1))
+    return JSONResponse(final("tok " * config.output_tokens))
+
+
+app = Starlette(routes=[
+    Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    Route("/api/generate", generate, methods=["POST"]),
+])
+
+
+def serve_in_thread(host: str = "127.0.0.1", port: int = 18000) -> uvicorn.Server:
+    """
+    Starts the mock server on a daemon thread and waits until it accepts requests.
+    """
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft-ms", type=float, default=config.ttft_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=config.tokens_per_second)
+    parser.add_argument("--output-tokens", type=int, default=config.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+
+
+def configure(args: argparse.Namespace) -> None:
+    config.ttft_ms = args.ttft_ms
+    config.jitter_ms = args.jitter_ms
+    config.tokens_per_second = args.tokens_per_second
+    config.output_tokens = args.output_tokens
+    config.error_rate = args.error_rate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18000)
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure(args)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,144 @@
+"""
+Cold-start measurements for app.main.
+
+    python -m benchmarks.startup imports --top 25   # where import time goes, by package
+    python -m benchmarks.startup coldstart --runs 5 # process spawn -> first 200 from /health
+
+Both spawn fresh interpreters, so nothing is cached in-process between runs
+(the OS page cache still is; the first run is usually the slowest).
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def _environment(database_url: Optional[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("AUTH_MODE", "local")
+    if database_url:
+        env["DATABASE_URL"] = database_url
+    return env
+
+
+def import_times(module: str, env: Dict[str, str]) -> List[Tuple[str, int, int, int]]:
+    """
+    Runs `python -X importtime -c "import <module>"` and returns
+    (module, self_us, cumulative_us, depth) for every import it reports.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def report_imports(args: argparse.Namespace) -> int:
+    rows = import_times(args.module, _environment(args.database_url))
+    total_us = sum(self_us for _, self_us, _, _ in rows)
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total_us / 1000:.1f} ms over {len(rows)} modules\n")
+    print("By top-level package (self time):")
+    for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {package:<32} {us / 1000:>8.1f} ms  {us / total_us:>6.1%}")
+    print("\nSlowest modules (cumulative, including what they import):")
+    for name, _, cumulative_us, depth in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"  {name:<48} {cumulative_us / 1000:>8.1f} ms  depth {depth}")
+    return 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def cold_start(env: Dict[str, str], timeout: float) -> float:
+    """
+    Seconds from spawning uvicorn to the first successful GET /health.
+    """
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited with status {process.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise RuntimeError(f"no response from /health within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def report_cold_start(args: argparse.Namespace) -> int:
+    database_url = args.database_url or f"sqlite:///{tempfile.mkdtemp(prefix='prompt-startup-')}/startup.db"
+    env = _environment(database_url)
+    if args.migrate:
+        subprocess.run([sys.executable, "-m", "app.migrate"], env=env, check=True, stdout=subprocess.DEVNULL)
+        # Measure boot alone, as in production where migrations are a separate step.
+        env["DB_MIGRATE_ON_STARTUP"] = "false"
+
+    timings = []
+    for run in range(args.runs):
+        seconds = cold_start(env, args.timeout)
+        timings.append(seconds)
+        print(f"run {run + 1}: {seconds * 1000:.0f} ms")
+    print(f"\nmin {min(timings) * 1000:.0f} ms   median {statistics.median(timings) * 1000:.0f} ms   max {max(timings) * 1000:.0f} ms")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh SQLite file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    imports = commands.add_parser("imports", help="import-time report")
+    imports.add_argument("--module", default="app.main")
+    imports.add_argument("--top", type=int, default=20)
+    imports.set_defaults(handler=report_imports)
+
+    coldstart = commands.add_parser("coldstart", help="time to first response")
+    coldstart.add_argument("--runs", type=int, default=5)
+    coldstart.add_argument("--timeout", type=float, default=30.0)
+    coldstart.add_argument("--no-migrate", dest="migrate", action="store_false",
+                           help="let the app create the schema during startup instead")
+    coldstart.set_defaults(handler=report_cold_start)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import pool
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from app import models  # noqa: F401  (registers every table on SQLModel.metadata)
+from app.core.config import settings
+from app.core.database import async_database_url
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logging", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = SQLModel.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Full-text search objects are raw DDL (see migration 0001), not models.
+    if type_ == "table" and name.startswith("prompt_fts"):
+        return False
+    if type_ == "index" and name == "ix_prompt_search":
+        return False
+    return True
+
+
+def _configure(**kwargs) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite can't ALTER most things in place; batch mode rebuilds the table instead.
+        render_as_batch=settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite"),
+        # Each revision commits on its own, so a failure late in a chain keeps earlier work.
+        transaction_per_migration=True,
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    """
+    Emits the SQL to stdout (alembic upgrade head --sql) instead of running it.
+    """
+    _configure(url=settings.SQLALCHEMY_DATABASE_URI, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    _configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    engine = create_async_engine(async_database_url(settings.SQLALCHEMY_DATABASE_URI), poolclass=pool.NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_async_migrations())
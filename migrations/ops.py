@@ -0,0 +1,48 @@
+"""
+Helpers for migrations that must run against a live, large database.
+"""
+from typing import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+
+def _drop_invalid_postgres_index(name: str) -> None:
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    # IF NOT EXISTS would then happily skip. Drop it so the build is retried.
+    invalid = op.get_bind().execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).first()
+    if invalid:
+        op.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+
+def create_index_online(name: str, table: str, columns: Sequence[str], unique: bool = False) -> None:
+    """
+    Creates an index without blocking writes where the database supports it.
+
+    Postgres builds it with CREATE INDEX CONCURRENTLY, which can't run inside a
+    transaction, so the build happens in an autocommit block. Elsewhere it is a
+    plain CREATE INDEX. Either way it is a no-op when the index already exists.
+    """
+    context = op.get_context()
+    if context.dialect.name == "postgresql":
+        with context.autocommit_block():
+            if not context.as_sql:
+                _drop_invalid_postgres_index(name)
+            op.create_index(name, table, list(columns), unique=unique, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index(name, table, list(columns), unique=unique, if_not_exists=True)
+
+
+def drop_index_online(name: str, table: str) -> None:
+    context = op.get_context()
+    if context.dialect.name == "postgresql":
+        with context.autocommit_block():
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        op.drop_index(name, table_name=table, if_exists=True)
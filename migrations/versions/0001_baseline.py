@@ -0,0 +1,190 @@
+"""baseline: the schema create_all and fix_db.py used to maintain
+
+Databases created before migrations existed are adopted in place: tables
+that already exist are kept, columns that fix_db.py used to add are added
+when missing, and missing indexes are created.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _ensure_table(inspector, name: str, *elements) -> None:
+    if not inspector.has_table(name):
+        op.create_table(name, *elements)
+        return
+    present = {column["name"] for column in inspector.get_columns(name)}
+    for element in elements:
+        if isinstance(element, sa.Column) and element.name not in present and element.nullable:
+            op.add_column(name, element)
+
+
+def _ensure_indexes(table: str, *indexes) -> None:
+    for name, columns in indexes:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS prompt_fts USING fts5("
+    "name, description, tags, content='prompt', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS prompt_fts_ai AFTER INSERT ON prompt BEGIN "
+    "INSERT INTO prompt_fts(rowid, name, description, tags) VALUES (new.id, new.name, new.description, new.tags); END",
+    "CREATE TRIGGER IF NOT EXISTS prompt_fts_ad AFTER DELETE ON prompt BEGIN "
+    "INSERT INTO prompt_fts(prompt_fts, rowid, name, description, tags) VALUES ('delete', old.id, old.name, old.description, old.tags); END",
+    "CREATE TRIGGER IF NOT EXISTS prompt_fts_au AFTER UPDATE OF name, description, tags ON prompt BEGIN "
+    "INSERT INTO prompt_fts(prompt_fts, rowid, name, description, tags) VALUES ('delete', old.id, old.name, old.description, old.tags); "
+    "INSERT INTO prompt_fts(rowid, name, description, tags) VALUES (new.id, new.name, new.description, new.tags); END",
+]
+
+POSTGRES_SEARCH_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_prompt_search ON prompt USING GIN ("
+    "to_tsvector('simple', coalesce(prompt.name, '') || ' ' || "
+    "coalesce(prompt.description, '') || ' ' || coalesce(prompt.tags, '')))",
+]
+
+
+def _ensure_search_index() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        exists = bind.execute(
+            sa.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'prompt_fts'")
+        ).first()
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        if not exists:
+            # Index rows written before the FTS table existed.
+            op.execute("INSERT INTO prompt_fts(prompt_fts) VALUES ('rebuild')")
+    elif bind.dialect.name == 'postgresql':
+        for statement in POSTGRES_SEARCH_DDL:
+            op.execute(statement)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+
+    _ensure_table(inspector, 'cachedresponse',
+        sa.Column('key', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+        sa.Column('response', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    _ensure_indexes('cachedresponse', ('ix_cachedresponse_expires_at', ['expires_at']))
+
+    _ensure_table(inspector, 'llmprovider',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('kind', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('api_key', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('base_url', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('requests_per_minute', sa.Integer(), nullable=True),
+        sa.Column('tokens_per_minute', sa.Integer(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _ensure_indexes('llmprovider', ('ix_llmprovider_name', ['name']))
+
+    _ensure_table(inspector, 'prompt',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('description', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('tags', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('execution_policy_json', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('active_version_id', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _ensure_indexes('prompt',
+        ('ix_prompt_name', ['name']),
+        ('ix_prompt_created_at_id', ['created_at', 'id']),
+        ('ix_prompt_updated_at_id', ['updated_at', 'id']),
+        ('ix_prompt_name_id', ['name', 'id']),
+    )
+
+    _ensure_table(inspector, 'llmmodel',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('capabilities', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('provider_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['provider_id'], ['llmprovider.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _ensure_indexes('llmmodel', ('ix_llmmodel_name', ['name']))
+
+    _ensure_table(inspector, 'promptversion',
+        sa.Column('version_number', sa.Integer(), nullable=False),
+        sa.Column('template', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('input_variables', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('model_config_json', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('prompt_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('commit_message', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.ForeignKeyConstraint(['prompt_id'], ['prompt.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+    _ensure_table(inspector, 'execution',
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('prompt_id', sa.Integer(), nullable=True),
+        sa.Column('prompt_version_id', sa.Integer(), nullable=True),
+        sa.Column('provider_id', sa.Integer(), nullable=True),
+        sa.Column('model_provider', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('model_name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('streamed', sa.Boolean(), nullable=False),
+        sa.Column('input_tokens', sa.Integer(), nullable=True),
+        sa.Column('output_tokens', sa.Integer(), nullable=True),
+        sa.Column('time_to_first_token_ms', sa.Float(), nullable=True),
+        sa.Column('latency_ms', sa.Float(), nullable=False),
+        sa.Column('cost_usd', sa.Float(), nullable=True),
+        sa.Column('metadata_json', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['prompt_id'], ['prompt.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['prompt_version_id'], ['promptversion.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['provider_id'], ['llmprovider.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    _ensure_indexes('execution',
+        ('ix_execution_created_at', ['created_at']),
+        ('ix_execution_model_created_at', ['model_name', 'created_at']),
+        ('ix_execution_user_id', ['user_id']),
+        ('ix_execution_version_created_at', ['prompt_version_id', 'created_at']),
+    )
+
+    # Full-text search: FTS5 table and triggers on SQLite, GIN index on Postgres
+    _ensure_search_index()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for trigger in ('prompt_fts_ai', 'prompt_fts_ad', 'prompt_fts_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS prompt_fts')
+    op.drop_table('execution')
+    op.drop_table('promptversion')
+    op.drop_table('llmmodel')
+    op.drop_table('prompt')
+    op.drop_table('llmprovider')
+    op.drop_table('cachedresponse')
@@ -0,0 +1,49 @@
+"""index promptversion by (prompt_id, version_number), unique
+
+Version lookups (history pages, delete cascades, the template cache) filter on
+prompt_id and order by version_number; Postgres does not index foreign keys on
+its own, so these were sequential scans. The unique index serves prompt_id-only
+lookups as well, so there is no separate single-column index. Likewise
+prompt.updated_at is already covered by ix_prompt_updated_at_id (updated_at, id).
+
+Built with CREATE INDEX CONCURRENTLY on Postgres, so it runs against a live
+database without blocking writes.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.ops import create_index_online, drop_index_online
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    duplicates = [] if op.get_context().as_sql else op.get_bind().execute(sa.text(
+        "SELECT prompt_id, version_number, count(*) FROM promptversion "
+        "GROUP BY prompt_id, version_number HAVING count(*) > 1"
+    )).all()
+    if duplicates:
+        listed = ", ".join(f"prompt {prompt_id} v{number} (x{count})" for prompt_id, number, count in duplicates[:10])
+        raise RuntimeError(
+            f"{len(duplicates)} duplicate prompt versions must be renumbered or removed "
+            f"before the unique index can be built: {listed}"
+        )
+    create_index_online('ix_promptversion_prompt_id_version_number', 'promptversion', ['prompt_id', 'version_number'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_index_online('ix_promptversion_prompt_id_version_number', 'promptversion')
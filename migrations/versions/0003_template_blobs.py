@@ -0,0 +1,159 @@
+"""move prompt version templates into content-addressed templateblob rows
+
+Existing templates are copied in batches: deduplicated by sha256 and
+zlib-compressed from 1 KiB up. Delta encoding only applies to versions
+written after this migration.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:00:00
+
+"""
+import hashlib
+import json
+import zlib
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+COMPRESS_MIN_BYTES = 1024
+
+promptversion = sa.table(
+    'promptversion',
+    sa.column('id', sa.Integer),
+    sa.column('template', sa.String),
+    sa.column('template_hash', sa.String),
+)
+templateblob = sa.table(
+    'templateblob',
+    sa.column('hash', sa.String),
+    sa.column('encoding', sa.String),
+    sa.column('base_hash', sa.String),
+    sa.column('depth', sa.Integer),
+    sa.column('size_bytes', sa.Integer),
+    sa.column('data', sa.LargeBinary),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _apply_delta(base: str, delta: bytes) -> str:
+    # The template store's delta format as of this revision, frozen here:
+    # a zlib-compressed JSON edit script where [start, end] copies base lines
+    # and a string inserts new text.
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for step in json.loads(zlib.decompress(delta)):
+        parts.append(''.join(base_lines[step[0]:step[1]]) if isinstance(step, list) else step)
+    return ''.join(parts)
+
+
+def _backfill() -> None:
+    bind = op.get_bind()
+    stored = set(bind.execute(sa.select(templateblob.c.hash)).scalars())
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(promptversion.c.id, promptversion.c.template)
+            .where(promptversion.c.id > last_id, promptversion.c.template_hash.is_(None))
+            .order_by(promptversion.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        blobs, updates = [], []
+        for version_id, template in rows:
+            raw = template.encode('utf-8')
+            digest = hashlib.sha256(raw).hexdigest()
+            if digest not in stored:
+                compressed = len(raw) >= COMPRESS_MIN_BYTES
+                blobs.append({
+                    'hash': digest,
+                    'encoding': 'zlib' if compressed else 'raw',
+                    'base_hash': None,
+                    'depth': 0,
+                    'size_bytes': len(raw),
+                    'data': zlib.compress(raw) if compressed else raw,
+                    'created_at': datetime.utcnow(),
+                })
+                stored.add(digest)
+            updates.append({'version_id': version_id, 'digest': digest})
+        if blobs:
+            bind.execute(templateblob.insert(), blobs)
+        bind.execute(
+            promptversion.update()
+            .where(promptversion.c.id == sa.bindparam('version_id'))
+            .values(template_hash=sa.bindparam('digest')),
+            updates,
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('templateblob',
+        sa.Column('hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+        sa.Column('encoding', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('base_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['base_hash'], ['templateblob.hash'], ),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+    op.create_index('ix_templateblob_base_hash', 'templateblob', ['base_hash'], unique=False)
+
+    with op.batch_alter_table('promptversion', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('template_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+
+    _backfill()
+
+    with op.batch_alter_table('promptversion', schema=None) as batch_op:
+        batch_op.alter_column('template_hash', existing_type=sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False)
+        batch_op.create_index('ix_promptversion_template_hash', ['template_hash'], unique=False)
+        batch_op.create_foreign_key('fk_promptversion_template_hash', 'templateblob', ['template_hash'], ['hash'])
+        batch_op.drop_column('template')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('promptversion', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('template', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+    bind = op.get_bind()
+    blobs = {row.hash: row for row in bind.execute(sa.select(templateblob)).all()}
+    decoded = {}
+
+    def decode(digest: str) -> str:
+        if digest not in decoded:
+            blob = blobs[digest]
+            if blob.encoding == 'delta':
+                decoded[digest] = _apply_delta(decode(blob.base_hash), blob.data)
+            elif blob.encoding == 'zlib':
+                decoded[digest] = zlib.decompress(blob.data).decode('utf-8')
+            else:
+                decoded[digest] = bytes(blob.data).decode('utf-8')
+        return decoded[digest]
+
+    for version_id, digest in bind.execute(sa.select(promptversion.c.id, promptversion.c.template_hash)).all():
+        bind.execute(promptversion.update().where(promptversion.c.id == version_id).values(template=decode(digest)))
+
+    with op.batch_alter_table('promptversion', schema=None) as batch_op:
+        batch_op.alter_column('template', existing_type=sqlmodel.sql.sqltypes.AutoString(), nullable=False)
+        batch_op.drop_constraint('fk_promptversion_template_hash', type_='foreignkey')
+        batch_op.drop_index('ix_promptversion_template_hash')
+        batch_op.drop_column('template_hash')
+
+    op.drop_index('ix_templateblob_base_hash', table_name='templateblob')
+    op.drop_table('templateblob')
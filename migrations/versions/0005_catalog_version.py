@@ -0,0 +1,37 @@
+"""catalogversion stamp for the in-memory provider catalog
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    catalogversion = op.create_table(
+        'catalogversion',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name'),
+    )
+    op.bulk_insert(catalogversion, [{'name': 'providers', 'version': 0, 'updated_at': datetime.utcnow()}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('catalogversion')
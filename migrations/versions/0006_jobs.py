@@ -0,0 +1,64 @@
+"""job and jobitem tables for the background job queue
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # New, empty tables: plain CREATE INDEX is fine here.
+    op.create_table('job',
+        sa.Column('kind', sqlmodel.sql.sqltypes.AutoString(length=32), nullable=False),
+        sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('total_items', sa.Integer(), nullable=False),
+        sa.Column('succeeded_items', sa.Integer(), nullable=False),
+        sa.Column('failed_items', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_job_user_id', 'job', ['user_id'], unique=False)
+    op.create_table('jobitem',
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('payload_json', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('result_json', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('lease_owner', sqlmodel.sql.sqltypes.AutoString(length=128), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['job_id'], ['job.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_jobitem_job_id_position', 'jobitem', ['job_id', 'position'], unique=True)
+    op.create_index('ix_jobitem_status_lease_expires_at', 'jobitem', ['status', 'lease_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobitem_status_lease_expires_at', table_name='jobitem')
+    op.drop_index('ix_jobitem_job_id_position', table_name='jobitem')
+    op.drop_table('jobitem')
+    op.drop_index('ix_job_user_id', table_name='job')
+    op.drop_table('job')
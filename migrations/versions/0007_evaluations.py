@@ -0,0 +1,48 @@
+"""evaluation table for A/B prompt evaluations
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # New, empty table: plain CREATE INDEX is fine here.
+    op.create_table('evaluation',
+        sa.Column('name', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('user_id', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('job_id', sa.Integer(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('baseline', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('variants_json', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('metrics_json', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('expected_json', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('report_json', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.ForeignKeyConstraint(['job_id'], ['job.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_evaluation_job_id', 'evaluation', ['job_id'], unique=False)
+    op.create_index('ix_evaluation_user_id', 'evaluation', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_evaluation_user_id', table_name='evaluation')
+    op.drop_index('ix_evaluation_job_id', table_name='evaluation')
+    op.drop_table('evaluation')
@@ -0,0 +1,61 @@
+"""backfill llmprovider.kind for providers created before it existed
+
+Requests are dispatched on the stored kind, so legacy rows with a NULL kind
+get the one inferred from their name, as creating them today would.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 16:00:00
+
+"""
+import re
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+llmprovider = sa.table('llmprovider', sa.column('id', sa.Integer), sa.column('name', sa.String), sa.column('kind', sa.String))
+catalogversion = sa.table('catalogversion', sa.column('name', sa.String), sa.column('version', sa.Integer))
+
+# The built-in kinds and aliases as of this revision, in the order the
+# registry matched them; frozen so later registry changes don't alter it.
+KINDS = ('openai', 'gemini', 'ollama', 'openai_compatible', 'vllm', 'lmstudio', 'lm_studio', 'google')
+
+
+def _infer_kind(name: str) -> Optional[str]:
+    normalized = re.sub(r'[\s\-]+', '_', name.strip().lower())
+    if normalized in KINDS:
+        return normalized
+    return next((kind for kind in KINDS if kind in normalized), None)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(llmprovider.c.id, llmprovider.c.name).where(llmprovider.c.kind.is_(None))).all()
+    changed = False
+    for provider_id, name in rows:
+        kind = _infer_kind(name or '')
+        if kind is not None:
+            bind.execute(llmprovider.update().where(llmprovider.c.id == provider_id).values(kind=kind))
+            changed = True
+    if changed:
+        # Running instances reload their provider catalog on the next version check.
+        bind.execute(
+            catalogversion.update()
+            .where(catalogversion.c.name == 'providers')
+            .values(version=catalogversion.c.version + 1)
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Data-only: the inferred kinds are valid values, so they are kept.
+    pass
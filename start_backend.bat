@@ -1,5 +1,6 @@
 @echo off
 echo Starting Backend...
 call venv\Scripts\activate || echo Venv not found, running globally
+python -m app.migrate
 uvicorn app.main:app --reload
 pause
@@ -3,4 +3,5 @@ echo "Starting Backend..."
 if [ -d "venv" ]; then
     source venv/bin/activate
 fi
+python -m app.migrate
 uvicorn app.main:app --reload
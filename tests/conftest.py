@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+import app.models  # noqa: F401  registers every table on SQLModel.metadata
+from app.core import database as database_module
+from app.core.auth import get_current_user
+from app.core.etags import version_index
+from app.services.template_service import prompt_template_cache
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    A SQLite file with every table, installed as app.core.database's engine
+    and session maker. NullPool keeps connections from outliving the
+    asyncio.run() loop of the test that opened them.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create_all():
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+
+    asyncio.run(create_all())
+    # Process-wide caches keyed by row id would otherwise leak between tests.
+    prompt_template_cache.clear()
+    version_index.clear()
+    monkeypatch.setattr(database_module, "engine", engine)
+    monkeypatch.setattr(database_module, "async_session_maker", session_maker)
+    yield SimpleNamespace(engine=engine, session_maker=session_maker)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def api(database):
+    """
+    Sends one request through the full app (middleware included, lifespan
+    not run) as an authenticated user; returns the httpx response.
+    """
+    from app.main import app
+
+    app.dependency_overrides[get_current_user] = lambda: {"uid": "user-1"}
+
+    def request(method: str, url: str, **kwargs) -> httpx.Response:
+        async def send():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, url, **kwargs)
+
+        return asyncio.run(send())
+
+    yield request
+    app.dependency_overrides.clear()
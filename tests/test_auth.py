@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.core import auth
+from app.core.config import settings
+
+
+def test_project_id_is_discovered_once_at_startup_not_per_request(monkeypatch):
+    calls = []
+
+    def firebase_app():
+        calls.append(1)
+        return SimpleNamespace(project_id="discovered-project")
+
+    monkeypatch.setattr(settings, "AUTH_MODE", "firebase")
+    monkeypatch.setattr(settings, "FIREBASE_PROJECT_ID", None)
+    monkeypatch.setattr(auth, "_firebase_app", firebase_app)
+    monkeypatch.setattr(auth.key_store, "start", lambda: None)
+    monkeypatch.setattr(auth, "_discovered_project_id", None)
+
+    async def scenario():
+        before = auth._firebase_project_id()
+        await auth.start_auth()
+        await auth._project_id_task
+        after = [auth._firebase_project_id() for _ in range(3)]
+        await auth.stop_auth()
+        return before, after
+
+    before, after = asyncio.run(scenario())
+    assert before is None
+    assert after == ["discovered-project"] * 3
+    assert len(calls) == 1
+
+
+def test_configured_project_id_skips_discovery(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_MODE", "firebase")
+    monkeypatch.setattr(settings, "FIREBASE_PROJECT_ID", "configured-project")
+    monkeypatch.setattr(auth.key_store, "start", lambda: None)
+
+    async def scenario():
+        await auth.start_auth()
+        task = auth._project_id_task
+        await auth.stop_auth()
+        return task
+
+    assert asyncio.run(scenario()) is None
+    assert auth._firebase_project_id() == "configured-project"
+
+
+def test_local_tokens_are_verified_and_cached(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_MODE", "local")
+    monkeypatch.setattr(settings, "AUTH_LOCAL_SECRET", "secret")
+    token = auth.create_local_token("user-1")
+    claims = asyncio.run(auth.verify_token(token))
+    assert claims["uid"] == "user-1"
+    assert auth.token_cache.get(token) == claims
@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+import json
+
+import pytest
+
+from app.api.v1.endpoints import execute
+from app.api.v1.endpoints.execute import ExecuteResponse, execute_batch
+from app.core.config import settings
+from app.services.batch import BatchExecuteRequest, ExecuteRequest
+
+USER = {"uid": "user-1"}
+
+
+@pytest.fixture
+def executed(monkeypatch):
+    """
+    Replaces the upstream call with one that echoes the prompt after a delay
+    taken from the model name, and records the peak concurrency per provider.
+    """
+    running, peak, prompts = {}, {}, []
+
+    async def execute_one(request, session, provider_config=None, user_id=None):
+        provider = request.model_provider
+        running[provider] = running.get(provider, 0) + 1
+        peak[provider] = max(peak.get(provider, 0), running[provider])
+        prompts.append(request.prompt_text)
+        try:
+            await asyncio.sleep(float(request.model_name.rsplit("-", 1)[-1]))
+            if request.prompt_text == "fail":
+                raise RuntimeError("upstream down")
+            return ExecuteResponse(response=f"{request.model_name}: {request.prompt_text}")
+        finally:
+            running[provider] -= 1
+
+    monkeypatch.setattr(execute, "_execute_one", execute_one)
+    monkeypatch.setattr(execute, "async_session_maker", contextlib.nullcontext)
+    return {"peak": peak, "prompts": prompts}
+
+
+def _template_batch(**fields) -> BatchExecuteRequest:
+    return BatchExecuteRequest(
+        template="Hello {{name}}",
+        variable_sets=[{"name": "Ada"}, {}, {"name": "Bob"}],
+        targets=[
+            {"model_provider": "openai", "model_name": "slow-0.02"},
+            {"model_provider": "ollama", "model_name": "fast-0"},
+        ],
+        **fields,
+    )
+
+
+def test_results_come_back_in_order_with_per_item_errors(executed):
+    batch = BatchExecuteRequest(items=[
+        ExecuteRequest(model_provider="openai", model_name="m-0.02", prompt_text="first"),
+        ExecuteRequest(model_provider="openai", model_name="m-0", prompt_text="fail"),
+        ExecuteRequest(model_provider="gemini", model_name="m-0", prompt_text="third"),
+    ])
+    response = asyncio.run(execute_batch(batch, session=None, current_user=USER))
+    assert [result.index for result in response.results] == [0, 1, 2]
+    assert [result.response for result in response.results] == ["m-0.02: first", None, "m-0: third"]
+    assert response.results[1].error == "upstream down"
+    assert (response.succeeded, response.failed) == (2, 1)
+
+
+def test_concurrency_is_bounded_per_provider(executed, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_PROVIDER_CONCURRENCY", {"openai": 2})
+    monkeypatch.setattr(settings, "BATCH_DEFAULT_CONCURRENCY", 1)
+    batch = BatchExecuteRequest(items=[
+        ExecuteRequest(model_provider=provider, model_name="m-0.01", prompt_text=str(n))
+        for n in range(6) for provider in ("openai", "ollama")
+    ])
+    response = asyncio.run(execute_batch(batch, session=None, current_user=USER))
+    assert response.succeeded == 12
+    assert executed["peak"] == {"openai": 2, "ollama": 1}
+
+
+def test_a_variable_set_that_fails_to_render_only_fails_its_own_items(executed):
+    response = asyncio.run(execute_batch(_template_batch(), session=None, current_user=USER))
+    assert [(result.index, result.variables_index, result.model_provider) for result in response.results] == [
+        (0, 0, "openai"), (1, 0, "ollama"), (2, 1, "openai"), (3, 1, "ollama"), (4, 2, "openai"), (5, 2, "ollama"),
+    ]
+    assert [result.response for result in response.results] == [
+        "slow-0.02: Hello Ada", "fast-0: Hello Ada", None, None, "slow-0.02: Hello Bob", "fast-0: Hello Bob",
+    ]
+    assert response.results[2].error == response.results[3].error == "Missing template variables: name"
+    assert (response.succeeded, response.failed) == (4, 2)
+    # The bad row never reaches a provider.
+    assert sorted(executed["prompts"]) == ["Hello Ada", "Hello Ada", "Hello Bob", "Hello Bob"]
+
+
+def test_streamed_results_arrive_in_completion_order_with_their_index(executed):
+    async def scenario():
+        response = await execute_batch(_template_batch(), stream=True, session=None, current_user=USER)
+        return response, [json.loads(line) async for line in response.body_iterator]
+
+    response, lines = asyncio.run(scenario())
+    assert response.media_type == "application/x-ndjson"
+    assert sorted(line["index"] for line in lines) == list(range(6))
+    # Render errors are ready at once and the slow target finishes last.
+    assert {line["index"] for line in lines[:2]} == {2, 3}
+    assert all(line["error"] for line in lines[:2])
+    assert {line["index"] for line in lines[-2:]} == {0, 4}
+
+
+def test_a_batch_without_a_template_or_targets_is_rejected(executed):
+    from fastapi import HTTPException
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(execute_batch(BatchExecuteRequest(template="x"), session=None, current_user=USER))
+    assert raised.value.status_code == 422
+
+
+def test_an_unknown_prompt_is_a_lookup_error_and_a_404(database, executed):
+    from fastapi import HTTPException
+
+    from app.services.batch import expand_batch
+
+    batch = BatchExecuteRequest(prompt_id=404, targets=[{"model_provider": "openai", "model_name": "m-0"}])
+
+    async def scenario():
+        async with database.session_maker() as session:
+            with pytest.raises(LookupError):
+                await expand_batch(batch, session)
+            await execute_batch(batch, session=session, current_user=USER)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 404
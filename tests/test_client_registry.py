@@ -0,0 +1,93 @@
+import asyncio
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+
+import pytest
+
+from app.services.client_registry import ClientRegistry
+from app.services.providers.gemini import GeminiAdapter
+
+
+class FakeTransport:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def created(monkeypatch):
+    created = []
+
+    class FakeServiceClient:
+        def __init__(self, client_options):
+            self.api_key = client_options["api_key"]
+            self.transport = FakeTransport()
+            created.append(self)
+
+    def configure(**kwargs):
+        raise AssertionError("genai.configure() changes the key for every provider")
+
+    monkeypatch.setattr(glm, "GenerativeServiceAsyncClient", FakeServiceClient)
+    monkeypatch.setattr(genai, "configure", configure)
+    return created
+
+
+def test_gemini_models_get_a_client_per_api_key(created):
+
+    async def scenario():
+        registry = ClientRegistry()
+        return (
+            await registry.gemini_model("key-a", "gemini-1.5-flash"),
+            await registry.gemini_model("key-b", "gemini-1.5-flash"),
+            await registry.gemini_model("key-a", "gemini-1.5-pro"),
+            await registry.gemini_model("key-a", "gemini-1.5-flash"),
+        )
+
+    flash_a, flash_b, pro_a, flash_a_again = asyncio.run(scenario())
+    assert flash_a is flash_a_again
+    assert flash_a._async_client.api_key == "key-a"
+    assert flash_b._async_client.api_key == "key-b"
+    assert pro_a._async_client is flash_a._async_client
+    assert len(created) == 2
+
+
+def test_evicting_a_gemini_key_drops_its_models_and_closes_its_service(created):
+    async def scenario():
+        registry = ClientRegistry(close_grace_seconds=0)
+        flash = await registry.gemini_model("key-a", "gemini-1.5-flash")
+        await registry.gemini_model("key-a", "gemini-1.5-pro")
+        other = await registry.gemini_model("key-b", "gemini-1.5-flash")
+        key = GeminiAdapter().client_key({"api_key": "key-a"})
+        evicted = await registry.evict(key)
+        await asyncio.sleep(0.01)
+        fresh = await registry.gemini_model("key-a", "gemini-1.5-flash")
+        kept = await registry.gemini_model("key-b", "gemini-1.5-flash")
+        return key, evicted, flash, fresh, other, kept
+
+    key, evicted, flash, fresh, other, kept = asyncio.run(scenario())
+    assert key == ("gemini", "key-a", None) and evicted
+    assert created[0].transport.closed and not created[1].transport.closed
+    assert fresh is not flash and fresh._async_client is created[2]
+    assert kept is other
+
+
+def test_aclose_closes_gemini_service_transports(created):
+    async def scenario():
+        registry = ClientRegistry(close_grace_seconds=60)
+        await registry.gemini_model("key-a", "gemini-1.5-flash")
+        await registry.gemini_model("key-b", "gemini-1.5-flash")
+        # One still in its grace period, one live.
+        await registry.evict(("gemini", "key-a", None))
+        await registry.aclose()
+
+    asyncio.run(scenario())
+    assert [service.transport.closed for service in created] == [True, True]
+
+
+def test_the_sdk_still_has_the_private_client_attribute():
+    # gemini_model sets GenerativeModel._async_client; an SDK upgrade that
+    # renames it would silently fall back to the process-wide default client.
+    assert genai.GenerativeModel("gemini-1.5-flash")._async_client is None
@@ -0,0 +1,194 @@
+import asyncio
+
+import pytest
+
+from app.services import coalescing
+from app.services.coalescing import SingleFlight, flight_key
+from app.services.execution_policy import Candidate, PolicyStream
+from app.services.providers import StreamChunk
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """
+    Captures the coalescing metrics instead of sending them to Prometheus.
+    """
+    calls = {"requests": [], "flights": []}
+    monkeypatch.setattr(coalescing, "record_coalesced_request", lambda mode, joined: calls["requests"].append((mode, joined)))
+    monkeypatch.setattr(coalescing, "record_coalesced_flight", lambda mode, callers: calls["flights"].append((mode, callers)))
+    return calls
+
+
+def _policy_stream(texts, release: asyncio.Event, closed: list):
+    def stream(candidate: Candidate):
+        async def chunks():
+            try:
+                for n, text in enumerate(texts):
+                    if n == 1:
+                        # Hold the rest back until the test lets it through.
+                        await release.wait()
+                    yield StreamChunk(text=text)
+            finally:
+                closed.append(candidate.model_name)
+        return chunks()
+
+    return PolicyStream(stream, [Candidate("openai", "a", {})])
+
+
+def test_flight_key_separates_modes_prompts_and_configs():
+    candidates = [Candidate("openai", "gpt-4o", {"temperature": 0})]
+    key = flight_key("complete", candidates, "hi")
+    assert key == flight_key("complete", [Candidate("openai", " gpt-4o ", {"temperature": 0})], "hi")
+    assert key != flight_key("stream", candidates, "hi")
+    assert key != flight_key("complete", candidates, "hello")
+    assert key != flight_key("complete", [Candidate("openai", "gpt-4o", {"temperature": 1})], "hi")
+    assert key != flight_key("complete", candidates, "hi", hedge_delay_ms=100)
+
+
+def test_concurrent_callers_share_one_call(recorded):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("k", call) for _ in range(3)))
+        return results, flights.snapshot()
+
+    results, snapshot = asyncio.run(scenario())
+    assert calls == [1]
+    assert results == [("answer", False), ("answer", True), ("answer", True)]
+    assert snapshot["calls"] == 1 and snapshot["joined"] == 2
+    assert snapshot["in_flight"] == 0 and snapshot["waiters"] == 0
+    assert snapshot["coalescing_ratio"] == pytest.approx(2 / 3)
+    assert recorded["requests"] == [("complete", False), ("complete", True), ("complete", True)]
+    assert recorded["flights"] == [("complete", 3)]
+
+
+def test_errors_are_shared_and_nothing_is_kept_afterwards(recorded):
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(flights.do("k", call), flights.do("k", call), return_exceptions=True)
+        # The flight is gone once it settles, so the next caller starts afresh.
+        again = await asyncio.gather(flights.do("k", call), return_exceptions=True)
+        return results + again
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(attempts) == 2
+
+
+def test_a_cancelled_caller_does_not_cancel_the_others(recorded):
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "answer"
+
+        leaving = asyncio.create_task(flights.do("k", call))
+        staying = asyncio.create_task(flights.do("k", call))
+        await asyncio.sleep(0)
+        assert flights.snapshot()["waiters"] == 2
+        leaving.cancel()
+        await asyncio.gather(leaving, return_exceptions=True)
+        assert flights.snapshot()["waiters"] == 1
+        release.set()
+        return leaving, await staying
+
+    leaving, result = asyncio.run(scenario())
+    assert leaving.cancelled()
+    assert result == ("answer", True)
+
+
+def test_the_call_is_cancelled_once_every_caller_has_gone(recorded):
+    async def scenario():
+        flights = SingleFlight()
+        cancelled = []
+
+        async def call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        callers = [asyncio.create_task(flights.do("k", call)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return cancelled, flights.snapshot()
+
+    cancelled, snapshot = asyncio.run(scenario())
+    assert cancelled == [1]
+    assert snapshot["in_flight"] == 0
+
+
+def test_a_late_stream_joiner_replays_every_chunk(recorded):
+    async def scenario():
+        flights = SingleFlight()
+        release, closed = asyncio.Event(), []
+        opened = []
+
+        def open_stream():
+            opened.append(1)
+            return _policy_stream(["a", "b", "c"], release, closed)
+
+        first = flights.stream("k", open_stream)
+        first_iter = first.__aiter__()
+        first_chunks = [(await first_iter.__anext__()).text]
+        # Joins after the first chunk has already gone out.
+        late = flights.stream("k", open_stream)
+        assert flights.snapshot()["waiters"] == 2
+        release.set()
+        first_chunks += [chunk.text async for chunk in first_iter]
+        late_chunks = [chunk.text async for chunk in late]
+        await first.aclose()
+        await late.aclose()
+        return first, late, first_chunks, late_chunks, opened, closed, flights.snapshot()
+
+    first, late, first_chunks, late_chunks, opened, closed, snapshot = asyncio.run(scenario())
+    assert first_chunks == late_chunks == ["a", "b", "c"]
+    assert opened == [1] and closed == ["a"]
+    assert (first.coalesced, late.coalesced) == (False, True)
+    assert late.served_by.model_name == "a"
+    assert snapshot["streams"] == 1 and snapshot["stream_joined"] == 1
+    assert snapshot["streams_in_flight"] == 0 and snapshot["waiters"] == 0
+    assert snapshot["coalescing_ratio"] == pytest.approx(0.5)
+    assert recorded["requests"] == [("stream", False), ("stream", True)]
+    assert recorded["flights"] == [("stream", 2)]
+
+
+def test_a_stream_is_closed_upstream_once_every_subscriber_leaves(recorded):
+    async def scenario():
+        flights = SingleFlight()
+        release, closed = asyncio.Event(), []
+
+        def open_stream():
+            return _policy_stream(["a", "b"], release, closed)
+
+        first, second = flights.stream("k", open_stream), flights.stream("k", open_stream)
+        first_iter = first.__aiter__()
+        await first_iter.__anext__()
+        await second.aclose()
+        assert closed == []
+        await first.aclose()
+        await asyncio.sleep(0)
+        return closed, flights.snapshot()
+
+    closed, snapshot = asyncio.run(scenario())
+    assert closed == ["a"]
+    assert snapshot["streams_in_flight"] == 0
@@ -0,0 +1,101 @@
+import asyncio
+import gzip
+import zlib
+
+import brotli
+import pytest
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+
+BIG = b'{"text": "' + b"x" * 4000 + b'"}'
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("identity", None),
+    ("gzip;q=abc", None),
+])
+def test_encoding_negotiation_honours_q_values(accept, expected):
+    assert choose_encoding(accept) == expected
+
+
+def _app(chunks, headers=(), status=200, content_type=b"application/json"):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", content_type), *headers,
+        ]})
+        for n, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": n < len(chunks) - 1})
+
+    return app
+
+
+def _call(app, accept=None, **options):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    headers = [(b"accept-encoding", accept.encode())] if accept else []
+    middleware = CompressionMiddleware(app, minimum_size=1024, **options)
+    asyncio.run(middleware({"type": "http", "headers": headers}, receive, send))
+    start, *bodies = messages
+    return dict(start["headers"]), b"".join(message.get("body", b"") for message in bodies)
+
+
+def test_bodies_from_the_threshold_up_are_compressed():
+    headers, body = _call(_app([BIG]), accept="gzip")
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(body)
+    assert gzip.decompress(body) == BIG
+
+
+def test_brotli_when_preferred():
+    headers, body = _call(_app([BIG]), accept="br")
+    assert headers[b"content-encoding"] == b"br"
+    assert brotli.decompress(body) == BIG
+
+
+def test_small_bodies_are_sent_as_is_but_still_vary():
+    headers, body = _call(_app([b'{"ok": true}']), accept="gzip")
+    assert b"content-encoding" not in headers
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert body == b'{"ok": true}'
+
+
+def test_without_accept_encoding_nothing_changes():
+    headers, body = _call(_app([BIG], headers=[(b"etag", b'"1"')]))
+    assert b"content-encoding" not in headers and headers[b"etag"] == b'"1"'
+    assert body == BIG
+
+
+def test_streams_are_compressed_chunk_by_chunk():
+    lines = [b'{"index": %d}\n' % n for n in range(3)]
+    headers, body = _call(_app(lines), accept="gzip")
+    assert headers[b"content-encoding"] == b"gzip" and b"content-length" not in headers
+    assert zlib.decompress(body, 16 + zlib.MAX_WBITS) == b"".join(lines)
+
+
+def test_event_streams_and_encoded_bodies_pass_through():
+    events = b"event: token\ndata: {}\n\n" * 100
+    headers, body = _call(_app([events], content_type=b"text/event-stream"), accept="gzip")
+    assert b"content-encoding" not in headers and body == events
+    headers, body = _call(_app([BIG], headers=[(b"content-encoding", b"identity")]), accept="gzip")
+    assert headers[b"content-encoding"] == b"identity" and body == BIG
+
+
+def test_etags_are_weakened_for_clients_that_accept_compression():
+    compressed, _ = _call(_app([BIG], headers=[(b"etag", b'"1"')]), accept="gzip")
+    small, _ = _call(_app([b"{}"], headers=[(b"etag", b'"1"')]), accept="gzip")
+    not_modified, _ = _call(_app([b""], headers=[(b"etag", b'"1"')], status=304), accept="gzip")
+    already_weak, _ = _call(_app([BIG], headers=[(b"etag", b'W/"1"')]), accept="gzip")
+    assert compressed[b"etag"] == small[b"etag"] == not_modified[b"etag"] == already_weak[b"etag"] == b'W/"1"'
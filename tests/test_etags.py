@@ -0,0 +1,82 @@
+import time
+from datetime import datetime
+
+from app.api.v1.endpoints import providers
+from app.core.etags import VersionIndex, etag_matches, make_etag
+from app.services.provider_catalog import ProviderCatalog
+
+
+def test_make_etag_is_stable_and_version_specific():
+    updated = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    assert make_etag(42, updated) == make_etag(42, updated)
+    assert make_etag(42, updated) != make_etag(42, updated.replace(microsecond=123457))
+    assert make_etag("providers", 7) == '"providers-7"'
+
+
+def test_if_none_match_uses_weak_comparison():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+
+
+def test_version_index_entries_expire():
+    index = VersionIndex(ttl_seconds=0.05, max_entries=2)
+    index.set("prompt:1", '"1"')
+    assert index.get("prompt:1") == '"1"'
+    time.sleep(0.06)
+    assert index.get("prompt:1") is None
+    for n in range(3):
+        index.set(f"prompt:{n}", f'"{n}"')
+    assert index.get("prompt:0") is None and index.get("prompt:2") == '"2"'
+
+
+def _create_prompt(api) -> int:
+    return api("POST", "/api/v1/prompts/", json={"name": "greet"}).json()["id"]
+
+
+def test_prompt_detail_answers_304_until_it_changes(api):
+    prompt_id = _create_prompt(api)
+    first = api("GET", f"/api/v1/prompts/{prompt_id}")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+
+    unchanged = api("GET", f"/api/v1/prompts/{prompt_id}", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304 and unchanged.headers["etag"] == etag and unchanged.content == b""
+
+    api("PATCH", f"/api/v1/prompts/{prompt_id}", json={"description": "changed"})
+    changed = api("GET", f"/api/v1/prompts/{prompt_id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert changed.json()["description"] == "changed"
+
+
+def test_a_new_version_changes_the_prompt_etag(api):
+    prompt_id = _create_prompt(api)
+    etag = api("GET", f"/api/v1/prompts/{prompt_id}").headers["etag"]
+    api("POST", f"/api/v1/prompts/{prompt_id}/versions", json={"version_number": 1, "template": "Hi"})
+    assert api("GET", f"/api/v1/prompts/{prompt_id}", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_the_weak_etag_of_a_compressed_response_still_validates(api):
+    prompt_id = _create_prompt(api)
+    api("POST", f"/api/v1/prompts/{prompt_id}/versions", json={"version_number": 1, "template": "x" * 4000})
+    first = api("GET", f"/api/v1/prompts/{prompt_id}", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["etag"].startswith('W/"')
+    revalidated = api("GET", f"/api/v1/prompts/{prompt_id}", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"],
+    })
+    assert revalidated.status_code == 304 and revalidated.headers["etag"] == first.headers["etag"]
+
+
+def test_the_provider_list_answers_304_until_the_catalog_changes(api, monkeypatch):
+    monkeypatch.setattr(providers, "provider_catalog", ProviderCatalog())
+    first = api("GET", "/api/v1/providers/")
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    assert api("GET", "/api/v1/providers/", headers={"If-None-Match": etag}).status_code == 304
+
+    api("POST", "/api/v1/providers/", json={"name": "OpenAI", "api_key": "sk-test"})
+    changed = api("GET", "/api/v1/providers/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and [provider["name"] for provider in changed.json()] == ["OpenAI"]
@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.models.evaluation import EvaluationCreate
+from app.services.evaluation_scoring import METRICS, build_input, check_params, paired_test, score, t_test_p_value
+
+
+def _result(response, latency_ms=100.0, input_tokens=10, output_tokens=5, cost_usd=0.001, cached=False):
+    return {
+        "response": response,
+        "cached": cached,
+        "latency_ms": latency_ms,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cost_usd": cost_usd,
+    }
+
+
+def _scores(metric_type, inputs, params=None):
+    return METRICS[metric_type].fn(inputs, params or {})
+
+
+def test_exact_match_ignores_case_and_whitespace_by_default():
+    inputs = build_input(3, 1, ["Paris", "Rome", None], {0: _result(" paris\n"), 1: _result("Roma"), 2: _result("x")})
+    assert _scores("exact_match", inputs).tolist()[:2] == [1.0, 0.0]
+    assert math.isnan(_scores("exact_match", inputs)[2])
+    assert _scores("exact_match", inputs, {"case_sensitive": True})[0] == 0.0
+
+
+def test_failed_items_score_zero_on_binary_metrics_and_nan_otherwise():
+    inputs = build_input(2, 1, [None, None], {0: _result("yes")})
+    assert _scores("regex", inputs, {"pattern": "yes"}).tolist() == [1.0, 0.0]
+    assert math.isnan(_scores("latency", inputs)[1])
+
+
+def test_json_schema_accepts_fenced_json_and_validates_it():
+    schema = {"type": "object", "required": ["answer"]}
+    inputs = build_input(3, 1, [None] * 3, {
+        0: _result('```json\n{"answer": 1}\n```'),
+        1: _result('{"other": 1}'),
+        2: _result("not json"),
+    })
+    assert _scores("json_schema", inputs).tolist() == [1.0, 1.0, 0.0]
+    assert _scores("json_schema", inputs, {"schema": schema}).tolist() == [1.0, 0.0, 0.0]
+
+
+def test_unusable_params_are_rejected_up_front():
+    with pytest.raises(ValueError):
+        check_params("regex", {})
+    with pytest.raises(ValueError):
+        check_params("regex", {"pattern": "("})
+    with pytest.raises(ValueError):
+        check_params("json_schema", {"schema": {"type": 5}})
+    check_params("latency", {})
+
+
+def test_cached_results_are_left_out_of_latency_tokens_and_cost():
+    inputs = build_input(2, 1, ["a", "a"], {
+        0: _result("a", latency_ms=250.0),
+        1: _result("a", latency_ms=0.4, input_tokens=None, output_tokens=None, cost_usd=None, cached=True),
+    })
+    assert _scores("exact_match", inputs).tolist() == [1.0, 1.0]
+    for metric_type in ("latency", "tokens", "cost"):
+        scores = _scores(metric_type, inputs)
+        assert not math.isnan(scores[0]) and math.isnan(scores[1])
+
+
+def test_evaluations_bypass_the_response_cache_by_default():
+    evaluation = EvaluationCreate(name="e", dataset=[], variants=[])
+    assert evaluation.cache_mode == "bypass"
+
+
+def test_t_test_p_value_matches_reference_values():
+    # Two-sided Student's t reference values
+    assert t_test_p_value(2.0, 10) == pytest.approx(0.07339, abs=1e-4)
+    assert t_test_p_value(2.228, 10) == pytest.approx(0.05, abs=1e-3)
+    assert t_test_p_value(0.0, 5) == pytest.approx(1.0)
+    assert t_test_p_value(math.inf, 5) == 0.0
+
+
+def test_paired_test_uses_only_rows_both_variants_completed():
+    scores = np.array([2.0, 3.0, 4.0, np.nan, 6.0])
+    baseline = np.array([1.0, 1.0, 1.0, 1.0, np.nan])
+    test = paired_test(scores, baseline)
+    assert test["n"] == 3
+    assert test["diff"] == pytest.approx(2.0)
+    assert test["t"] == pytest.approx(2.0 / (1.0 / math.sqrt(3)))
+
+
+def test_paired_test_with_identical_differences():
+    assert paired_test(np.ones(4), np.ones(4))["p_value"] == 1.0
+    assert paired_test(np.full(4, 2.0), np.ones(4))["p_value"] == 0.0
+    assert paired_test(np.ones(1), np.zeros(1))["t"] is None
+
+
+def test_score_reports_per_variant_stats_against_the_baseline():
+    rows, variants = 20, 2
+    results = {}
+    for row in range(rows):
+        results[row * variants] = _result("a", latency_ms=100.0 + row % 3)
+        results[row * variants + 1] = _result("a", latency_ms=50.0 + row % 5)
+    inputs = build_input(rows, variants, ["a"] * rows, results)
+    report = score(inputs, rows, variants, [{"type": "latency"}, {"type": "exact_match", "name": "match"}])
+
+    baseline, faster = report["latency"]
+    assert "vs_baseline" not in baseline
+    assert faster["n"] == rows and faster["p50"] < baseline["p50"]
+    assert faster["vs_baseline"]["significant"] and faster["vs_baseline"]["better"]
+    assert report["match"][1]["mean"] == 1.0 and "p50" not in report["match"][1]
@@ -0,0 +1,120 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import execute
+from app.api.v1.endpoints.execute import execute_prompt_stream
+from app.core.config import settings
+from app.services.batch import ExecuteRequest
+from app.services.execution_policy import PolicyStream
+from app.services.providers import ProviderRateLimited, StreamChunk
+
+USER = {"uid": "user-1"}
+
+
+class FakeRequest:
+    """
+    The bits of starlette's Request the stream reads: disconnects after
+    `connected_for` is_disconnected() checks.
+    """
+
+    def __init__(self, connected_for: int = 1000):
+        self.connected_for = connected_for
+
+    async def is_disconnected(self) -> bool:
+        self.connected_for -= 1
+        return self.connected_for < 0
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Streams the chunks in `upstream["chunks"]` (an exception is raised in
+    place) and records whether the upstream stream was closed and what the
+    execution log was given.
+    """
+    state = {"chunks": [], "closed": False, "recorded": []}
+
+    def stream_with_policy(candidates, prompt_text, hedge_delay_ms=None):
+        def stream(candidate):
+            async def chunks():
+                try:
+                    for chunk in state["chunks"]:
+                        if isinstance(chunk, Exception):
+                            raise chunk
+                        yield chunk
+                finally:
+                    state["closed"] = True
+            return chunks()
+        return PolicyStream(stream, candidates)
+
+    monkeypatch.setattr(execute.LLMService, "stream_with_policy", stream_with_policy)
+    monkeypatch.setattr(execute.execution_writer, "record", lambda **fields: state["recorded"].append(fields))
+    return state
+
+
+def _events(connected_for: int = 1000):
+    async def scenario():
+        request = ExecuteRequest(model_provider="openai", model_name="gpt-4o", prompt_text="hi")
+        response = await execute_prompt_stream(request, FakeRequest(connected_for), session=None, current_user=USER)
+        return response, "".join([event async for event in response.body_iterator])
+
+    response, body = asyncio.run(scenario())
+    assert body.endswith("\n\n")
+    events = []
+    for frame in body[:-2].split("\n\n"):
+        name, data = frame.split("\n")
+        assert name.startswith("event: ") and data.startswith("data: ")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return response, events
+
+
+def test_tokens_then_done_as_server_sent_events(upstream):
+    upstream["chunks"] = [
+        StreamChunk(text="Hel"),
+        StreamChunk(text=""),
+        StreamChunk(text="lo", usage={"input_tokens": 3, "output_tokens": 2}),
+    ]
+    response, events = _events()
+    assert response.media_type == "text/event-stream"
+    assert response.headers["cache-control"] == "no-cache" and response.headers["x-accel-buffering"] == "no"
+    assert [name for name, _ in events] == ["token", "token", "done"]
+    assert [data["text"] for _, data in events[:2]] == ["Hel", "lo"]
+    done = events[-1][1]
+    assert done["usage"] == {"input_tokens": 3, "output_tokens": 2}
+    assert done["served_by"]["model_name"] == "gpt-4o"
+    assert done["timing"]["time_to_first_token_ms"] is not None
+    assert upstream["closed"]
+    (recorded,) = upstream["recorded"]
+    assert recorded["status"] == "ok" and recorded["streamed"] and recorded["output_tokens"] == 2
+
+
+def test_an_upstream_error_ends_the_stream_with_an_error_event(upstream):
+    upstream["chunks"] = [StreamChunk(text="Hel"), ProviderRateLimited("slow down", retry_after=2.0)]
+    _, events = _events()
+    assert [name for name, _ in events] == ["token", "error"]
+    error = events[-1][1]
+    assert (error["detail"], error["status_code"], error["retry_after"]) == ("slow down", 429, 2.0)
+    assert upstream["recorded"][0]["status"] == "error"
+
+
+def test_a_client_disconnect_stops_reading_and_closes_upstream(upstream):
+    upstream["chunks"] = [StreamChunk(text=str(n)) for n in range(10)]
+    _, events = _events(connected_for=2)
+    assert [data["text"] for _, data in events] == ["0", "1"]
+    assert upstream["closed"]
+    assert upstream["recorded"][0]["status"] == "cancelled"
+
+
+def test_missing_credentials_are_refused_before_the_stream_starts(monkeypatch):
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", None)
+
+    async def scenario():
+        request = ExecuteRequest(model_provider="openai", model_name="gpt-4o", prompt_text="hi")
+        await execute_prompt_stream(request, FakeRequest(), session=None, current_user=USER)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 400
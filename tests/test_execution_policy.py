@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from app.api.v1.endpoints import execute
+from app.api.v1.endpoints.execute import _execute_one
+from app.core.config import settings
+from app.services.batch import ExecuteRequest
+from app.services.execution_policy import Candidate, PolicyStream, complete_with_policy
+from app.services.providers import CompletionResult, StreamChunk
+from app.services.response_cache import ResponseCache
+
+
+def _candidates(*names: str):
+    return [Candidate("openai", name, {}) for name in names]
+
+
+def _completer(delays, failures=(), calls=None, cancelled=None):
+    async def complete(candidate: Candidate) -> CompletionResult:
+        if calls is not None:
+            calls.append(candidate.model_name)
+        try:
+            await asyncio.sleep(delays.get(candidate.model_name, 0))
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(candidate.model_name)
+            raise
+        if candidate.model_name in failures:
+            raise RuntimeError(f"{candidate.model_name} failed")
+        return CompletionResult(text=candidate.model_name)
+
+    return complete
+
+
+def test_fallbacks_are_tried_in_order_after_failures():
+    calls = []
+    result, served_by, attempts = asyncio.run(complete_with_policy(
+        _completer({}, failures={"a", "b"}, calls=calls), _candidates("a", "b", "c")
+    ))
+    assert calls == ["a", "b", "c"]
+    assert result.text == "c" and served_by.model_name == "c"
+    assert [attempt.outcome for attempt in attempts] == ["error", "error", "ok"]
+    assert not any(attempt.hedged for attempt in attempts)
+
+
+def test_all_candidates_failing_raises_the_last_error():
+    with pytest.raises(RuntimeError, match="b failed"):
+        asyncio.run(complete_with_policy(_completer({}, failures={"a", "b"}), _candidates("a", "b")))
+
+
+def test_without_hedge_delay_a_slow_primary_is_not_hedged():
+    calls = []
+    result, _, _ = asyncio.run(complete_with_policy(
+        _completer({"a": 0.05}, calls=calls), _candidates("a", "b")
+    ))
+    assert result.text == "a"
+    assert calls == ["a"]
+
+
+def test_hedge_starts_next_candidate_and_cancels_the_loser():
+    cancelled = []
+    result, served_by, attempts = asyncio.run(complete_with_policy(
+        _completer({"a": 1.0, "b": 0.0}, cancelled=cancelled), _candidates("a", "b"), hedge_delay_ms=10
+    ))
+    assert served_by.model_name == "b"
+    assert [(attempt.candidate.model_name, attempt.hedged, attempt.outcome) for attempt in attempts] == [
+        ("a", False, "cancelled"),
+        ("b", True, "ok"),
+    ]
+    assert cancelled == ["a"]
+
+
+def test_earliest_launched_success_wins_a_tie():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def complete(candidate: Candidate) -> CompletionResult:
+            if candidate.model_name == "b":
+                release.set()
+            await release.wait()
+            return CompletionResult(text=candidate.model_name)
+
+        return await complete_with_policy(complete, _candidates("a", "b"), hedge_delay_ms=0)
+
+    result, served_by, _ = asyncio.run(scenario())
+    assert result.text == "a" and served_by.model_name == "a"
+
+
+def test_stream_falls_back_until_the_first_chunk():
+    def stream(candidate: Candidate):
+        async def chunks():
+            if candidate.model_name == "a":
+                raise RuntimeError("a failed")
+            yield StreamChunk(text="hello ")
+            yield StreamChunk(text="world")
+        return chunks()
+
+    async def scenario():
+        policy_stream = PolicyStream(stream, _candidates("a", "b"))
+        text = "".join([chunk.text async for chunk in policy_stream])
+        await policy_stream.aclose()
+        return text, policy_stream
+
+    text, policy_stream = asyncio.run(scenario())
+    assert text == "hello world"
+    assert policy_stream.served_by.model_name == "b"
+    assert [attempt.outcome for attempt in policy_stream.attempts] == ["error", "ok"]
+
+
+@pytest.mark.parametrize("serving, cached", [("primary", True), ("fallback", False)])
+def test_only_the_primary_candidates_answer_is_cached(monkeypatch, serving, cached):
+    cache = ResponseCache(ttl_seconds=60, max_entries=10, max_bytes=1 << 20, persist=False)
+
+    async def complete_with_policy(candidates, prompt_text, hedge_delay_ms=None):
+        served_by = candidates[0] if serving == "primary" else candidates[1]
+        return CompletionResult(text=served_by.model_name), served_by, []
+
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(execute, "response_cache", cache)
+    monkeypatch.setattr(execute.LLMService, "complete_with_policy", complete_with_policy)
+    request = ExecuteRequest(
+        model_provider="openai",
+        model_name="primary",
+        prompt_text="hi",
+        config={"temperature": 0},
+        execution_policy={"fallbacks": [{"model_provider": "openai", "model_name": "fallback"}]},
+    )
+
+    response = asyncio.run(_execute_one(request, session=None))
+    assert response.response == serving
+    assert (cache.snapshot()["entries"] == 1) is cached
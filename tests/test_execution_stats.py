@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.core.config import settings
+from app.models.execution import Execution
+from app.services.execution_log import ExecutionWriter, estimate_cost, server_time_to_first_token_ms
+from app.services.execution_stats import _nearest_rank, summarize, timeseries
+
+NOW = datetime(2026, 1, 1, 12, 0)
+
+
+def _add(database, *rows):
+    async def scenario():
+        async with database.session_maker() as session:
+            session.add_all(rows)
+            await session.commit()
+
+    asyncio.run(scenario())
+
+
+def _execution(model="gpt-4o", status="ok", latency=100.0, ttft=None, minutes_ago=1, **fields):
+    return Execution(
+        model_provider="openai", model_name=model, status=status, latency_ms=latency,
+        time_to_first_token_ms=ttft, created_at=NOW - timedelta(minutes=minutes_ago), **fields,
+    )
+
+
+def _summary(database, **filters):
+    async def scenario():
+        async with database.session_maker() as session:
+            return await summarize(session, "sqlite", "model", NOW - timedelta(hours=1), NOW, **filters)
+
+    return {group["model"]: group for group in asyncio.run(scenario())}
+
+
+def test_percentiles_are_nearest_rank_like_percentile_disc():
+    assert [_nearest_rank(n, 0.5) for n in (1, 2, 3, 10)] == [1, 1, 2, 5]
+    assert [_nearest_rank(n, 0.99) for n in (1, 10, 100, 101)] == [1, 10, 99, 100]
+
+
+def test_summary_totals_and_percentiles_per_model(database):
+    _add(
+        database,
+        *[_execution(latency=float(n), ttft=float(n) / 10 if n % 2 else None, input_tokens=10, output_tokens=n) for n in range(1, 101)],
+        _execution(status="error", latency=9999.0),
+        _execution(status="cached", latency=0.0),
+        _execution(model="llama3", latency=42.0),
+        _execution(latency=1.0, minutes_ago=120),
+    )
+    groups = _summary(database)
+    gpt = groups["gpt-4o"]
+    assert (gpt["executions"], gpt["errors"], gpt["cached"]) == (102, 1, 1)
+    assert gpt["input_tokens"] == 1000 and gpt["output_tokens"] == sum(range(1, 101))
+    # Errors and cache hits stay out of the percentiles.
+    assert (gpt["latency_p50_ms"], gpt["latency_p95_ms"], gpt["latency_p99_ms"]) == (50.0, 95.0, 99.0)
+    # Only odd runs reported a TTFT: 1, 3, ..., 99 tenths.
+    assert (gpt["ttft_p50_ms"], gpt["ttft_p95_ms"], gpt["ttft_p99_ms"]) == (4.9, 9.5, 9.9)
+    llama = groups["llama3"]
+    assert llama["latency_p50_ms"] == llama["latency_p99_ms"] == 42.0 and llama["ttft_p50_ms"] is None
+    assert list(groups) == ["gpt-4o", "llama3"]
+
+
+def test_a_group_without_successful_calls_has_no_percentiles(database):
+    _add(database, _execution(model="flaky", status="error", latency=5.0))
+    flaky = _summary(database)["flaky"]
+    assert flaky["error_rate"] == 1.0 and "latency_p50_ms" not in flaky
+
+
+def test_filters_and_timeseries_buckets(database):
+    _add(
+        database,
+        _execution(minutes_ago=1, latency=10.0),
+        _execution(minutes_ago=2, latency=30.0),
+        _execution(minutes_ago=61, latency=50.0),
+        _execution(model="llama3", minutes_ago=1),
+    )
+    assert list(_summary(database, model_name="llama3")) == ["llama3"]
+
+    async def scenario():
+        async with database.session_maker() as session:
+            return await timeseries(session, "sqlite", "hour", NOW - timedelta(hours=2), NOW, model_name="gpt-4o")
+
+    points = asyncio.run(scenario())
+    assert [(point["bucket"], point["executions"], point["latency_mean_ms"]) for point in points] == [
+        ("2026-01-01T10:00:00", 1, 50.0), ("2026-01-01T11:00:00", 2, 20.0),
+    ]
+
+
+def test_cost_and_server_side_ttft(monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_PRICING", {"gpt-4o": {"input": 2.5, "output": 10.0}})
+    assert estimate_cost("gpt-4o", 1000, 100) == pytest.approx(0.0035)
+    assert estimate_cost("gpt-4o", None, None) is None and estimate_cost("unknown", 1, 1) is None
+    assert server_time_to_first_token_ms({"load_duration": 2_000_000, "prompt_eval_duration": 3_000_000}) == 5.0
+    assert server_time_to_first_token_ms({"eval_count": 3}) is None
+
+
+def test_the_writer_batches_rows_and_flushes_on_stop(database, monkeypatch):
+    monkeypatch.setattr(settings, "MODEL_PRICING", {"gpt-4o": {"input": 1.0, "output": 1.0}})
+    writer = ExecutionWriter(batch_size=2, flush_seconds=0, max_queue=3)
+
+    async def scenario():
+        writer.record(model_provider="openai", model_name="dropped", status="ok", latency_ms=1.0)
+        writer.start()
+        for n in range(4):
+            writer.record(model_provider="openai", model_name="gpt-4o", status="ok", latency_ms=float(n),
+                          input_tokens=1_000_000, metadata={"n": n})
+        await writer.stop()
+        async with database.session_maker() as session:
+            return (await session.exec(select(Execution).order_by(Execution.id))).all()
+
+    rows = asyncio.run(scenario())
+    # Unstarted, the writer ignores records; once started, a full queue drops them.
+    assert [row.latency_ms for row in rows] == [0.0, 1.0, 2.0]
+    assert rows[0].cost_usd == 1.0 and rows[0].metadata_json == '{"n": 0}'
+    assert writer.snapshot() == {"queued": 0, "written": 3, "dropped": 1}
@@ -0,0 +1,205 @@
+import asyncio
+import json
+
+import pytest
+from sqlmodel import select
+
+from app.models.job import Job, JobItem
+from app.services import jobs
+from app.services.jobs import JobWorker, cancel_job, create_job
+
+
+def _worker(owner: str, lease_seconds: float = 30.0, max_attempts: int = 3) -> JobWorker:
+    return JobWorker(concurrency=4, lease_seconds=lease_seconds, poll_seconds=0.01, max_attempts=max_attempts, owner=owner)
+
+
+async def _create(database, count: int) -> int:
+    async with database.session_maker() as session:
+        job = await create_job(session, "echo", [{"value": n} for n in range(count)], "user-1")
+        return job.id
+
+
+async def _job_and_items(database, job_id: int):
+    async with database.session_maker() as session:
+        job = await session.get(Job, job_id)
+        items = (await session.exec(select(JobItem).where(JobItem.job_id == job_id).order_by(JobItem.position))).all()
+        return job, items
+
+
+@pytest.fixture
+def echo_handler(monkeypatch):
+    async def echo(payload, user_id):
+        if payload["value"] < 0:
+            raise RuntimeError("negative")
+        return {"value": payload["value"], "user_id": user_id}
+
+    monkeypatch.setitem(jobs._handlers, "echo", echo)
+
+
+def test_empty_job_is_rejected(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            await create_job(session, "echo", [], "user-1")
+
+    with pytest.raises(ValueError, match="at least one item"):
+        asyncio.run(scenario())
+
+
+def test_items_run_to_completion(database, echo_handler):
+    async def scenario():
+        job_id = await _create(database, 3)
+        worker = _worker("a")
+        for item, kind, user_id in await worker._claim(10):
+            await worker._run_item(item, kind, user_id)
+        return await _job_and_items(database, job_id), worker
+
+    (job, items), worker = asyncio.run(scenario())
+    assert job.status == "completed" and job.succeeded_items == 3
+    assert [json.loads(item.result_json)["value"] for item in items] == [0, 1, 2]
+    assert all(item.lease_owner is None for item in items)
+    assert worker.stats["succeeded"] == 3
+
+
+def test_failed_item_is_recorded_and_counted(database, monkeypatch):
+    async def boom(payload, user_id):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setitem(jobs._handlers, "echo", boom)
+
+    async def scenario():
+        job_id = await _create(database, 1)
+        worker = _worker("a")
+        for claimed in await worker._claim(10):
+            await worker._run_item(*claimed)
+        return await _job_and_items(database, job_id)
+
+    job, items = asyncio.run(scenario())
+    assert job.status == "completed" and job.failed_items == 1
+    assert items[0].status == "failed" and items[0].error == "upstream down"
+
+
+def test_live_lease_is_not_claimed_twice(database, echo_handler):
+    async def scenario():
+        await _create(database, 2)
+        first = await _worker("a")._claim(10)
+        second = await _worker("b")._claim(10)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(first) == 2
+    assert second == []
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_loses_it(database, echo_handler):
+    async def scenario():
+        job_id = await _create(database, 1)
+        slow, fast = _worker("a", lease_seconds=0.05), _worker("b")
+        (stale, kind, user_id), = await slow._claim(10)
+        await asyncio.sleep(0.1)
+        (item, _, _), = await fast._claim(10)
+        await fast._run_item(item, kind, user_id)
+        # The first worker finishing late must not overwrite the reclaimed result.
+        await slow._finish(stale, json.dumps({"value": "stale"}), None)
+        return item, slow, await _job_and_items(database, job_id)
+
+    item, slow, (job, items) = asyncio.run(scenario())
+    assert item.attempts == 2
+    assert slow.stats["lost"] == 1
+    assert job.status == "completed" and job.succeeded_items == 1
+    assert json.loads(items[0].result_json)["value"] == 0
+
+
+def test_item_whose_worker_keeps_dying_is_abandoned(database, echo_handler):
+    async def scenario():
+        job_id = await _create(database, 1)
+        claimed = None
+        for owner in ("a", "b", "c"):
+            worker = _worker(owner, lease_seconds=0.01, max_attempts=2)
+            claimed = await worker._claim(10)
+            await asyncio.sleep(0.03)
+        await worker._run_item(*claimed[0])
+        return await _job_and_items(database, job_id)
+
+    job, items = asyncio.run(scenario())
+    assert items[0].status == "failed" and items[0].attempts == 3
+    assert items[0].error.startswith("Abandoned after 2 attempts")
+
+
+def test_cancel_stops_pending_items_and_keeps_finished_ones(database, echo_handler):
+    async def scenario():
+        job_id = await _create(database, 3)
+        worker = _worker("a")
+        (first, kind, user_id), *_ = await worker._claim(1)
+        await worker._run_item(first, kind, user_id)
+        async with database.session_maker() as session:
+            await cancel_job(session, await session.get(Job, job_id))
+        claimed_after = await worker._claim(10)
+        return claimed_after, await _job_and_items(database, job_id)
+
+    claimed_after, (job, items) = asyncio.run(scenario())
+    assert claimed_after == []
+    assert job.status == "cancelled"
+    assert [item.status for item in items] == ["succeeded", "cancelled", "cancelled"]
+
+
+def test_lease_renewal_cancels_items_this_worker_no_longer_holds(database, echo_handler):
+    async def scenario():
+        job_id = await _create(database, 1)
+        worker = _worker("a")
+        (item, _, _), = await worker._claim(10)
+        task = asyncio.create_task(asyncio.sleep(10))
+        worker._running[item.id] = task
+        async with database.session_maker() as session:
+            await cancel_job(session, await session.get(Job, job_id))
+        await worker._renew_leases()
+        await asyncio.gather(task, return_exceptions=True)
+        return task, worker
+
+    task, worker = asyncio.run(scenario())
+    assert task.cancelled()
+    assert worker.stats["lost"] == 1
+
+
+def test_endpoint_rejects_an_empty_batch(database):
+    from fastapi import HTTPException
+
+    from app.api.v1.endpoints.jobs import create_execute_job
+    from app.services.batch import BatchExecuteRequest
+
+    async def scenario():
+        async with database.session_maker() as session:
+            await create_execute_job(BatchExecuteRequest(items=[]), session, {"uid": "user-1"})
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 422
+
+
+def test_a_variable_set_that_fails_to_render_fails_only_its_items(database, monkeypatch):
+    from app.api.v1.endpoints import execute
+    from app.api.v1.endpoints.execute import ExecuteResponse
+    from app.api.v1.endpoints.jobs import create_execute_job
+    from app.services.batch import BatchExecuteRequest
+
+    async def execute_one(request, session, provider_config=None, user_id=None):
+        return ExecuteResponse(response=request.prompt_text)
+
+    monkeypatch.setattr(execute, "_execute_one", execute_one)
+    batch = BatchExecuteRequest(
+        template="Hi {{name}}",
+        variable_sets=[{"name": "Ada"}, {}],
+        targets=[{"model_provider": "openai", "model_name": "gpt-4o"}],
+    )
+
+    async def scenario():
+        async with database.session_maker() as session:
+            job = await create_execute_job(batch, session, {"uid": "user-1"})
+        worker = _worker("a")
+        for claimed in await worker._claim(10):
+            await worker._run_item(*claimed)
+        return await _job_and_items(database, job.id)
+
+    job, items = asyncio.run(scenario())
+    assert job.status == "completed" and (job.succeeded_items, job.failed_items) == (1, 1)
+    assert json.loads(items[0].result_json)["response"] == "Hi Ada"
+    assert items[1].status == "failed" and items[1].error == "Missing template variables: name"
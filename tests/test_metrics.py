@@ -0,0 +1,110 @@
+import asyncio
+import re
+
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, RequestTimings, instrument_engine, record_stage, stage
+
+
+def _sample(name, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _timing(header: str) -> dict:
+    return {name: float(duration) for name, duration in re.findall(r"(\w+);dur=([\d.]+)", header)}
+
+
+def test_stages_accumulate_into_a_server_timing_header():
+    timings = RequestTimings()
+    timings.add("db", 0.002)
+    timings.add("db", 0.003)
+    timings.add("upstream", 0.5)
+    assert timings.server_timing(0.75) == "db;dur=5.0, upstream;dur=500.0, total;dur=750.0"
+
+
+def test_stages_outside_a_request_are_dropped():
+    record_stage("db", 1.0)
+    with stage("render"):
+        pass
+
+
+def _call(app):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def receive():
+        return {"type": "http.request"}
+
+    scope = {"type": "http", "method": "GET", "path": "/x", "headers": []}
+    asyncio.run(MetricsMiddleware(app)(scope, receive, send))
+    return dict(messages[0]["headers"]), messages
+
+
+def test_the_middleware_reports_stages_recorded_during_the_request():
+    async def app(scope, receive, send):
+        record_stage("upstream", 0.25)
+        with stage("render"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    before = _sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="200")
+    headers, messages = _call(app)
+    assert list(_timing(headers[b"server-timing"].decode())) == ["upstream", "render", "total"]
+    assert _timing(headers[b"server-timing"].decode())["upstream"] == 250.0
+    assert messages[-1]["body"] == b"ok"
+    assert _sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="200") == before + 1
+
+
+def test_server_timing_can_be_switched_off(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_TIMING_ENABLED", False)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    headers, _ = _call(app)
+    assert b"server-timing" not in headers
+
+
+def test_a_failing_app_is_counted_as_a_500():
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    before = _sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="500")
+    try:
+        _call(app)
+    except RuntimeError:
+        pass
+    assert _sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="500") == before + 1
+    assert _sample("http_requests_in_flight") == 0
+
+
+def test_sql_statements_are_timed_and_counted_per_route(api, database):
+    instrument_engine(database.engine.sync_engine)
+    route = "/api/v1/prompts/"
+    before = _sample("db_queries_per_request_sum", route=route)
+    response = api("GET", route)
+    assert response.status_code == 200
+    assert "db" in _timing(response.headers["server-timing"])
+    assert _sample("db_queries_per_request_sum", route=route) > before
+
+
+def test_routes_are_labelled_by_their_full_template(api):
+    prompt_id = api("POST", "/api/v1/prompts/", json={"name": "greet"}).json()["id"]
+    route = "/api/v1/prompts/{prompt_id}"
+    before = _sample("http_request_duration_seconds_count", method="GET", route=route, status="200")
+    api("GET", f"/api/v1/prompts/{prompt_id}")
+    api("GET", f"/api/v1/prompts/{prompt_id + 1}")
+    assert _sample("http_request_duration_seconds_count", method="GET", route=route, status="200") == before + 1
+    assert _sample("http_request_duration_seconds_count", method="GET", route=route, status="404") >= 1
+
+
+def test_the_metrics_endpoint_serves_the_registry(api):
+    response = api("GET", "/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_request_duration_seconds_bucket" in response.text
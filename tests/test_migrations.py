@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _alembic(database: str, *args: str) -> None:
+    # In a subprocess: settings are read from the environment at import time.
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{database}"}
+    subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=ROOT, env=env, check=True, capture_output=True,
+    )
+
+
+def test_upgrade_builds_the_schema_and_search_index(tmp_path):
+    database = str(tmp_path / "migrated.db")
+    _alembic(database, "upgrade", "head")
+    connection = sqlite3.connect(database)
+    try:
+        names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master")}
+        assert {"prompt", "promptversion", "templateblob", "job", "jobitem", "evaluation", "prompt_fts"} <= names
+        assert {"prompt_fts_ai", "prompt_fts_ad", "prompt_fts_au"} <= names
+        assert connection.execute("SELECT version FROM catalogversion WHERE name = 'providers'").fetchone() == (0,)
+        connection.execute(
+            "INSERT INTO prompt (name, description, tags, created_at, updated_at) "
+            "VALUES ('Summarizer', 'Condenses articles', 'news', '2026-01-01', '2026-01-01')"
+        )
+        matches = connection.execute("SELECT rowid FROM prompt_fts WHERE prompt_fts MATCH '\"condense\"*'").fetchall()
+        assert len(matches) == 1
+    finally:
+        connection.close()
+
+
+def test_downgrade_to_base_and_back(tmp_path):
+    database = str(tmp_path / "roundtrip.db")
+    _alembic(database, "upgrade", "head")
+    _alembic(database, "downgrade", "base")
+    connection = sqlite3.connect(database)
+    try:
+        names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        connection.close()
+    assert names <= {"alembic_version"}
+    _alembic(database, "upgrade", "head")
+
+
+def test_revisions_do_not_import_app_code():
+    # A revision must keep doing what it did when written, whatever the app becomes.
+    versions = os.path.join(ROOT, "migrations", "versions")
+    for name in sorted(os.listdir(versions)):
+        if name.endswith(".py"):
+            with open(os.path.join(versions, name)) as source:
+                assert "from app" not in source.read(), name
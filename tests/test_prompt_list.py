@@ -0,0 +1,84 @@
+import asyncio
+import importlib.util
+import os
+
+import pytest
+from sqlalchemy import text
+
+from app.api.v1.endpoints import prompts
+from app.services.prompt_search import decode_cursor, encode_cursor
+
+BASELINE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations", "versions", "0001_baseline.py")
+
+
+@pytest.fixture
+def library(api, database, monkeypatch):
+    """
+    Seven prompts named p0..p6 in creation order, with SQLite's full-text
+    index from the baseline migration and the list endpoint on the test engine.
+    """
+    spec = importlib.util.spec_from_file_location("migration_0001", BASELINE)
+    baseline = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(baseline)
+
+    async def create_search_index():
+        async with database.engine.begin() as connection:
+            for statement in baseline.SQLITE_SEARCH_DDL:
+                await connection.execute(text(statement))
+
+    asyncio.run(create_search_index())
+    monkeypatch.setattr(prompts, "engine", database.engine)
+    descriptions = ["summarize news", "translate text", "summarize email", "classify", "extract", "rewrite", "summarise"]
+    return [
+        api("POST", "/api/v1/prompts/", json={"name": f"p{n}", "description": description}).json()["id"]
+        for n, description in enumerate(descriptions)
+    ]
+
+
+def _pages(api, **params):
+    names, pages, cursor = [], [], None
+    while True:
+        page = api("GET", "/api/v1/prompts/", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        names += [item["name"] for item in page["items"]]
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return names, pages
+
+
+def test_cursor_round_trips():
+    assert decode_cursor(encode_cursor("p3", 4), "name") == ("p3", 4)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", "name")
+
+
+@pytest.mark.parametrize("sort_by, order, expected", [
+    ("id", "desc", ["p6", "p5", "p4", "p3", "p2", "p1", "p0"]),
+    ("name", "asc", ["p0", "p1", "p2", "p3", "p4", "p5", "p6"]),
+])
+def test_keyset_pages_cover_every_prompt_once(api, library, sort_by, order, expected):
+    names, pages = _pages(api, sort_by=sort_by, order=order, limit=3)
+    assert names == expected
+    assert [len(page["items"]) for page in pages] == [3, 3, 1]
+
+
+def test_cursor_pages_have_no_page_number(api, library):
+    _, pages = _pages(api, sort_by="name", order="asc", limit=3)
+    assert pages[0]["page"] == 1
+    assert [page["page"] for page in pages[1:]] == [None, None]
+    offset = api("GET", "/api/v1/prompts/", params={"sort_by": "name", "order": "asc", "limit": 3, "skip": 3}).json()
+    assert offset["page"] == 2 and [item["name"] for item in offset["items"]] == ["p3", "p4", "p5"]
+
+
+def test_an_invalid_cursor_is_a_400(api, library):
+    assert api("GET", "/api/v1/prompts/", params={"cursor": "junk"}).status_code == 400
+
+
+def test_search_matches_word_prefixes_and_counts(api, library):
+    names, pages = _pages(api, search="summar", sort_by="name", order="asc")
+    assert names == ["p0", "p2", "p6"] and pages[0]["total"] == 3
+    # FTS5 operators in the input are searched for as plain words.
+    assert _pages(api, search='summarize" OR "extract')[0] == []
+    estimate = api("GET", "/api/v1/prompts/", params={"search": "summar", "count": "estimate"}).json()
+    assert estimate["total"] == 3 and not estimate["total_is_estimate"]
+    assert api("GET", "/api/v1/prompts/", params={"count": "none"}).json()["total"] is None
@@ -0,0 +1,164 @@
+import asyncio
+
+import orjson
+from sqlmodel import select
+
+from app.models.prompt import Prompt, PromptVersion
+from app.services.prompt_transfer import PromptImporter, export_ndjson, import_ndjson
+
+
+def _line(name, versions, **fields) -> bytes:
+    return orjson.dumps({
+        "name": name,
+        "versions": [{"version_number": number, "template": template} for number, template in versions],
+        **fields,
+    }) + b"\n"
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _import(database, *lines: bytes):
+    async with database.session_maker() as session:
+        return await import_ndjson(session, _chunks(*lines))
+
+
+async def _export():
+    return [orjson.loads(line) async for line in export_ndjson()]
+
+
+async def _prompts(database):
+    async with database.session_maker() as session:
+        prompts = (await session.exec(select(Prompt).order_by(Prompt.id))).all()
+        versions = (await session.exec(select(PromptVersion).order_by(PromptVersion.prompt_id, PromptVersion.version_number))).all()
+        return prompts, versions
+
+
+def test_import_creates_prompts_and_export_round_trips_them(database):
+    async def scenario():
+        result = await _import(
+            database,
+            _line("greet", [(1, "Hello {{name}}"), (2, "Hi {{name}}")], tags="a,b", active_version_number=2),
+            _line("empty", []),
+        )
+        return result, await _export()
+
+    result, exported = asyncio.run(scenario())
+    assert (result.prompts_created, result.versions_created, result.failed_lines) == (2, 2, 0)
+    greet, empty = exported
+    assert greet["name"] == "greet" and greet["tags"] == "a,b"
+    assert [(version["version_number"], version["template"]) for version in greet["versions"]] == [
+        (1, "Hello {{name}}"), (2, "Hi {{name}}"),
+    ]
+    assert greet["active_version_number"] == 2
+    assert empty["versions"] == [] and empty["active_version_number"] is None
+
+
+def test_reimport_upserts_by_name_and_version_number(database):
+    async def scenario():
+        await _import(database, _line("greet", [(1, "Hello"), (2, "Hi")], description="old"))
+        result = await _import(database, _line("greet", [(1, "Hello"), (2, "Hey"), (3, "Yo")], description="new"))
+        return result, await _prompts(database)
+
+    result, (prompts, versions) = asyncio.run(scenario())
+    assert (result.prompts_created, result.prompts_updated) == (0, 1)
+    assert (result.versions_created, result.versions_updated, result.versions_unchanged) == (1, 1, 1)
+    assert len(prompts) == 1 and prompts[0].description == "new"
+    assert [version.version_number for version in versions] == [1, 2, 3]
+
+
+def test_fields_left_out_of_a_line_keep_their_value(database):
+    async def scenario():
+        await _import(database, _line("greet", [(1, "Hello")], description="kept", tags="t"))
+        await _import(database, _line("greet", [(1, "Hello")], tags="u"))
+        return await _prompts(database)
+
+    prompts, _ = asyncio.run(scenario())
+    assert (prompts[0].description, prompts[0].tags) == ("kept", "u")
+
+
+def test_active_version_defaults_to_the_lowest_and_is_kept_on_reimport(database):
+    async def scenario():
+        await _import(database, _line("greet", [(2, "Hi"), (1, "Hello")]))
+        first = await _prompts(database)
+        await _import(database, _line("greet", [(3, "Yo")]))
+        second = await _prompts(database)
+        await _import(database, _line("greet", [], active_version_number=3))
+        return first, second, await _prompts(database)
+
+    def active_number(state):
+        prompts, versions = state
+        return next(version.version_number for version in versions if version.id == prompts[0].active_version_id)
+
+    first, second, third = asyncio.run(scenario())
+    assert active_number(first) == 1
+    assert active_number(second) == 1
+    assert active_number(third) == 3
+
+
+def test_an_unknown_active_version_is_reported_and_left_unchanged(database):
+    async def scenario():
+        await _import(database, _line("greet", [(1, "Hello")]))
+        result = await _import(database, _line("greet", [], active_version_number=9))
+        return result, await _prompts(database)
+
+    result, (prompts, versions) = asyncio.run(scenario())
+    assert result.failed_lines == 1
+    assert result.errors[0].name == "greet" and "Active version 9 not found" in result.errors[0].error
+    assert prompts[0].active_version_id == versions[0].id
+
+
+def test_bad_lines_are_reported_and_the_rest_imported(database):
+    async def scenario():
+        return await _import(
+            database,
+            b"not json\n",
+            _line("ok", [(1, "Hello")]),
+            b"\n",
+            _line("dupe", [(1, "a"), (1, "b")]),
+            _line("policy", [], execution_policy_json='{"hedge_delay_ms": -1}'),
+        )
+
+    result = asyncio.run(scenario())
+    assert result.prompts_created == 1 and result.failed_lines == 3
+    assert [(error.line, error.name) for error in result.errors] == [(1, None), (4, "dupe"), (5, "policy")]
+    assert result.errors[1].error == "Duplicate version_number"
+    assert result.errors[2].error.startswith("Invalid execution_policy_json")
+
+
+def test_lines_split_across_chunks_are_reassembled(database):
+    async def scenario():
+        data = _line("a", [(1, "x")]) + _line("b", [(1, "y")]).rstrip(b"\n")
+        return await _import(database, data[:7], data[7:40], data[40:])
+
+    result = asyncio.run(scenario())
+    assert result.prompts_created == 2 and result.failed_lines == 0
+
+
+def test_a_name_repeated_within_a_batch_is_not_created_twice(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            importer = PromptImporter(session, batch_versions=100, max_errors=10)
+            await importer.add(1, _line("greet", [(1, "Hello")]))
+            await importer.add(2, _line("greet", [(2, "Hi")]))
+            await importer.flush()
+            return importer.result, await _prompts(database)
+
+    result, (prompts, versions) = asyncio.run(scenario())
+    assert (result.prompts_created, result.prompts_updated) == (1, 1)
+    assert len(prompts) == 1 and [version.version_number for version in versions] == [1, 2]
+
+
+def test_error_details_stop_at_max_errors_but_are_all_counted(database):
+    async def scenario():
+        async with database.session_maker() as session:
+            importer = PromptImporter(session, batch_versions=100, max_errors=2)
+            for line in range(1, 5):
+                await importer.add(line, b"{}")
+            await importer.flush()
+            return importer.result
+
+    result = asyncio.run(scenario())
+    assert result.failed_lines == 4 and len(result.errors) == 2
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import event
+
+from app.api.v1.endpoints import prompts
+
+
+@pytest.fixture
+def statements(database, monkeypatch):
+    monkeypatch.setattr(prompts, "engine", database.engine)
+    seen = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        seen.append(statement)
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", count)
+    yield seen
+    event.remove(database.engine.sync_engine, "before_cursor_execute", count)
+
+
+def _prompt_with_versions(api, name, templates, active=None):
+    prompt_id = api("POST", "/api/v1/prompts/", json={"name": name}).json()["id"]
+    ids = [
+        api("POST", f"/api/v1/prompts/{prompt_id}/versions", json={"version_number": n, "template": template}).json()["id"]
+        for n, template in enumerate(templates, 1)
+    ]
+    if active is not None:
+        api("POST", f"/api/v1/prompts/{prompt_id}/versions/{ids[active]}/set-active")
+    return prompt_id, ids
+
+
+def test_list_items_carry_counts_and_the_active_version_only(api, statements):
+    _prompt_with_versions(api, "a", ["one", "two", "three"], active=1)
+    _prompt_with_versions(api, "b", [])
+    items = api("GET", "/api/v1/prompts/", params={"sort_by": "name", "order": "asc"}).json()["items"]
+    assert [(item["name"], item["version_count"]) for item in items] == [("a", 3), ("b", 0)]
+    assert items[0]["active_version"]["version_number"] == 2
+    assert items[1]["active_version"] is None
+    assert "versions" not in items[0]
+
+
+def test_listing_takes_the_same_queries_however_many_versions(api, statements):
+    def list_queries():
+        statements.clear()
+        api("GET", "/api/v1/prompts/")
+        return len(statements)
+
+    _prompt_with_versions(api, "a", ["one"])
+    few = list_queries()
+    for n in range(5):
+        _prompt_with_versions(api, f"more-{n}", ["x", "y", "z"], active=2)
+    assert list_queries() == few
+
+
+def test_version_history_pages_newest_first_and_inlines_small_templates(api, statements):
+    large = "line\n" * 400
+    prompt_id, _ = _prompt_with_versions(api, "a", ["v1", "v2", large, "v4", "v5"])
+    numbers, cursor, pages = [], None, []
+    while True:
+        page = api("GET", f"/api/v1/prompts/{prompt_id}/versions", params={"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+        pages.append(page["items"])
+        numbers += [item["version_number"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert numbers == [5, 4, 3, 2, 1]
+    by_number = {item["version_number"]: item for items in pages for item in items}
+    assert by_number[5]["template"] == "v5"
+    # Large (compressed) templates are left for the detail view.
+    assert by_number[3]["template"] is None and by_number[3]["template_size"] == len(large)
+    detail = api("GET", f"/api/v1/prompts/{prompt_id}/versions/{by_number[3]['id']}").json()
+    assert detail["template"] == large
+
+
+def test_the_detail_view_decodes_every_version(api, statements):
+    large = "line\n" * 400
+    prompt_id, _ = _prompt_with_versions(api, "a", ["short", large, large + "more\n"])
+    versions = api("GET", f"/api/v1/prompts/{prompt_id}").json()["versions"]
+    assert [version["template"] for version in versions] == ["short", large, large + "more\n"]
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints import execute
+from app.models.provider import LLMModel, LLMProvider
+from app.services.provider_catalog import ProviderCatalog, bump_catalog_version
+
+
+async def _add_providers(database):
+    async with database.session_maker() as session:
+        active = LLMProvider(name="OpenAI", kind="openai", api_key="sk-active", models=[LLMModel(name="gpt-4o")])
+        inactive = LLMProvider(name="Old OpenAI", kind="openai", api_key="sk-old", is_active=False)
+        session.add_all([active, inactive])
+        await bump_catalog_version(session)
+        await session.commit()
+        return active.id, inactive.id
+
+
+def test_inactive_providers_are_listed_but_have_no_config(database):
+    async def scenario():
+        active_id, inactive_id = await _add_providers(database)
+        catalog = ProviderCatalog()
+        return (
+            active_id, inactive_id, catalog,
+            await catalog.config(active_id), await catalog.config(inactive_id), await catalog.list_json(),
+        )
+
+    active_id, inactive_id, catalog, active, inactive, list_json = asyncio.run(scenario())
+    assert active["api_key"] == "sk-active" and active["kind"] == "openai"
+    assert inactive is None and catalog.is_inactive(inactive_id)
+    listed = {provider["id"]: provider for provider in json.loads(list_json)}
+    assert listed[inactive_id]["is_active"] is False
+    assert [model["name"] for model in listed[active_id]["models"]] == ["gpt-4o"]
+
+
+def test_executing_against_an_inactive_provider_is_refused(database, monkeypatch):
+    async def scenario():
+        active_id, inactive_id = await _add_providers(database)
+        monkeypatch.setattr(execute, "provider_catalog", ProviderCatalog())
+        assert (await execute._provider_config(active_id))["api_key"] == "sk-active"
+        # Unknown ids keep falling back to the environment's credentials.
+        assert await execute._provider_config(inactive_id + 100) == {}
+        await execute._provider_config(inactive_id)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+    assert raised.value.status_code == 409
+
+
+def test_concurrent_first_bumps_do_not_collide(database):
+    async def bump():
+        async with database.session_maker() as session:
+            await bump_catalog_version(session)
+            await session.commit()
+
+    async def scenario():
+        await asyncio.gather(bump(), bump(), bump())
+        async with database.session_maker() as session:
+            return await ProviderCatalog()._read_version(session)
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_refresh_picks_up_changes_bumped_elsewhere(database):
+    async def scenario():
+        active_id, _ = await _add_providers(database)
+        catalog = ProviderCatalog()
+        await catalog.ensure_loaded()
+        unchanged = await catalog.refresh_if_stale()
+        async with database.session_maker() as session:
+            provider = await session.get(LLMProvider, active_id)
+            provider.is_active = False
+            session.add(provider)
+            await bump_catalog_version(session)
+            await session.commit()
+        changed = await catalog.refresh_if_stale()
+        return unchanged, changed, catalog.is_inactive(active_id)
+
+    assert asyncio.run(scenario()) == (False, True, True)
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.providers import ProviderRateLimited
+from app.services.resilience import ProviderGuard, TokenBucket, estimate_tokens, forget_guard, guard_for, retry_delay
+
+
+def test_configure_keeps_bucket_when_limits_unchanged():
+    guard = ProviderGuard("test", requests_per_minute=500, tokens_per_minute=250)
+    requests, tokens = guard.requests, guard.tokens
+    guard.configure(500, 250)
+    guard.configure(500, 250)
+    assert guard.requests is requests
+    assert guard.tokens is tokens
+
+
+def test_configure_replaces_bucket_when_limits_change():
+    guard = ProviderGuard("test", requests_per_minute=500)
+    requests = guard.requests
+    guard.configure(125, None)
+    assert guard.requests is not requests
+    assert guard.requests.per_minute == 125
+    guard.configure(None, None)
+    assert guard.requests is None
+
+
+def test_guard_for_reuses_rate_limited_bucket():
+    config = {"id": 987654, "requests_per_minute": 500}
+    try:
+        bucket = guard_for("openai", config).requests
+        bucket.reserve(1)
+        assert guard_for("openai", config).requests is bucket
+    finally:
+        forget_guard(987654)
+
+
+def test_cancelled_waiter_refunds_its_reservation():
+    async def scenario():
+        bucket = TokenBucket(60)
+        bucket.reserve(60)
+        waiter = asyncio.create_task(bucket.acquire(30, max_wait=60))
+        await asyncio.sleep(0.01)
+        assert bucket.waiters == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return bucket
+
+    bucket = asyncio.run(scenario())
+    assert bucket.waiters == 0
+    # Only the first reservation is outstanding: a single token is a ~1s wait, not ~31s.
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.1)
+
+
+def test_wait_over_the_limit_is_refused_and_refunded():
+    bucket = TokenBucket(60)
+    bucket.reserve(60)
+    with pytest.raises(ProviderRateLimited):
+        asyncio.run(bucket.acquire(30, max_wait=5))
+    assert bucket.reserve(1) == pytest.approx(1.0, abs=0.1)
+
+
+def test_request_slot_is_refunded_when_the_token_bucket_refuses(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RATE_LIMIT_MAX_WAIT", 5.0)
+    guard = ProviderGuard("test", requests_per_minute=60, tokens_per_minute=600)
+    guard.tokens.reserve(600)
+    with pytest.raises(ProviderRateLimited):
+        asyncio.run(guard._admit(estimated_tokens=300))
+    assert guard.requests.tokens == pytest.approx(60, abs=0.1)
+    assert guard.breaker._probing is False
+
+
+def test_retry_delay_honours_retry_after_within_the_cap(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_DELAY", 20.0)
+    assert retry_delay(0, retry_after=3.0) == 3.0
+    assert retry_delay(0, retry_after=60.0) is None
+    assert 0 <= retry_delay(2) <= 20.0
+
+
+def test_long_retry_after_fails_fast_with_the_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_DELAY", 20.0)
+    calls = []
+
+    async def rate_limited():
+        calls.append(1)
+        raise ProviderRateLimited("slow down", retry_after=120.0)
+
+    with pytest.raises(ProviderRateLimited) as raised:
+        asyncio.run(ProviderGuard("test").call(rate_limited))
+    assert len(calls) == 1
+    assert raised.value.retry_after == 120.0
+
+
+def test_short_retry_after_is_retried(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_ATTEMPTS", 3)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ProviderRateLimited("slow down", retry_after=0.01)
+        return "ok"
+
+    assert asyncio.run(ProviderGuard("test").call(flaky)) == "ok"
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("config, expected", [
+    ({}, 256),
+    ({"max_tokens": 100}, 100),
+    ({"num_predict": "64"}, 64),
+    ({"max_tokens": "abc"}, 256),
+    ({"max_tokens": {}}, 256),
+    ({"max_tokens": [1]}, 256),
+    ({"max_tokens": -5}, 256),
+    ({"max_tokens": float("inf")}, 256),
+])
+def test_estimate_tokens_falls_back_on_unusable_budgets(config, expected):
+    assert estimate_tokens("x" * 40, config) == 10 + expected
+
+
+def test_snapshot_reports_the_configured_limits():
+    guard = ProviderGuard("kind:test", requests_per_minute=7, tokens_per_minute=1000)
+    snapshot = guard.snapshot()
+    assert (snapshot["requests_per_minute"], snapshot["tokens_per_minute"]) == (7, 1000)
+    assert ProviderGuard("kind:none").snapshot()["requests_per_minute"] is None
@@ -0,0 +1,86 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.cache import CachedResponse
+from app.services.response_cache import ResponseCache, cache_key, is_cacheable
+
+
+def _cache(**overrides) -> ResponseCache:
+    options = {"ttl_seconds": 60, "max_entries": 100, "max_bytes": 1 << 20}
+    options.update(overrides)
+    return ResponseCache(**options)
+
+
+async def _session_maker(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(CachedResponse.__table__.create)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def test_is_cacheable_only_at_temperature_zero():
+    assert is_cacheable({"temperature": 0})
+    assert is_cacheable({"temperature": "0.0"})
+    assert not is_cacheable({"temperature": 0.7})
+    assert not is_cacheable({})
+    assert not is_cacheable(None)
+
+
+def test_is_cacheable_rejects_non_numeric_temperature():
+    assert not is_cacheable({"temperature": "low"})
+    assert not is_cacheable({"temperature": [0]})
+
+
+def test_cache_key_ignores_config_order_and_provider_case():
+    first = cache_key("OpenAI ", "gpt-4o", "hi", {"temperature": 0, "max_tokens": 5})
+    second = cache_key("openai", "gpt-4o", "hi", {"max_tokens": 5, "temperature": 0})
+    assert first == second
+    assert first != cache_key("openai", "gpt-4o", "hi", {"temperature": 0}, provider_id=3)
+
+
+def test_concurrent_stores_of_one_key_all_succeed(tmp_path):
+    async def scenario():
+        engine, session_maker = await _session_maker(tmp_path / "cache.db")
+        cache = _cache()
+        try:
+            async def store(index: int) -> None:
+                async with session_maker() as session:
+                    await cache.set(session, "k" * 64, f"answer {index}")
+
+            await asyncio.gather(*(store(index) for index in range(10)))
+            cache.clear()
+            async with session_maker() as session:
+                stored = await cache.get(session, "k" * 64)
+        finally:
+            await engine.dispose()
+        return stored
+
+    assert asyncio.run(scenario()).startswith("answer ")
+
+
+def test_failed_persist_keeps_the_memory_entry(tmp_path):
+    async def scenario():
+        # No table: every database write fails.
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'empty.db'}")
+        cache = _cache()
+        try:
+            async with AsyncSession(engine) as session:
+                await cache.set(session, "key", "answer")
+        finally:
+            await engine.dispose()
+        return cache._get_memory("key")
+
+    assert asyncio.run(scenario()) == "answer"
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = _cache(max_entries=2)
+    cache._set_memory("a", "1", 60)
+    cache._set_memory("b", "2", 60)
+    assert cache._get_memory("a") == "1"
+    cache._set_memory("c", "3", 60)
+    assert cache._get_memory("b") is None
+    assert cache._get_memory("a") == "1"
+    assert cache.snapshot()["evictions"] == 1
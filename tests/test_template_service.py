@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from app.api.v1.endpoints import execute
+from app.services.providers import CompletionResult
+from app.services.template_service import PreparedVersion, PromptTemplateCache, TemplateError, compile_template
+
+
+def test_compiled_templates_render_variables():
+    template = compile_template("Hi {{ name }}, you are {{age}}. {{name}}!")
+    assert template.variables == {"name", "age"}
+    assert template.render({"name": "Ada", "age": 36}) == "Hi Ada, you are 36. Ada!"
+    assert compile_template("no variables").render({}) == "no variables"
+    with pytest.raises(TemplateError, match="age"):
+        template.render({"name": "Ada"})
+
+
+@pytest.mark.parametrize("declared", ['["name", "tone"]', '[{"name": "name"}, {"name": "tone"}]', '{"name": "", "tone": ""}', "name, tone"])
+def test_declared_input_variables_are_required(declared):
+    prepared = PreparedVersion(1, 1, "Hi {{name}}", declared, '{"temperature": 0.2}')
+    assert prepared.input_variables == ["name", "tone"]
+    assert prepared.model_config == {"temperature": 0.2}
+    with pytest.raises(TemplateError, match="tone"):
+        prepared.render({"name": "Ada"})
+    assert prepared.render({"name": "Ada", "tone": "warm"}) == "Hi Ada"
+
+
+def _version(api, template, **fields):
+    prompt_id = api("POST", "/api/v1/prompts/", json={"name": "greet"}).json()["id"]
+    version = api("POST", f"/api/v1/prompts/{prompt_id}/versions", json={"version_number": 1, "template": template, **fields}).json()
+    return prompt_id, version["id"]
+
+
+def test_the_cache_serves_versions_until_invalidated_or_expired(api, database):
+    prompt_id, version_id = _version(api, "Hi {{name}}")
+    cache = PromptTemplateCache(ttl_seconds=60)
+
+    async def scenario():
+        async with database.session_maker() as session:
+            first = await cache.resolve(session, prompt_id)
+            again = await cache.resolve(session, prompt_id)
+            cache.invalidate_version(version_id)
+            reloaded = await cache.resolve(session, version_id=version_id)
+            cache.ttl_seconds = 0
+            expired = await cache.resolve(session, version_id=version_id)
+            with pytest.raises(LookupError):
+                await cache.resolve(session, prompt_id=prompt_id + 1, version_id=version_id)
+            return first, again, reloaded, expired
+
+    first, again, reloaded, expired = asyncio.run(scenario())
+    assert first is again
+    assert reloaded is not first and expired is not reloaded
+    assert first.render({"name": "Ada"}) == "Hi Ada"
+
+
+@pytest.fixture
+def completed(monkeypatch):
+    calls = []
+
+    async def complete_with_policy(candidates, prompt_text, hedge_delay_ms=None):
+        calls.append((prompt_text, candidates[0].config))
+        return CompletionResult(text="ok"), candidates[0], []
+
+    monkeypatch.setattr(execute.LLMService, "complete_with_policy", complete_with_policy)
+    monkeypatch.setattr(execute.execution_writer, "record", lambda **fields: None)
+    return calls
+
+
+def test_executing_a_stored_prompt_renders_it_server_side(api, completed):
+    prompt_id, _ = _version(api, "Hi {{name}}", model_config_json='{"temperature": 0.2, "max_tokens": 5}')
+    body = {"model_provider": "openai", "model_name": "gpt-4o", "prompt_id": prompt_id, "config": {"max_tokens": 9}}
+    response = api("POST", "/api/v1/execute/", json={**body, "variables": {"name": "Ada"}})
+    assert response.status_code == 200
+    # The version's model config sits under the request's own.
+    assert completed == [("Hi Ada", {"temperature": 0.2, "max_tokens": 9})]
+
+    missing = api("POST", "/api/v1/execute/", json=body)
+    assert missing.status_code == 422 and "name" in missing.json()["detail"]
+    unknown = api("POST", "/api/v1/execute/", json={**body, "prompt_id": prompt_id + 1})
+    assert unknown.status_code == 404
@@ -0,0 +1,121 @@
+import asyncio
+import importlib.util
+import os
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+
+from app.models.prompt import Prompt, PromptVersion
+from app.models.template import TemplateBlob
+from app.services.template_store import TemplateStore, _existing, apply_delta, make_delta, template_hash
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations", "versions", "0003_template_blobs.py")
+
+PAIRS = [
+    ("", ""),
+    ("", "new\n"),
+    ("a\nb\nc\n", "a\nb\nc\n"),
+    ("a\nb\nc\n", "a\nB\nc\nd"),
+    ("a\nb\nc", "c\nb\na"),
+    ("one\ntwo\nthree\n", ""),
+    ("shared header\n" * 50 + "old tail\n", "shared header\n" * 50 + "new tail\n"),
+]
+
+
+def _store(**overrides) -> TemplateStore:
+    return TemplateStore(**{"compress_min_bytes": 64, "delta_enabled": True, "delta_max_chain": 2, **overrides})
+
+
+def _long(tail: str) -> str:
+    return "".join(f"line {n} of a long template\n" for n in range(40)) + tail
+
+
+async def _blobs(database):
+    async with database.session_maker() as session:
+        return {blob.hash: blob for blob in (await session.exec(select(TemplateBlob))).all()}
+
+
+@pytest.mark.parametrize("base, text", PAIRS)
+def test_delta_round_trips(base, text):
+    assert apply_delta(base, make_delta(base, text)) == text
+
+
+def test_migration_decoder_matches_the_store():
+    spec = importlib.util.spec_from_file_location("migration_0003", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    for base, text in PAIRS:
+        assert migration._apply_delta(base, make_delta(base, text)) == text
+
+
+def test_small_templates_are_raw_large_ones_compressed_or_deltas(database):
+    store = _store()
+
+    async def scenario():
+        async with database.session_maker() as session:
+            small = await store.store(session, "Hi {{name}}")
+            first = await store.store(session, _long("v1\n"))
+            second = await store.store(session, _long("v2\n"), base_hash=first)
+            again = await store.store(session, _long("v2\n"), base_hash=first)
+            await session.commit()
+        # A fresh store has nothing cached, so these decode from the rows.
+        async with database.session_maker() as session:
+            loaded = await _store().load_many(session, [small, first, second])
+        return small, first, second, again, loaded, await _blobs(database)
+
+    small, first, second, again, loaded, blobs = asyncio.run(scenario())
+    assert again == second == template_hash(_long("v2\n"))
+    assert len(blobs) == 3
+    assert blobs[small].encoding == "raw"
+    assert blobs[first].encoding == "zlib"
+    assert (blobs[second].encoding, blobs[second].base_hash, blobs[second].depth) == ("delta", first, 1)
+    assert loaded == {small: "Hi {{name}}", first: _long("v1\n"), second: _long("v2\n")}
+
+
+def test_delta_chains_stop_at_the_max_depth(database):
+    store = _store()
+
+    async def scenario():
+        async with database.session_maker() as session:
+            digests = await store.store_many(session, [(_long("v0\n"), None)])
+            for n in range(1, 4):
+                digests += await store.store_many(session, [(_long(f"v{n}\n"), digests[-1])])
+            await session.commit()
+        return digests, await _blobs(database)
+
+    digests, blobs = asyncio.run(scenario())
+    assert [blobs[digest].depth for digest in digests] == [0, 1, 2, 0]
+    assert blobs[digests[3]].encoding == "zlib"
+
+
+def test_release_deletes_unreferenced_blobs_and_the_bases_that_frees(database):
+    store = _store()
+
+    async def scenario():
+        async with database.session_maker() as session:
+            base, delta = await store.store_many(session, [(_long("v1\n"), None), (_long("v2\n"), template_hash(_long("v1\n")))])
+            kept = await store.store(session, "kept")
+            prompt = Prompt(name="p")
+            session.add(prompt)
+            await session.flush()
+            session.add(PromptVersion(prompt_id=prompt.id, version_number=1, template_hash=kept))
+            await session.commit()
+
+            # The delta still needs its base, and a referenced blob stays.
+            await store.release(session, [base, kept])
+            await session.commit()
+            after_first = set(await _blobs(database))
+
+            await store.release(session, [delta])
+            await session.commit()
+        return base, delta, kept, after_first, set(await _blobs(database))
+
+    base, delta, kept, after_first, after_second = asyncio.run(scenario())
+    assert after_first == {base, delta, kept}
+    assert after_second == {kept}
+
+
+def test_existing_blobs_are_locked_until_the_version_commits():
+    sql = str(_existing(["abc"]).compile(dialect=postgresql.dialect()))
+    assert sql.endswith("FOR KEY SHARE")